@@ -0,0 +1,137 @@
+"""
+Benchmark der Compute-Backends (inline, thread, process) für compute_map_df.
+
+Misst pro Backend und Fenstergrösse die End-to-End-Latenz (submit -> DataFrame im
+Hauptprozess, inkl. Pickling beim Prozess-Pool) sowie den residenten Speicher von
+Hauptprozess und Workern.
+
+Beispiele:
+    python -m benchmarks.bench_compute_backend
+    python -m benchmarks.bench_compute_backend --data real --windows 1 30 365 3650
+    python -m benchmarks.bench_compute_backend --backends thread process --json out.json
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import COMPUTE_WORKERS
+from dashboard.views.compute_backend import BACKENDS, create_executor
+from dashboard.views.main_multiprocessing import compute_map_df
+
+try:
+    import psutil
+except ImportError:  # Speichermessung optional
+    psutil = None
+
+
+def _rss_mb():
+    """(Hauptprozess, Summe aller Kindprozesse) in MB."""
+    if psutil is None:
+        return float("nan"), float("nan")
+    proc = psutil.Process(os.getpid())
+    children = sum(c.memory_info().rss for c in proc.children(recursive=True))
+    return proc.memory_info().rss / 2**20, children / 2**20
+
+
+def _load(data, n_hru, n_days):
+    if data == "real":
+        from dashboard.data.data_loader import load_data
+        root = Path(__file__).resolve().parent.parent / "data"
+        _, ds, shap_ds = load_data(
+            root / "CHRUN" / "catchments" / "catchments.shp",
+            root / "CHRUN" / "chrun.nc",
+            root / "model" / "shap_rnn.nc",
+        )
+        return ds, shap_ds
+    from dashboard.data.synthetic_data import make_synthetic_data
+    _, ds, shap_ds = make_synthetic_data(n_hru=n_hru, n_days=n_days)
+    return ds, shap_ds
+
+
+def bench_backend(backend, ds, var_name, windows, repeats, agg_method, workers, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.DatetimeIndex(ds.time.values)
+    rss_before = _rss_mb()
+
+    t0 = time.perf_counter()
+    executor = create_executor(ds, None, backend=backend, max_workers=workers)
+    # Erster Job: Pool-Start, Initializer und Datenkopie in die Worker
+    first = (times[0].date(), times[0].date())
+    executor.submit(compute_map_df, var_name, first, agg_method).result()
+    cold_s = time.perf_counter() - t0
+
+    rows = []
+    try:
+        for window in windows:
+            window = min(window, len(times))
+            latencies = []
+            for _ in range(repeats):
+                i0 = int(rng.integers(0, len(times) - window + 1))
+                date_range = (times[i0].date(), times[i0 + window - 1].date())
+                t = time.perf_counter()
+                executor.submit(compute_map_df, var_name, date_range, agg_method).result()
+                latencies.append(time.perf_counter() - t)
+            # Parallelität: so viele Jobs gleichzeitig wie Worker
+            t = time.perf_counter()
+            futures = [executor.submit(compute_map_df, var_name,
+                                       (times[0].date(), times[window - 1].date()), agg_method)
+                       for _ in range(workers)]
+            for f in futures:
+                f.result()
+            burst_s = time.perf_counter() - t
+            main_mb, workers_mb = _rss_mb()
+            lat = np.array(latencies) * 1000
+            rows.append(dict(
+                backend=backend,
+                window_days=window,
+                p50_ms=float(np.percentile(lat, 50)),
+                p95_ms=float(np.percentile(lat, 95)),
+                burst_ms=burst_s * 1000,
+                cold_start_ms=cold_s * 1000,
+                rss_main_mb=main_mb - rss_before[0],
+                rss_workers_mb=workers_mb,
+            ))
+    finally:
+        executor.shutdown(wait=True)
+    return rows
+
+
+def _print_table(rows):
+    cols = ["backend", "window_days", "p50_ms", "p95_ms", "burst_ms", "cold_start_ms",
+            "rss_main_mb", "rss_workers_mb"]
+    print(" | ".join(f"{c:>14}" for c in cols))
+    for row in rows:
+        print(" | ".join(f"{row[c]:>14.1f}" if isinstance(row[c], float) else f"{row[c]:>14}" for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--windows", nargs="+", type=int, default=[1, 30, 365, 3650])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--variable", default="P")
+    parser.add_argument("--agg", default="mean")
+    parser.add_argument("--workers", type=int, default=COMPUTE_WORKERS)
+    parser.add_argument("--data", choices=["synthetic", "real"], default="synthetic")
+    parser.add_argument("--n-hru", type=int, default=307)
+    parser.add_argument("--n-days", type=int, default=365 * 20)
+    parser.add_argument("--json", help="Resultate zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    ds, _ = _load(args.data, args.n_hru, args.n_days)
+    rows = []
+    for backend in args.backends:
+        rows.extend(bench_backend(backend, ds, args.variable, args.windows, args.repeats,
+                                  args.agg, args.workers))
+    _print_table(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Lokaler Lasttest für den Mehrprozess-Betrieb (serve.py).
+
+Startet serve.py mit synthetischen Daten, gemeinsamem Datenspeicher und wahlweise
+geteiltem Resultat-Cache (disk, RESP-Stand-in statt Redis, none). Mehrere Clients
+laden die App parallel über HTTP. Während der Messung löst SIGHUP einen
+rolling restart aus.
+
+Sticky Sessions werden wie bei nginx `ip_hash` nachgebildet: jeder Client hat
+einen festen Heimat-Port (Hash der Client-ID). Ist dieser nicht erreichbar, weicht
+der Client auf den nächsten Port aus, wie bei `proxy_next_upstream`.
+
+Geprüft und berichtet werden:
+- Latenz p50/p95/p99 vor, während und nach dem Neustart,
+- Fehler (kein Port erreichbar) und Ausweichanfragen,
+- Stickiness: Anteil der Anfragen, die der Heimat-Prozess beantwortet hat,
+- dass nach dem Neustart alle Serverprozesse neue pids haben,
+- Einträge im geteilten Cache.
+
+Beispiele:
+    python -m benchmarks.load_multiprocess
+    python -m benchmarks.load_multiprocess --workers 3 --clients 12 --duration 90 --cache resp
+    python -m benchmarks.load_multiprocess --cache none --json load.json
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.resp_standin import start_standin
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _get(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def _read_state(store):
+    try:
+        with open(Path(store) / "serve_state.json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _wait_ready(ports, timeout):
+    deadline = time.time() + timeout
+    for port in ports:
+        while True:
+            try:
+                _get(f"http://127.0.0.1:{port}/health", 2)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise TimeoutError(f"Port {port} nicht bereit")
+                time.sleep(1)
+
+
+class Client(threading.Thread):
+
+    def __init__(self, client_id, ports, stop_at, timeout):
+        super().__init__(daemon=True)
+        self.ports = ports
+        self.home = ports[zlib.crc32(client_id.encode()) % len(ports)]
+        self.stop_at = stop_at
+        self.timeout = timeout
+        self.records = []  # (Startzeit, Latenz s, bedienender Port oder None)
+
+    def _order(self):
+        i = self.ports.index(self.home)
+        return self.ports[i:] + self.ports[:i]
+
+    def run(self):
+        while time.time() < self.stop_at:
+            t0 = time.time()
+            served = None
+            for port in self._order():
+                try:
+                    status, _ = _get(f"http://127.0.0.1:{port}/", self.timeout)
+                    if status == 200:
+                        served = port
+                        break
+                except OSError:
+                    continue
+            self.records.append((t0, time.time() - t0, served))
+            if served is None:
+                time.sleep(0.5)
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return {"n": 0}
+    arr = np.asarray(latencies) * 1000
+    return {"n": len(arr), "p50_ms": float(np.percentile(arr, 50)),
+            "p95_ms": float(np.percentile(arr, 95)), "p99_ms": float(np.percentile(arr, 99))}
+
+
+def _cache_entries(cache_url):
+    from dashboard.views.result_cache import result_cache_from_url
+    try:
+        return result_cache_from_url(cache_url).stats().get("entries")
+    except Exception:
+        return None
+
+
+def run(args):
+    tmp = Path(tempfile.mkdtemp(prefix="wrd-load-"))
+    store = tmp / "store"
+    standin = None
+    if args.cache == "resp":
+        standin, resp_port = start_standin()
+        cache_url = f"redis://127.0.0.1:{resp_port}/0"
+    elif args.cache == "disk":
+        cache_url = f"disk://{tmp / 'cache'}"
+    else:
+        cache_url = ""
+
+    ports = [args.port + i for i in range(args.workers)]
+    cmd = [sys.executable, str(ROOT / "serve.py"), "--workers", str(args.workers), "--port", str(args.port),
+           "--data", "synthetic", "--store", str(store), "--cache", cache_url]
+    env = dict(os.environ, DASHBOARD_COMPUTE_WORKERS=str(args.compute_workers))
+    supervisor = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    try:
+        _wait_ready(ports, args.startup_timeout)
+        pids_before = _read_state(store)["workers"]
+
+        start = time.time()
+        stop_at = start + args.duration
+        clients = [Client(f"client-{i}", ports, stop_at, args.timeout) for i in range(args.clients)]
+        for client in clients:
+            client.start()
+
+        time.sleep(args.duration * args.restart_at)
+        restart_t0 = time.time()
+        supervisor.send_signal(signal.SIGHUP)
+        restart_t1 = None
+        while time.time() < stop_at + args.startup_timeout:
+            state = _read_state(store)
+            if state and state["restarts"] >= args.workers and all(
+                    state["workers"][p] != pids_before[p] for p in pids_before):
+                try:
+                    _wait_ready(ports, 5)
+                    restart_t1 = time.time()
+                    break
+                except TimeoutError:
+                    pass
+            time.sleep(0.5)
+        for client in clients:
+            client.join()
+        pids_after = _read_state(store)["workers"]
+    finally:
+        supervisor.send_signal(signal.SIGTERM)
+        try:
+            supervisor.wait(30)
+        except subprocess.TimeoutExpired:
+            supervisor.kill()
+        if standin is not None:
+            cache_entries = _cache_entries(cache_url)
+            standin.shutdown()
+        else:
+            cache_entries = _cache_entries(cache_url) if cache_url else None
+
+    records = [(c.home,) + r for c in clients for r in c.records]
+    restart_end = restart_t1 or float("inf")
+    phases = {
+        "before_restart": [r for r in records if r[1] < restart_t0],
+        "during_restart": [r for r in records if restart_t0 <= r[1] < restart_end],
+        "after_restart": [r for r in records if r[1] >= restart_end],
+    }
+    ok = [r for r in records if r[3] is not None]
+    report = {
+        "workers": args.workers,
+        "clients": args.clients,
+        "cache": args.cache,
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "failovers": sum(1 for r in ok if r[3] != r[0]),
+        "sticky_ratio": (sum(1 for r in ok if r[3] == r[0]) / len(ok)) if ok else None,
+        "sticky_ratio_outside_restart": None,
+        "restart_s": (restart_t1 - restart_t0) if restart_t1 else None,
+        "all_workers_replaced": all(pids_after[p] != pids_before[p] for p in pids_before),
+        "shared_cache_entries": cache_entries,
+        "phases": {name: dict(_percentiles([r[2] for r in rows if r[3] is not None]),
+                              errors=sum(1 for r in rows if r[3] is None))
+                   for name, rows in phases.items()},
+    }
+    outside = [r for r in ok if r[1] < restart_t0 or r[1] >= restart_end]
+    if outside:
+        report["sticky_ratio_outside_restart"] = sum(1 for r in outside if r[3] == r[0]) / len(outside)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=5106)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60, help="Messdauer in Sekunden")
+    parser.add_argument("--restart-at", type=float, default=0.33,
+                        help="Zeitpunkt des SIGHUP als Anteil der Messdauer")
+    parser.add_argument("--cache", choices=("disk", "resp", "none"), default="disk")
+    parser.add_argument("--compute-workers", type=int, default=1, help="Rechen-Worker pro Serverprozess")
+    parser.add_argument("--timeout", type=float, default=30, help="Timeout pro Anfrage (s)")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--json", help="Ergebnis zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(f"{report['requests']} Anfragen, {report['errors']} Fehler, {report['failovers']} ausgewichen, "
+          f"Stickiness {report['sticky_ratio'] or 0:.1%} "
+          f"(ausserhalb Neustart {report['sticky_ratio_outside_restart'] or 0:.1%})")
+    print(f"Rolling restart: {report['restart_s'] or float('nan'):.1f} s, "
+          f"alle Prozesse ersetzt: {report['all_workers_replaced']}, "
+          f"Cache-Einträge: {report['shared_cache_entries']}")
+    for name, stats in report["phases"].items():
+        if stats["n"]:
+            print(f"  {name:<16} n={stats['n']:4d}  p50 {stats['p50_ms']:7.1f} ms  "
+                  f"p95 {stats['p95_ms']:7.1f} ms  p99 {stats['p99_ms']:7.1f} ms  Fehler {stats['errors']}")
+        else:
+            print(f"  {name:<16} keine erfolgreichen Anfragen, Fehler {stats['errors']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Lasttest mit gleichzeitigen Sessions gegen eine Instanz der App.
+
+Startet den Panel/Bokeh-Server im selben Prozess auf den synthetischen Daten
+(DASHBOARD_DATA=synthetic), erzeugt Sessions über HTTP wie ein Browser und
+steuert jede Session über ihre MainView: Variable, Aggregation und Datum ändern,
+Play drücken, Catchments antippen. Die Änderungen laufen im Kontext des
+Session-Dokuments, wie Events vom WebSocket.
+
+Eine Interaktion gilt als fertig, wenn alle betroffenen Karten berechnet und
+gebaut sind und die daraus folgenden Dokument-Updates ausgeführt wurden.
+Beim Play-Modus zählt jeder einzelne Frame.
+
+Die Anzahl Sessions wird stufenweise erhöht (--sessions 1 2 4 8 16). Berichtet
+werden pro Stufe und Interaktionstyp p50/p95/p99 und der Durchsatz, dazu CPU und
+RSS des Servers (inkl. Rechen-Worker) über die Zeit. Sättigungspunkt ist die
+erste Stufe, ab der das p95 aller Interaktionen über --slo-ms liegt oder der
+Durchsatz um weniger als --min-gain zulegt.
+
+Beispiele:
+    python -m benchmarks.load_sessions
+    python -m benchmarks.load_sessions --sessions 1 4 16 --duration 30 --json load_v2.json
+    python -m benchmarks.load_sessions --compare load_v1.json load_v2.json
+"""
+import os
+
+# Vor dem Import der App: Datenquelle und Backend stehen in den Settings
+os.environ.setdefault("DASHBOARD_DATA", "synthetic")
+
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # CPU/RSS-Messung optional
+    psutil = None
+
+INTERACTIONS = ("variable", "agg_method", "dates", "tap", "play")
+# Relative Häufigkeit der Interaktionen einer simulierten Session
+WEIGHTS = {"variable": 2, "agg_method": 2, "dates": 4, "tap": 2, "play": 1}
+
+
+class SessionDriver:
+    """Eine simulierte Nutzer-Session (Dokument + MainView)."""
+
+    def __init__(self, doc, view, rng):
+        self.doc = doc
+        self.view = view
+        self.rng = rng
+        centroids = view.gdf.geometry.representative_point()
+        self.tap_points = list(zip(centroids.x, centroids.y))
+        self.time_vars = [v for v in view.time_vars if v in view.all_vars]
+
+    def _in_doc(self, fn):
+        from panel.io.state import set_curdoc
+        with set_curdoc(self.doc):
+            fn()
+
+    async def _settled(self, table=False):
+        """Wartet, bis alle Karten (und ggf. die Tabelle) gebaut und die Dokument-Updates gelaufen sind."""
+        from panel.io.state import set_curdoc
+        with set_curdoc(self.doc):
+            await self.view._await_frame()
+            if table:
+                # Tabelle wird asynchron im Executor berechnet
+                await self.view.get_table()
+        done = asyncio.get_running_loop().create_future()
+        self.doc.add_next_tick_callback(lambda: done.done() or done.set_result(None))
+        await asyncio.wait_for(done, 60)
+
+    def _random_window(self):
+        view = self.view
+        t0, t1 = pd.Timestamp(view.time_min), pd.Timestamp(view.time_max)
+        days = int(self.rng.choice([7, 30, 90, 365]))
+        start = t0 + pd.Timedelta(days=int(self.rng.integers(0, max((t1 - t0).days - days, 1))))
+        return start.date(), (start + pd.Timedelta(days=days - 1)).date()
+
+    async def interact(self, kind, play_s):
+        """Führt eine Interaktion aus; gibt eine Liste von Latenzen (s) zurück."""
+        view = self.view
+        t0 = time.perf_counter()
+        if kind == "variable":
+            options = [v for v in self.time_vars if v != view.variable] or self.time_vars
+            self._in_doc(lambda: setattr(view, "variable", str(self.rng.choice(options))))
+        elif kind == "agg_method":
+            options = [a for a in view.param.agg_method.objects if a != view.agg_method]
+            self._in_doc(lambda: setattr(view, "agg_method", str(self.rng.choice(options))))
+        elif kind == "dates":
+            window = self._random_window()
+            self._in_doc(lambda: setattr(view, "date_range", window))
+        elif kind == "tap":
+            x, y = self.tap_points[int(self.rng.integers(len(self.tap_points)))]
+            self._in_doc(lambda: view.tap_stream.event(x=x, y=y))
+        elif kind == "play":
+            return await self._play(play_s)
+        await self._settled(table=kind == "tap")
+        return [time.perf_counter() - t0]
+
+    async def _play(self, play_s):
+        view = self.view
+        self._in_doc(lambda: setattr(view, "play_speed", view.param.play_speed.bounds[0]))
+        self._in_doc(lambda: view.param.trigger("play"))
+        await asyncio.sleep(play_s)
+        if view.playing:
+            self._in_doc(lambda: view.param.trigger("play"))
+        await asyncio.sleep(0)
+        return list(view.pacer.frame_history) if view.pacer is not None else []
+
+
+class ResourceSampler:
+    """CPU (%) und RSS (MB) des Serverprozesses inkl. Kindprozesse in festen Abständen."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.samples = []  # (t, Stufe, cpu_percent, rss_mb)
+        self.level = None
+        self._procs = {}
+
+    def _sample(self):
+        if psutil is None:
+            return None
+        main = psutil.Process(os.getpid())
+        procs = [main] + main.children(recursive=True)
+        cpu, rss = 0.0, 0
+        for proc in procs:
+            # cpu_percent braucht pro Prozess eine Referenzmessung
+            tracked = self._procs.setdefault(proc.pid, proc)
+            try:
+                cpu += tracked.cpu_percent(None)
+                rss += tracked.memory_info().rss
+            except psutil.Error:
+                self._procs.pop(proc.pid, None)
+        return cpu, rss / 2**20
+
+    async def run(self, t_start):
+        while True:
+            sample = self._sample()
+            if sample is not None:
+                self.samples.append((time.perf_counter() - t_start, self.level) + sample)
+            await asyncio.sleep(self.interval)
+
+
+def _percentiles(values):
+    if not values:
+        return {"n": 0}
+    arr = np.asarray(values) * 1000
+    return {"n": int(len(arr)), "p50_ms": float(np.percentile(arr, 50)),
+            "p95_ms": float(np.percentile(arr, 95)), "p99_ms": float(np.percentile(arr, 99))}
+
+
+async def _session_loop(driver, stop_at, warmup_until, records, errors, args):
+    kinds = list(WEIGHTS)
+    probs = np.array([WEIGHTS[k] for k in kinds], dtype=float)
+    probs /= probs.sum()
+    while time.perf_counter() < stop_at:
+        kind = str(driver.rng.choice(kinds, p=probs))
+        t = time.perf_counter()
+        try:
+            latencies = await driver.interact(kind, args.play_seconds)
+            if t >= warmup_until:
+                records.setdefault(kind, []).extend(latencies)
+        except Exception as exc:
+            errors[kind] = errors.get(kind, 0) + 1
+            if args.verbose:
+                print(f"[{kind}] {type(exc).__name__}: {exc}", file=sys.stderr)
+                traceback.print_exc()
+        # Denkzeit des Nutzers
+        await asyncio.sleep(float(driver.rng.uniform(*args.think_ms)) / 1000.0)
+
+
+async def _open_session(port, pending):
+    from tornado.httpclient import AsyncHTTPClient
+    response = await AsyncHTTPClient().fetch(f"http://127.0.0.1:{port}/", request_timeout=300)
+    if response.code != 200:
+        raise RuntimeError(f"HTTP {response.code}")
+    return pending.pop(0)
+
+
+async def run(args):
+    import panel as pn
+    from dashboard.app import build_app
+
+    pending = []
+
+    def app_factory():
+        template, view = build_app()
+        pending.append((pn.state.curdoc, view))
+        return template
+
+    server = pn.serve(app_factory, port=0, address="127.0.0.1", show=False, start=False,
+                      unused_session_lifetime_milliseconds=24 * 3600 * 1000)
+    server.start()
+    port = server.port
+
+    rng = np.random.default_rng(args.seed)
+    drivers = []
+    sampler = ResourceSampler()
+    t_start = time.perf_counter()
+    sampler_task = asyncio.ensure_future(sampler.run(t_start))
+    levels = []
+    try:
+        for n_sessions in args.sessions:
+            while len(drivers) < n_sessions:
+                doc, view = await _open_session(port, pending)
+                drivers.append(SessionDriver(doc, view, np.random.default_rng(rng.integers(2**32))))
+            sampler.level = n_sessions
+            records, errors = {}, {}
+            t0 = time.perf_counter()
+            stop_at = t0 + args.duration
+            await asyncio.gather(*(
+                _session_loop(d, stop_at, t0 + args.warmup, records, errors, args)
+                for d in drivers[:n_sessions]
+            ))
+            measured_s = max(time.perf_counter() - t0 - args.warmup, 1e-9)
+            interactive = [v for k, vals in records.items() if k != "play" for v in vals]
+            level_samples = [s for s in sampler.samples if s[1] == n_sessions]
+            level = {
+                "sessions": n_sessions,
+                "duration_s": measured_s,
+                "throughput_per_s": len(interactive) / measured_s,
+                "interactive": _percentiles(interactive),
+                "interactions": {k: dict(_percentiles(records.get(k, [])), errors=errors.get(k, 0))
+                                 for k in INTERACTIONS},
+                "cpu_percent_mean": float(np.mean([s[2] for s in level_samples])) if level_samples else None,
+                "rss_mb_max": float(np.max([s[3] for s in level_samples])) if level_samples else None,
+            }
+            levels.append(level)
+            _print_level(level)
+    finally:
+        sampler_task.cancel()
+        server.stop()
+
+    return {
+        "meta": _meta(args),
+        "levels": levels,
+        "saturation": _saturation(levels, args.slo_ms, args.min_gain),
+        "timeline": [{"t": round(s[0], 2), "sessions": s[1], "cpu_percent": round(s[2], 1),
+                      "rss_mb": round(s[3], 1)} for s in sampler.samples],
+    }
+
+
+def _saturation(levels, slo_ms, min_gain):
+    """Erste Stufe, die das SLO verletzt oder kaum mehr Durchsatz bringt."""
+    previous = None
+    for level in levels:
+        p95 = level["interactive"].get("p95_ms")
+        reason = None
+        if p95 is not None and p95 > slo_ms:
+            reason = f"p95 {p95:.0f} ms > {slo_ms:.0f} ms"
+        elif previous is not None and level["throughput_per_s"] < previous["throughput_per_s"] * (1 + min_gain):
+            reason = (f"Durchsatz {level['throughput_per_s']:.2f}/s "
+                      f"(+{level['throughput_per_s'] / max(previous['throughput_per_s'], 1e-9) - 1:.0%})")
+        if reason:
+            return {"saturated_at": level["sessions"],
+                    "max_sustainable_sessions": previous["sessions"] if previous else 0,
+                    "reason": reason}
+        previous = level
+    return {"saturated_at": None, "max_sustainable_sessions": previous["sessions"] if previous else 0,
+            "reason": "nicht erreicht"}
+
+
+def _meta(args):
+    from dashboard.config.settings import COMPUTE_BACKEND, COMPUTE_WORKERS
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "git_rev": rev,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "compute_backend": COMPUTE_BACKEND,
+        "compute_workers": COMPUTE_WORKERS,
+        "data": os.environ.get("DASHBOARD_DATA"),
+        "args": {k: v for k, v in vars(args).items() if k not in ("compare", "json")},
+    }
+
+
+def _print_level(level):
+    print(f"{level['sessions']:3d} Sessions: {level['throughput_per_s']:.2f} Interaktionen/s, "
+          f"CPU {level['cpu_percent_mean'] or float('nan'):.0f} %, RSS max {level['rss_mb_max'] or float('nan'):.0f} MB")
+    for kind, stats in level["interactions"].items():
+        if stats["n"]:
+            print(f"    {kind:<11} n={stats['n']:4d}  p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}  "
+                  f"p99 {stats['p99_ms']:8.1f} ms  Fehler {stats['errors']}")
+        elif stats["errors"]:
+            print(f"    {kind:<11} Fehler {stats['errors']}")
+
+
+def compare(base_path, new_path, tolerance):
+    """Vergleicht zwei JSON-Ergebnisse; gibt die Anzahl Regressionen zurück."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    base_levels = {lvl["sessions"]: lvl for lvl in base["levels"]}
+    print(f"Basis {base['meta'].get('git_rev') or base_path}  ->  neu {new['meta'].get('git_rev') or new_path}")
+    regressions = 0
+    for level in new["levels"]:
+        old = base_levels.get(level["sessions"])
+        if old is None:
+            continue
+        print(f"{level['sessions']:3d} Sessions  Durchsatz {old['throughput_per_s']:.2f} -> "
+              f"{level['throughput_per_s']:.2f}/s")
+        for kind in INTERACTIONS:
+            a, b = old["interactions"].get(kind, {}), level["interactions"].get(kind, {})
+            if not a.get("n") or not b.get("n"):
+                continue
+            cells = []
+            for q in ("p50_ms", "p95_ms", "p99_ms"):
+                change = b[q] / a[q] - 1 if a[q] > 0 else 0.0
+                flag = ""
+                if change > tolerance and q != "p99_ms":
+                    flag = " !"
+                    regressions += 1
+                cells.append(f"{q[:3]} {a[q]:7.1f} -> {b[q]:7.1f} ({change:+.0%}){flag}")
+            print(f"    {kind:<11} " + "  ".join(cells))
+    sat_a, sat_b = base["saturation"], new["saturation"]
+    print(f"Sättigung: {sat_a['max_sustainable_sessions']} -> {sat_b['max_sustainable_sessions']} Sessions")
+    print(f"{regressions} Regression(en) über {tolerance:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=20, help="Messdauer pro Stufe (s)")
+    parser.add_argument("--warmup", type=float, default=3, help="nicht gewertete Anlaufzeit pro Stufe (s)")
+    parser.add_argument("--think-ms", type=float, nargs=2, default=(200, 800),
+                        help="Denkzeit zwischen Interaktionen (min max)")
+    parser.add_argument("--play-seconds", type=float, default=3, help="Dauer eines Play-Laufs (s)")
+    parser.add_argument("--slo-ms", type=float, default=1000, help="p95-Grenze für die Sättigung")
+    parser.add_argument("--min-gain", type=float, default=0.1,
+                        help="minimaler relativer Durchsatzgewinn pro Stufe")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Ergebnis als JSON speichern")
+    parser.add_argument("--compare", nargs=2, metavar=("BASIS", "NEU"),
+                        help="zwei JSON-Ergebnisse vergleichen statt zu messen")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="erlaubte Verschlechterung (Vergleich)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.tolerance) else 0)
+
+    report = asyncio.run(run(args))
+    sat = report["saturation"]
+    print(f"Sättigung: {sat['saturated_at'] or '-'} Sessions ({sat['reason']}), "
+          f"haltbar: {sat['max_sustainable_sessions']} Sessions")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
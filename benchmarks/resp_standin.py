@@ -0,0 +1,115 @@
+"""
+Minimaler Redis-kompatibler Server (RESP2) als Ersatz für Tests und Lasttests ohne Redis.
+
+Unterstützt PING, GET, SET (mit EX/PX), DEL, EXISTS, DBSIZE, FLUSHDB und SELECT –
+genau das, was RedisResultCache braucht. Alles im Speicher, ein Thread pro Verbindung.
+
+    python -m benchmarks.resp_standin --port 6390
+    RESULT_CACHE_URL=redis://127.0.0.1:6390/0 python serve.py ...
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Store:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}  # key -> (value, Ablaufzeit oder None)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] < time.monotonic():
+                del self.data[key]
+                return None
+            return entry[0]
+
+
+def _read_command(reader):
+    line = reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()  # Inline-Befehl (z.B. PING aus telnet)
+    args = []
+    for _ in range(int(line[1:-2])):
+        n = int(reader.readline()[1:-2])
+        args.append(reader.read(n + 2)[:-2])
+    return args
+
+
+def _bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = _read_command(self.rfile)
+            if not args:
+                return
+            cmd = args[0].upper()
+            if cmd == b"PING":
+                reply = b"+PONG\r\n"
+            elif cmd == b"GET":
+                reply = _bulk(store.get(args[1]))
+            elif cmd == b"SET":
+                expires = None
+                opts = [a.upper() for a in args[3:]]
+                for i, opt in enumerate(opts):
+                    if opt in (b"EX", b"PX"):
+                        seconds = int(args[4 + i]) / (1000 if opt == b"PX" else 1)
+                        expires = time.monotonic() + seconds
+                with store.lock:
+                    store.data[args[1]] = (args[2], expires)
+                reply = b"+OK\r\n"
+            elif cmd in (b"DEL", b"EXISTS"):
+                with store.lock:
+                    found = [k for k in args[1:] if k in store.data]
+                    if cmd == b"DEL":
+                        for k in found:
+                            del store.data[k]
+                reply = b":%d\r\n" % len(found)
+            elif cmd == b"DBSIZE":
+                reply = b":%d\r\n" % len(store.data)
+            elif cmd == b"FLUSHDB":
+                with store.lock:
+                    store.data.clear()
+                reply = b"+OK\r\n"
+            elif cmd == b"SELECT":
+                reply = b"+OK\r\n"
+            else:
+                reply = b"-ERR unknown command '%s'\r\n" % cmd
+            self.wfile.write(reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, RespHandler)
+        self.store = _Store()
+
+
+def start_standin(host="127.0.0.1", port=0):
+    """Server im Hintergrund-Thread starten; gibt (server, port) zurück."""
+    server = RespServer((host, port))
+    threading.Thread(target=server.serve_forever, name="resp-standin", daemon=True).start()
+    return server, server.server_address[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    print(f"RESP stand-in auf {args.host}:{args.port}", flush=True)
+    RespServer((args.host, args.port)).serve_forever()
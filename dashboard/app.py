@@ -20,26 +20,65 @@ hv.extension("bokeh")
 
 from dashboard.widgets.speed_widget import decrease_speed, increase_speed
 from dashboard.widgets.date_picker import on_start_change, on_end_change
-from dashboard.config.settings import END_DATE, START_DATE, YEAR_START_DATE, YEAR_END_DATE, INIT_DAY_STRIDE
+from dashboard.config.settings import END_DATE, START_DATE, YEAR_START_DATE, YEAR_END_DATE, INIT_DAY_STRIDE, DATA_SOURCE, \
+    INGEST_DIR, INGEST_POLL_S
 from dashboard.views.main_view import MainView
 from dashboard.views.modal_view import show_var_infos
 from dashboard.views.sidebar_view import create_sidebar, create_sidebar_widgets
-from dashboard.widgets.year_range_slider import set_map_bounds
+from dashboard.widgets.year_range_slider import set_map_bounds, extend_time_bounds
 from dashboard.css.custom_css import load_custom_css
-from dashboard.data.data_loader import load_data, get_time_bounds, get_variable_lists, get_var_colormaps
+from dashboard.data.data_loader import load_shared_data, load_shared_synthetic_data, get_time_bounds, get_variable_lists, get_var_colormaps
+from dashboard.data.memory_report import print_startup_report
+from dashboard.views.time_arrays import attach_shared_store
+from dashboard.views.job_scheduler import update_job_data
+from dashboard.data.ingest import start_ingest
+from dashboard.data.scenarios import get_catalog
 
 def create_app():
+    return build_app()[0]
+
+# Aktueller Stand (gdf, ds, shap_ds); nach einem Ingest die verlängerten Datensätze
+_app_data = None
+
+def load_app_data():
+    """Daten der App: einmal pro Prozess geladen, von allen Sessions und der Daten-API geteilt."""
+    global _app_data
+    if _app_data is not None:
+        return _app_data
     # Pfade anpassen:
     script_dir = Path(__file__).resolve().parent
     netcdf_path = script_dir.parent / "data" / "CHRUN" / "chrun.nc"
     shapefile_path = script_dir.parent / "data" / "CHRUN" / "catchments" / 'catchments.shp'
     shap_ds_path = script_dir.parent / "data" / "model" / "shap_rnn.nc"
 
+    if DATA_SOURCE == 'synthetic':
+        gdf, ds, shap_ds = load_shared_synthetic_data()
+    else:
+        gdf, ds, shap_ds = load_shared_data(shapefile_path, netcdf_path, shap_ds_path)
+    # Mehrprozess-Betrieb: Zeitvariablen aus dem gemeinsamen memory-mapped Speicher
+    attach_shared_store(ds)
+    attach_shared_store(shap_ds)
+    _app_data = (gdf, ds, shap_ds)
+    # Neue Tage aus dem Ablageverzeichnis anhängen (INGEST_DIR)
+    start_ingest(INGEST_DIR, INGEST_POLL_S, ds, shap_ds, on_append=_on_data_appended)
+    return _app_data
+
+def _on_data_appended(ds, shap_ds, first_new):
+    """Ingest: neue Sessions, Daten-API und Executor arbeiten ab jetzt mit den verlängerten Daten."""
+    global _app_data
+    _app_data = (_app_data[0], ds, shap_ds)
+    # Die geladenen Ausgangsdaten nicht zusätzlich im Speicher halten
+    load_shared_data.cache_clear()
+    load_shared_synthetic_data.cache_clear()
+    update_job_data(ds, shap_ds)
+
+def build_app():
+    """Baut eine Session der App und gibt (Template, MainView) zurück (MainView z.B. für Lasttests)."""
     # Custom CSS laden (falls vorhanden)
     load_custom_css()
 
-    # Daten laden
-    gdf, ds, shap_ds = load_data(shapefile_path, netcdf_path, shap_ds_path)
+    # Daten laden (einmal pro Prozess, von allen Sessions geteilt)
+    gdf, ds, shap_ds = load_app_data()
     time_min, time_max = get_time_bounds(ds)
     all_vars, time_vars, static_vars, var_metadata = get_variable_lists(ds)
     var_cmaps = get_var_colormaps()
@@ -65,6 +104,9 @@ def create_app():
         day_stride=INIT_DAY_STRIDE,
     )
 
+    # Speicherbericht (Variablen, Caches, Worker) beim Start
+    print_startup_report({'chrun': ds, 'shap': shap_ds}, main_view._executor)
+
     # Widgets für Sidebar erstellen
     (end_date_picker,
      info_button,
@@ -76,7 +118,16 @@ def create_app():
      play_button,
      speed_minus,
      speed_input,
-     speed_plus
+     speed_plus,
+     play_stats,
+     adaptive_speed,
+     map_mode_selector,
+     ref_period_slider,
+     clim_basis_selector,
+     scenario_selector,
+     compare_scenario_selector,
+     event_percentile_selector,
+     event_metric_selector
      ) = create_sidebar_widgets(
         time_min,
         time_max,
@@ -85,7 +136,8 @@ def create_app():
         START_DATE,
         END_DATE,
         all_vars,
-        var_metadata
+        var_metadata,
+        get_catalog()
     )
 
     # Verknüpfungen der Widgets
@@ -111,6 +163,22 @@ def create_app():
     speed_minus.on_click(lambda event: decrease_speed(speed_input, main_view.param.play_speed.bounds))
     speed_plus.on_click(lambda event: increase_speed(speed_input, main_view.param.play_speed.bounds))
     speed_input.link(main_view, value='play_speed', bidirectional=True)
+    adaptive_speed.link(main_view, value='play_adaptive', bidirectional=True)
+    main_view.param.watch(lambda event: setattr(play_stats, 'object', event.new), 'play_stats')
+    map_mode_selector.link(main_view, value='map_mode', bidirectional=True)
+    # Referenzperiode ist auf den Datenzeitraum begrenzt
+    main_view.ref_period = ref_period_slider.value
+    ref_period_slider.link(main_view, value='ref_period', bidirectional=True)
+    clim_basis_selector.link(main_view, value='clim_basis', bidirectional=True)
+    scenario_selector.link(main_view, value='scenario', bidirectional=True)
+    compare_scenario_selector.link(main_view, value='compare_scenario', bidirectional=True)
+    event_percentile_selector.link(main_view, value='event_percentile', bidirectional=True)
+    event_metric_selector.link(main_view, value='event_metric', bidirectional=True)
+    # Neue Tage (Ingest): Jahres-Slider, Datumsauswahl und Referenzperiode erweitern
+    main_view.param.watch(partial(extend_time_bounds,
+                                  year_range_slider=year_range_slider,
+                                  end_date_picker=end_date_picker,
+                                  ref_period_slider=ref_period_slider), 'data_end')
 
     # Sidebar-Layout erstellen, indem die bereits erstellten Widgets übergeben werden
     sidebar = create_sidebar(
@@ -124,7 +192,16 @@ def create_app():
         play_button,
         speed_minus,
         speed_input,
-        speed_plus
+        speed_plus,
+        play_stats,
+        adaptive_speed,
+        map_mode_selector,
+        ref_period_slider,
+        clim_basis_selector,
+        scenario_selector,
+        compare_scenario_selector,
+        event_percentile_selector,
+        event_metric_selector
     )
 
     # Füge die einzelnen Teile zusammen
@@ -133,9 +210,10 @@ def create_app():
     info_pane = pn.pane.HTML("", sizing_mode="stretch_width")
     bootstrap.modal.append(info_pane)
 
-    return bootstrap
+    return bootstrap, main_view
 
 
 if __name__ == "__main__":
     # Serve the app via a factory to ensure a fresh Document per session
-    pn.serve(create_app, title="Water Runoff Dashboard", show=True, port=1961)
+    from dashboard.views.data_api import API_PATTERNS
+    pn.serve(create_app, title="Water Runoff Dashboard", show=True, port=1961, extra_patterns=API_PATTERNS)
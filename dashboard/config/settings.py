@@ -1,4 +1,5 @@
 import datetime
+import os
 import pandas as pd
 
 # Anfangsvariablen für Dashboard
@@ -23,4 +24,154 @@ TIME_MAX = pd.Timestamp("2100-01-01").date()
 INIT_SPEED_MS = 4000
 
 # Aggregation
-INIT_AGG_METHOD = 'mean'
\ No newline at end of file
+INIT_AGG_METHOD = 'mean'
+
+# Request-Scheduler: Ruhezeit, bevor eine Kartenberechnung abgeschickt wird
+DEBOUNCE_MS = 150
+
+# Rechen-Backend für die Kartenberechnungen: 'process', 'thread' oder 'inline'
+# (überschreibbar per Umgebungsvariable, z.B. DASHBOARD_COMPUTE_BACKEND=thread)
+COMPUTE_BACKEND = os.environ.get("DASHBOARD_COMPUTE_BACKEND", "process")
+COMPUTE_WORKERS = int(os.environ.get("DASHBOARD_COMPUTE_WORKERS", os.cpu_count() or 1))
+
+# Job-Scheduler vor dem Executor: Priorität pro Slot (kleiner = zuerst). Die sichtbare
+# Hauptkarte geht vor SHAP-/Differenzkarte, Fenstervergleich und Tabelle, dann Daten-API, Prefetch
+# (nächster Play-Frame) zuletzt.
+JOB_PRIORITIES = {'map': 0, 'shap': 1, 'diff': 1, 'compare': 1, 'table': 1, 'drivers': 2, 'api': 2, 'prefetch': 3}
+# Anzahl Worker, die Prefetch-Jobs nie belegen (frei für Klicks anderer Sessions)
+JOB_PREFETCH_RESERVE = 1
+
+# Karten-Rendering: 'vector' (gv.Polygons, jedes Polygon im Browser) oder 'raster'
+# (einmal gerastertes HRU-ID-Gitter, pro Frame nur ein eingefärbtes Bild)
+MAP_RENDER_ENGINE = os.environ.get("DASHBOARD_MAP_ENGINE", "vector")
+# Gitterbreiten (Pixel) der Rasterstufen; gewählt wird die kleinste >= Kartenbreite * RASTER_PIXEL_RATIO
+# (Bilder gehen als float32-Arrays an den Browser: Pixelzahl bestimmt die Übertragungsgrösse)
+RASTER_GRID_WIDTHS = (400, 800, 1600)
+RASTER_PIXEL_RATIO = 1
+
+# Statische und dynamische Modell-Features pro HRU
+STATIC_FEATURES = [
+    'abb', 'area', 'atb', 'btk', 'dhm', 'glm', 'kwt', 'pfc',
+    'frac_water', 'frac_urban_areas', 'frac_coniferous_forests',
+    'frac_deciduous_forests', 'frac_mixed_forests', 'frac_cereals',
+    'frac_pasture', 'frac_bush', 'frac_unknown', 'frac_firn',
+    'frac_bare_ice', 'frac_rock', 'frac_vegetables',
+    'frac_alpine_vegetation', 'frac_wetlands',
+    'frac_sub_Alpine_meadow', 'frac_alpine_meadow',
+    'frac_bare_soil_vegetation', 'frac_grapes', 'slp'
+]
+DYNAMIC_FEATURES = ['P', 'T']
+
+# Inkrementelle Fenster-Aggregation (Slider-Drag): max. verschobene Tage relativ zur Fensterlänge,
+# bei max/min zusätzlich absolute Obergrenze; Anzahl gehaltener Zustände pro Prozess
+SLIDING_MAX_STEP_RATIO = 0.5
+SLIDING_MAX_STEP_DAYS = 62
+SLIDING_MAX_SESSIONS = 64
+
+# Quantil-/std-Aggregationen: Blocklängen (Tage) der Sketch-Ebenen, Stützpunkte pro Block
+# (Rang-Fehler <= 1/SKETCH_POINTS) und Fensterlänge, bis zu der exakt gerechnet wird
+SKETCH_BLOCK_LEVELS = (4096, 256)
+SKETCH_POINTS = 64
+SKETCH_EXACT_MAX_DAYS = 730
+SKETCH_FORCE_EXACT = os.environ.get("DASHBOARD_SKETCH_EXACT", "0") == "1"
+
+# Verfügbare Aggregationsfunktionen
+AGG_METHODS = ['sum', 'mean', 'max', 'min', 'median', 'p90', 'p99', 'std']
+
+# Klimatologie / Anomalie-Modus: Referenzperiode (Jahre) und Glättung der Tagesklimatologie (Tage)
+CLIMATOLOGY_REF_PERIOD = (1981, 2010)
+CLIMATOLOGY_SMOOTH_DAYS = 31
+# Baselines der übrigen Aggregationen (Mittel über die Referenzjahre): max. Einträge pro Klimatologie
+CLIMATOLOGY_BASELINE_CACHE = 512
+# Max. Werte (Jahre × Tage × HRUs) pro gestapelter Reduktion der Referenzfenster
+CLIMATOLOGY_STACK_ELEMENTS = 2 ** 23
+
+# Farbskalen: feste clim pro (Variable, Aggregation, Fensterlängen-Klasse) aus robusten Quantilen
+# über den ganzen Datensatz. Fensterlängen (Tage) der Klassen, max. Anzahl Stichproben-Fenster
+# pro Skala und die verwendeten Perzentile
+COLOR_SCALE_BUCKETS = (1, 7, 30, 91, 365, 1826, 3652)
+COLOR_SCALE_MAX_WINDOWS = 128
+COLOR_SCALE_PERCENTILES = (2, 98)
+
+# Zeitreihen der angeklickten HRU: (Datensatz, Variable) pro Kurve, Breite der Kurven (Pixel) und
+# Reduktion auf die Pixelbreite: 'lttb' (Largest-Triangle-Three-Buckets) oder 'minmax' (Min/Max pro Pixel)
+TIMESERIES_VARS = (('ds', 'P'), ('ds', 'T'), ('ds', 'Qmm_mod'), ('ds', 'Qmm_prevah'), ('shap', 'Y'))
+TIMESERIES_WIDTH = 800
+TIMESERIES_DOWNSAMPLE = os.environ.get("DASHBOARD_TIMESERIES_DOWNSAMPLE", "lttb")
+
+# Treiber-Ranking der statischen Attribute: Zielgrössen (Fenster-Aggregat über alle HRUs; 'Y' =
+# Runoff-Differenz, 'shap' = SHAP-Werte der gewählten Variable), Korrelationsmasse, Anzahl
+# angezeigter Attribute und Quantil-Klassen der Antwortkurven (partielle Abhängigkeit)
+DRIVER_TARGETS = ('Qmm_mod', 'Qmm_prevah', 'Y', 'shap')
+DRIVER_METHODS = ('spearman', 'pearson')
+DRIVER_TOP_N = 10
+DRIVER_PD_BINS = 5
+DRIVER_PD_CURVES = 3
+
+# Gebietssummen (ganzes Gebiet und Regionen): JSON-Datei {Name: {"label": ..., "hru": [IDs]} oder
+# {"label": ..., "polygon": [[lon, lat], ...] bzw. GeoJSON-Geometrie}}; leer = nur das ganze Gebiet.
+# Variablen mit Einheit in REGION_VOLUME_UNITS werden als Volumen (Wert × Fläche) summiert, alle
+# anderen flächengewichtet gemittelt. Fläche der Variable 'area' in m² pro Einheit (Standard km²)
+REGIONS_FILE = os.environ.get("DASHBOARD_REGIONS", "")
+DOMAIN_REGION = 'domain'
+DOMAIN_REGION_LABEL = 'Switzerland (all HRUs)'
+REGION_TOTAL_VARS = ('P', 'Qmm_mod', 'Qmm_prevah', 'T')
+REGION_VOLUME_UNITS = ('mm d-1', 'mm/d', 'mm')
+AREA_UNIT_M2 = float(os.environ.get("DASHBOARD_AREA_UNIT_M2", 1e6))
+# Zeitblock (Tage) des dünnbesetzten Produkts (Regionen × HRUs) · (HRUs × Tage)
+REGION_CHUNK_DAYS = 512
+
+# Ereignis-Index (Kartenmodus 'Exceedance events'): Variablen, Perzentil-Schwellen pro HRU (über
+# die Referenzperiode der Anomalien) und Kennzahlen pro Fenster: Tage über der Schwelle, Anzahl
+# Episoden, längste Episode (Tage) und erstes Auftreten (Tage ab Fensterbeginn)
+EVENT_VARS = ('P', 'Qmm_mod', 'Qmm_prevah')
+EVENT_PERCENTILES = (90, 95, 99)
+EVENT_METRICS = ('days', 'episodes', 'max_length', 'first_day')
+
+# Speicherarmer Lade-Modus: Variablen erst bei Bedarf laden, als float32 (Standard nur im
+# Lean-Modus) und kompakter hru-Index. FLOAT32_RTOL ist die Rundungsschranke von float32
+# (2^-24) für Werte im Normalbereich: grössere relative Fehler entstehen nur bei Überlauf oder
+# subnormalen Werten, solche Variablen bleiben float64
+LEAN_LOAD = os.environ.get("DASHBOARD_LEAN_LOAD", "0") == "1"
+FLOAT32_DOWNCAST = os.environ.get("DASHBOARD_FLOAT32", "1" if LEAN_LOAD else "0") == "1"
+FLOAT32_RTOL = 2.0 ** -24
+
+# Mehrprozess-Betrieb (serve.py): gemeinsamer memory-mapped Datenspeicher (Verzeichnis mit
+# einer .npy-Datei pro Zeitvariable) und geteilter Resultat-Cache
+# ('disk:///pfad', 'redis://host:port/db' oder leer = kein geteilter Cache)
+SHARED_STORE_DIR = os.environ.get("DASHBOARD_SHARED_STORE", "")
+RESULT_CACHE_URL = os.environ.get("RESULT_CACHE_URL", "")
+RESULT_CACHE_TTL_S = int(os.environ.get("RESULT_CACHE_TTL_S", 24 * 3600))
+RESULT_CACHE_MAX_MB = 512
+
+# Inkrementelles Anhängen neuer Tage: Ablageverzeichnis mit NetCDF-Inkrementen (shap_*.nc für
+# shap_ds, alle anderen für ds; leer = aus) und Abfrageintervall (s)
+INGEST_DIR = os.environ.get("DASHBOARD_INGEST_DIR", "")
+INGEST_POLL_S = float(os.environ.get("DASHBOARD_INGEST_POLL_S", 30))
+
+# Datenquelle der App: 'files' (data/CHRUN, data/model) oder 'synthetic' (Lasttests, Benchmarks)
+DATA_SOURCE = os.environ.get("DASHBOARD_DATA", "files")
+
+# Szenario-Katalog: JSON-Datei {Name: {"path": NetCDF, "label": Anzeigename}} mit weiteren
+# Modellläufen bzw. Klimaszenarien (gleiches hru-Layout wie chrun.nc); leer = nur Basisdaten
+SCENARIO_CATALOG = os.environ.get("DASHBOARD_SCENARIOS", "")
+# Name der Basisdaten (chrun.nc) in der Szenario-Auswahl
+BASE_SCENARIO = 'baseline'
+# Speicherbudget (MB) für geöffnete Szenarien samt abgeleiteter Caches, pro Serverprozess und
+# auf ihn und seine Rechen-Worker aufgeteilt; am längsten unbenutzte werden geschlossen
+SCENARIO_MEMORY_MB = float(os.environ.get("DASHBOARD_SCENARIO_MEMORY_MB", 2048))
+# Zeitblock (Tage) der Differenzkarte: beide Szenarien werden blockweise gemeinsam reduziert
+SCENARIO_DIFF_CHUNK_DAYS = 256
+
+# Profiler (opt-in): 'off' (Standard, kein Overhead), 'url' (nur Sessions mit ?profile=1),
+# 'on' (alle Sessions). Engine 'sample' (collapsed stacks für Flamegraphs), 'cprofile'
+# (.prof für pstats/snakeviz, nur synchrone Aufrufe) oder 'both'
+PROFILE_MODE = os.environ.get("DASHBOARD_PROFILE", "off")
+PROFILE_ENGINE = os.environ.get("DASHBOARD_PROFILE_ENGINE", "sample")
+PROFILE_DIR = os.environ.get("DASHBOARD_PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_MS = 5
+
+# Daten-API (/api/aggregate, /api/timeseries, /api/regions): HRUs pro Record-Batch bei Zeitreihen
+# und maximale Anzahl Variablen pro Anfrage
+API_BATCH_HRUS = 32
+API_MAX_VARIABLES = 16
@@ -1,27 +1,88 @@
+import functools
+
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import xarray as xr
 from pathlib import Path
 
-def load_data(shp_path, nc_path, shap_ds_path):
+from dashboard.config.settings import LEAN_LOAD, FLOAT32_RTOL
+
+def load_data(shp_path, nc_path, shap_ds_path, lean=LEAN_LOAD):
     """
-    Lädt die Shapefile- und NetCDF-Daten und gibt (gdf, ds) zurück.
+    Lädt die Shapefile- und NetCDF-Daten und gibt (gdf, ds, shap_ds) zurück.
     - gdf: GeoDataFrame mit den Catchment-Polygonen
     - ds: xarray Dataset mit den Variablen
+    - shap_ds: xarray Dataset mit den SHAP-Werten
+    Im Lean-Modus werden zeitabhängige Variablen erst bei der ersten Berechnung
+    geladen (siehe time_arrays.time_major_values) und nicht im xarray-Cache gehalten.
     """
     # Shapefile laden
     gdf = gpd.read_file(shp_path)
 
     # NetCDF laden
-    ds = xr.open_dataset(nc_path)
-    shap_ds = xr.open_dataset(shap_ds_path)
+    ds = xr.open_dataset(nc_path, cache=not lean)
+    shap_ds = xr.open_dataset(shap_ds_path, cache=not lean)
 
     # Neu: Reprojektion von EPSG:21781 zu EPSG:4326
     if gdf.crs is not None and gdf.crs.to_string() == "EPSG:21781":
         gdf = gdf.to_crs(epsg=4326)
 
+    if lean:
+        ds, shap_ds, gdf = compact_hru_index(ds, shap_ds, gdf)
+        # Statische Variablen sind klein: einmal laden statt bei jedem Zugriff von Disk
+        for var_name in ds.data_vars:
+            if 'time' not in ds[var_name].dims:
+                ds[var_name] = ds[var_name].load()
+
     return gdf, ds, shap_ds
 
+@functools.lru_cache(maxsize=None)
+def load_shared_data(shp_path, nc_path, shap_ds_path):
+    """load_data einmal pro Prozess; alle Sessions teilen sich gdf, ds und shap_ds (read-only)."""
+    return load_data(shp_path, nc_path, shap_ds_path)
+
+@functools.lru_cache(maxsize=None)
+def load_shared_synthetic_data():
+    """
+    Synthetische Daten (fester Seed) einmal pro Prozess – alle Prozesse erzeugen dieselben Daten.
+    Zeitraum 2014–2023, damit die Standard-Datumsauswahl der App Daten enthält.
+    """
+    from dashboard.data.synthetic_data import make_synthetic_data
+    return make_synthetic_data(start="2014-01-01", n_days=3652)
+
+def compact_hru_index(ds, shap_ds, gdf):
+    """hru-Koordinate (und gdf['hru']) auf den kleinsten passenden Integer-Typ verkleinern."""
+    hru = ds['hru'].values
+    if not np.issubdtype(hru.dtype, np.integer):
+        return ds, shap_ds, gdf
+    dtype = np.int16 if hru.min() >= np.iinfo(np.int16).min and hru.max() <= np.iinfo(np.int16).max else np.int32
+    if hru.max() > np.iinfo(np.int32).max:
+        return ds, shap_ds, gdf
+    ds = ds.assign_coords(hru=hru.astype(dtype))
+    if 'hru' in shap_ds.coords:
+        shap_ds = shap_ds.assign_coords(hru=shap_ds['hru'].values.astype(dtype))
+    gdf = gdf.assign(hru=gdf['hru'].astype(dtype))
+    return ds, shap_ds, gdf
+
+def downcast_float32(values, var_name=None, rtol=FLOAT32_RTOL):
+    """
+    float64 -> float32, falls der maximale relative Fehler <= rtol ist (Standard: reine
+    Rundung im Normalbereich von float32, d.h. kein Überlauf und keine subnormalen Werte).
+    Gibt (values, max_rel_err) zurück; bei Überschreitung bleibt float64 erhalten.
+    """
+    if values.dtype != np.float64:
+        return values, 0.0
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        downcast = values.astype(np.float32)
+        abs_err = np.abs(downcast.astype(np.float64) - values)
+        rel_err = np.where(values != 0, abs_err / np.abs(values), abs_err)
+    max_err = float(np.nanmax(rel_err)) if rel_err.size else 0.0
+    # inf (Überlauf) fällt hier ebenfalls durch
+    if not np.isfinite(max_err) or max_err > rtol:
+        return values, max_err
+    return downcast, max_err
+
 def get_time_bounds(ds):
     """
     Ermittelt das erste und letzte Datum im Datensatz ds (Annahme: ds.time existiert).
@@ -0,0 +1,204 @@
+"""
+Inkrementelles Anhängen neuer Tage an die laufenden Datensätze (ohne Neustart).
+
+Ein Ablageverzeichnis (INGEST_DIR) wird alle INGEST_POLL_S Sekunden nach NetCDF-Inkrementen
+(hru, time) abgefragt: shap_*.nc wird an shap_ds angehängt, jede andere .nc-Datei an ds.
+Übernommen werden nur Tage nach dem bisherigen Datenende; die Dateien bleiben liegen, so
+holen alle Serverprozesse (serve.py) und ein Neustart denselben Stand nach.
+
+Die Datensätze werden nicht verändert, sondern durch verlängerte Kopien ersetzt. Damit die
+Caches nicht kalt werden, übertragen Module mit abgeleiteten Strukturen ihre Einträge über
+register_append_hook(name, hook) auf den neuen Datensatz (hook(alt, neu, n_alt), n_alt =
+bisherige Anzahl Tage) und verlängern sie dabei nur um die neuen Tage. Danach werden der
+Rückruf der App (Executor, geteilte Daten) und die registrierten Sessions benachrichtigt.
+Dieselben Hooks geben mit neu=None die Einträge eines verworfenen Datensatzes frei
+(release_dataset, z.B. ein aus dem Szenario-Katalog verdrängtes Szenario).
+"""
+import asyncio
+import threading
+import traceback
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# name -> hook(old_dataset, new_dataset, n_old)
+_append_hooks = {}
+_append_hooks_lock = threading.Lock()
+# Objekte mit on_data_appended(ds, shap_ds, first_new) – typischerweise MainViews
+_listeners = weakref.WeakSet()
+
+
+def register_append_hook(name, hook):
+    """
+    Hook, der Cache-Einträge eines Datensatzes auf seinen verlängerten Nachfolger überträgt
+    (bzw. nur entfernt, wenn der Nachfolger None ist).
+    """
+    with _append_hooks_lock:
+        _append_hooks[name] = hook
+
+
+def register_data_listener(listener):
+    """listener.on_data_appended(ds, shap_ds, first_new) nach jedem Anhängen (schwach referenziert)."""
+    _listeners.add(listener)
+
+
+def _run_append_hooks(old, new, n_old):
+    with _append_hooks_lock:
+        hooks = list(_append_hooks.items())
+    for name, hook in hooks:
+        try:
+            hook(old, new, n_old)
+        except Exception:
+            print(f"[ingest] Hook '{name}' fehlgeschlagen:\n{traceback.format_exc()}")
+
+
+def append_increment(dataset, increment):
+    """
+    Hängt die Tage aus increment an dataset an und gibt (neuer Datensatz, Anzahl neuer Tage) zurück.
+    Tage bis zum bisherigen Ende werden übersprungen, Lücken als tägliche NaN-Werte aufgefüllt.
+    Fehlende HRUs und Zeitvariablen, die im Inkrement fehlen, sind NaN; statische Variablen
+    und Attribute bleiben unverändert.
+    """
+    if 'time' not in increment.dims:
+        raise ValueError("Inkrement ohne Zeitachse")
+    end = dataset.indexes['time'][-1]
+    times = increment.indexes['time']
+    increment = increment.isel(time=np.flatnonzero(times > end))
+    if increment.sizes['time'] == 0:
+        return dataset, 0
+    new_times = pd.date_range(end + pd.Timedelta(days=1), increment.indexes['time'].max(), freq='D')
+    increment = increment.reindex(time=new_times, hru=dataset['hru'].values)
+    time_vars = [v for v in dataset.data_vars if 'time' in dataset[v].dims]
+    tail = {}
+    for var_name in time_vars:
+        dims = dataset[var_name].dims
+        if var_name in increment:
+            values = increment[var_name].transpose(*dims).values
+        else:
+            values = np.full([len(new_times) if d == 'time' else dataset.sizes[d] for d in dims], np.nan)
+        tail[var_name] = (dims, values.astype(dataset[var_name].dtype, copy=False), dataset[var_name].attrs)
+    tail = xr.Dataset(tail, coords={'hru': dataset['hru'].values,
+                                    'time': new_times.values.astype(dataset['time'].dtype)})
+    extended = xr.concat([dataset[time_vars], tail], dim='time', data_vars='all', coords='minimal',
+                         join='override', combine_attrs='override')
+    for var_name in dataset.data_vars:
+        if var_name not in time_vars:
+            extended[var_name] = dataset[var_name]
+    extended.attrs = dict(dataset.attrs)
+    return extended, len(new_times)
+
+
+def release_dataset(dataset):
+    """Abgeleitete Cache-Einträge eines nicht mehr verwendeten Datensatzes freigeben."""
+    _run_append_hooks(dataset, None, dataset.sizes.get('time', 0))
+
+
+def append_and_migrate(dataset, increment):
+    """append_increment und Übertragung der Caches (Hooks). Gibt (Datensatz, neue Tage) zurück."""
+    extended, n_new = append_increment(dataset, increment)
+    if n_new:
+        _run_append_hooks(dataset, extended, dataset.sizes['time'])
+    return extended, n_new
+
+
+class IngestWatcher:
+    """
+    Fragt das Ablageverzeichnis ab und hängt neue Inkremente an (ds bzw. shap_ds).
+    on_append(ds, shap_ds, first_new) läuft danach im Event-Loop, ebenso die Sessions.
+    """
+
+    def __init__(self, drop_dir, ds, shap_ds, on_append=None):
+        self.drop_dir = Path(drop_dir)
+        self.datasets = {'ds': ds, 'shap': shap_ds}
+        self.on_append = on_append
+        # Dateiname -> (mtime, Grösse) bereits gelesener Dateien
+        self._seen = {}
+        self._running = False
+
+    def _pending(self):
+        files = []
+        for path in sorted(self.drop_dir.glob('*.nc')):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature = (stat.st_mtime, stat.st_size)
+            if self._seen.get(path.name) != signature:
+                files.append((path, signature))
+        return files
+
+    def poll(self, until=None):
+        """
+        Neue Dateien anhängen (blockierend). Gibt das erste neue Datum oder None zurück.
+        until (Ziel -> letztes Datum) begrenzt die übernommenen Tage, z.B. damit ein
+        Rechen-Worker genau den Stand seines Servers nachholt; gekürzte Dateien gelten
+        dann noch nicht als gelesen.
+        """
+        first_new = None
+        for path, signature in self._pending():
+            target = 'shap' if path.name.startswith('shap_') else 'ds'
+            dataset = self.datasets[target]
+            complete = True
+            try:
+                if dataset is None:
+                    raise ValueError(f"kein Datensatz '{target}' geladen")
+                with xr.open_dataset(path) as increment:
+                    increment = increment.load()
+                if until is not None and until.get(target) is not None:
+                    later = increment.indexes['time'] > pd.Timestamp(until[target])
+                    complete = not later.any()
+                    increment = increment.isel(time=np.flatnonzero(~later))
+                extended, n_new = append_and_migrate(dataset, increment)
+            except Exception as exc:
+                print(f"[ingest] {path.name}: {exc}")
+            else:
+                if n_new:
+                    start = extended.indexes['time'][-n_new].date()
+                    first_new = start if first_new is None else min(first_new, start)
+                    self.datasets[target] = extended
+                    print(f"[ingest] {path.name}: {n_new} Tage an {target} angehängt "
+                          f"(bis {extended.indexes['time'][-1].date()})")
+            if complete:
+                self._seen[path.name] = signature
+        return first_new
+
+    async def poll_async(self):
+        """Abfrage im Thread-Pool; Benachrichtigungen im Event-Loop."""
+        if self._running:
+            return
+        self._running = True
+        try:
+            first_new = await asyncio.get_running_loop().run_in_executor(None, self.poll)
+        finally:
+            self._running = False
+        if first_new is not None:
+            self.notify(first_new)
+
+    def notify(self, first_new):
+        ds, shap_ds = self.datasets['ds'], self.datasets['shap']
+        if self.on_append is not None:
+            self.on_append(ds, shap_ds, first_new)
+        for listener in list(_listeners):
+            listener.on_data_appended(ds, shap_ds, first_new)
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def start_ingest(drop_dir, poll_s, ds, shap_ds, on_append=None):
+    """Startet die periodische Abfrage im laufenden Tornado-Loop (einmal pro Prozess)."""
+    global _watcher
+    from tornado.ioloop import IOLoop, PeriodicCallback
+
+    with _watcher_lock:
+        if _watcher is not None or not drop_dir:
+            return _watcher
+        _watcher = IngestWatcher(drop_dir, ds, shap_ds, on_append)
+        # Sofort nachholen, was schon im Verzeichnis liegt, danach periodisch
+        IOLoop.current().add_callback(_watcher.poll_async)
+        PeriodicCallback(_watcher.poll_async, poll_s * 1000).start()
+        return _watcher
@@ -0,0 +1,152 @@
+import concurrent.futures
+import mmap
+import os
+import threading
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:  # Fallback über /proc
+    psutil = None
+
+# name -> Callable, das (Anzahl Einträge, Bytes) des Caches liefert
+_caches = {}
+# Namen der Caches pro Datensatz: ihr sizer(dataset) zählt nur die Einträge dieses Datensatzes
+_per_dataset = set()
+_caches_lock = threading.Lock()
+
+
+def register_cache(name, sizer, per_dataset=False):
+    """
+    Cache für den Speicherbericht registrieren (pro Prozess). per_dataset: sizer nimmt optional
+    einen Datensatz und zählt dann nur dessen Einträge (dataset_cache_bytes).
+    """
+    with _caches_lock:
+        _caches[name] = sizer
+        if per_dataset:
+            _per_dataset.add(name)
+
+
+def dataset_cache_bytes(dataset):
+    """Bytes, die die Caches pro Datensatz für dataset halten (abgeleitete Arrays, Sketches, ...)."""
+    with _caches_lock:
+        sizers = [sizer for name, sizer in _caches.items() if name in _per_dataset]
+    total = 0
+    for sizer in sizers:
+        try:
+            total += sizer(dataset)[1]
+        except Exception:
+            pass
+    return total
+
+
+def cache_sizes():
+    with _caches_lock:
+        items = list(_caches.items())
+    sizes = {}
+    for name, sizer in items:
+        try:
+            sizes[name] = sizer()
+        except Exception:
+            sizes[name] = (0, 0)
+    return sizes
+
+
+def rss_bytes(pid=None):
+    """Residenter Speicher eines Prozesses (Standard: aktueller Prozess)."""
+    pid = pid or os.getpid()
+    if psutil is not None:
+        return psutil.Process(pid).memory_info().rss
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def worker_memory_info():
+    """Im Worker ausgeführt: (pid, rss, Cache-Grössen)."""
+    return os.getpid(), rss_bytes(), cache_sizes()
+
+
+def is_mapped(values):
+    """True, wenn das Array (oder seine Basis) memory-mapped ist (geteilter Page-Cache)."""
+    while values is not None:
+        if isinstance(values, (np.memmap, mmap.mmap)):
+            return True
+        values = getattr(values, 'base', None)
+    return False
+
+
+def variable_sizes(dataset):
+    """Pro Variable: (dims, dtype, Bytes im Speicher, Bytes unkomprimiert auf Disk, memory-mapped)."""
+    rows = {}
+    for name, var in dataset.variables.items():
+        loaded = getattr(var, '_in_memory', False)
+        mapped = loaded and is_mapped(var.data)
+        disk_dtype = var.encoding.get('dtype', var.dtype)
+        disk_bytes = var.size * getattr(disk_dtype, 'itemsize', var.dtype.itemsize)
+        rows[name] = (var.dims, str(var.dtype), var.nbytes if loaded and not mapped else 0, disk_bytes, mapped)
+    return rows
+
+
+def collect_worker_info(executor, n_probe=None, timeout=30):
+    """Speicherinfo aller Worker eines Prozess-Pools (ein Eintrag pro pid)."""
+    n_probe = n_probe or 2 * (getattr(executor, '_max_workers', 1) or 1)
+    futures = [executor.submit(worker_memory_info) for _ in range(n_probe)]
+    workers = {}
+    for future in futures:
+        try:
+            pid, rss, caches = future.result(timeout=timeout)
+        except Exception:
+            continue
+        workers[pid] = (rss, caches)
+    return workers
+
+
+def _mb(n):
+    return f"{n / 2**20:9.1f} MB"
+
+
+def format_memory_report(datasets, executor=None):
+    """
+    Text-Bericht: residenter Speicher pro Variable (je Datensatz), pro Cache und pro Worker.
+    datasets: dict name -> xarray.Dataset
+    """
+    lines = [f"Memory report (pid {os.getpid()}): RSS {_mb(rss_bytes())}"]
+    for ds_name, dataset in datasets.items():
+        if dataset is None:
+            continue
+        rows = variable_sizes(dataset)
+        loaded = sum(r[2] for r in rows.values())
+        lines.append(f"  Dataset '{ds_name}': {_mb(loaded)} loaded")
+        for name, (dims, dtype, mem, disk, mapped) in sorted(rows.items(), key=lambda r: -r[1][3]):
+            state = "     mapped " if mapped else _mb(mem) if mem else "     lazy   "
+            lines.append(f"    {name:<28} {dtype:<9} {state} (disk {_mb(disk).strip()}) [{', '.join(dims)}]")
+    lines.append("  Caches (main process):")
+    for name, (entries, nbytes) in sorted(cache_sizes().items()):
+        lines.append(f"    {name:<28} {entries:6d} entries {_mb(nbytes)}")
+    if executor is not None and isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        workers = collect_worker_info(executor)
+        lines.append(f"  Workers: {len(workers)}, total RSS {_mb(sum(w[0] for w in workers.values()))}")
+        for pid, (rss, caches) in sorted(workers.items()):
+            cached = sum(c[1] for c in caches.values())
+            lines.append(f"    pid {pid:<8} RSS {_mb(rss)} caches {_mb(cached)}")
+    return "\n".join(lines)
+
+
+_startup_reported = False
+
+
+def print_startup_report(datasets, executor=None):
+    """Speicherbericht einmal pro Serverprozess ausgeben (im Hintergrund, blockiert die Session nicht)."""
+    global _startup_reported
+    if _startup_reported:
+        return
+    _startup_reported = True
+    threading.Thread(
+        target=lambda: print(format_memory_report(datasets, executor), flush=True),
+        name="memory-report",
+        daemon=True
+    ).start()
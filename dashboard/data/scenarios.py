@@ -0,0 +1,165 @@
+"""
+Katalog weiterer Modellläufe und Klimaszenarien: je eine NetCDF-Datei mit demselben
+hru-Layout wie die Basisdaten (chrun.nc).
+
+Szenarien werden erst bei der ersten Verwendung geöffnet und auf die hru-Reihenfolge der
+Basisdaten gebracht. Die Geometrie (gdf) gibt es nur einmal, ebenso alles, was daraus
+abgeleitet wird (Auswahlpunkte, Raster-Gitter): diese Caches sind pro GeoDataFrame, nicht
+pro Datensatz. Jeder Prozess (Server, Rechen-Worker) führt seinen eigenen Katalog, das
+Budget SCENARIO_MEMORY_MB gilt für einen Serverprozess samt seiner Worker und wird auf sie
+aufgeteilt. Gezählt werden die Variablen und die abgeleiteten Cache-Einträge des Szenarios
+(zeitmajore Arrays, Sketches, Klimatologien, Ereignis-Indizes). Übersteigt ein Katalog seinen
+Anteil, wird das am längsten unbenutzte Szenario geschlossen und seine Einträge freigegeben.
+"""
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+
+from dashboard.config.settings import SCENARIO_CATALOG, SCENARIO_MEMORY_MB, BASE_SCENARIO, DATA_SOURCE, LEAN_LOAD, \
+    COMPUTE_BACKEND, COMPUTE_WORKERS
+from dashboard.data.ingest import release_dataset
+from dashboard.data.memory_report import register_cache, dataset_cache_bytes
+from dashboard.data.shared_store import exclude_from_store
+
+
+def read_catalog(path):
+    """
+    Katalogdatei lesen: Name -> {'path': NetCDF, 'label': Anzeigename}. Ein Eintrag kann
+    auch nur der Pfad sein; relative Pfade gelten relativ zur Katalogdatei.
+    """
+    path = Path(path)
+    with open(path) as f:
+        entries = json.load(f)
+    catalog = {}
+    for name, entry in entries.items():
+        if name == BASE_SCENARIO:
+            raise ValueError(f"Szenario-Name '{BASE_SCENARIO}' ist für die Basisdaten reserviert")
+        if isinstance(entry, str):
+            entry = {'path': entry}
+        entry = dict(entry)
+        if 'path' in entry:
+            nc_path = Path(entry['path'])
+            entry['path'] = str(nc_path if nc_path.is_absolute() else path.parent / nc_path)
+        elif 'synthetic_seed' not in entry:
+            raise ValueError(f"Szenario '{name}' ohne 'path'")
+        entry.setdefault('label', name)
+        catalog[name] = entry
+    return catalog
+
+
+def default_entries():
+    """Einträge aus SCENARIO_CATALOG; bei synthetischen Daten ein zweiter Lauf mit anderem Seed."""
+    if SCENARIO_CATALOG:
+        return read_catalog(SCENARIO_CATALOG)
+    if DATA_SOURCE == 'synthetic':
+        return {'synthetic_seed1': {'synthetic_seed': 1, 'label': 'Synthetic run (seed 1)'}}
+    return {}
+
+
+def align_to_base(scenario, base):
+    """Szenario auf die hru-Reihenfolge der Basisdaten bringen (fehlende HRUs sind NaN)."""
+    if 'hru' not in scenario.dims:
+        raise ValueError("Szenario ohne hru-Dimension")
+    hru = base['hru'].values
+    if np.array_equal(scenario['hru'].values, hru):
+        return scenario.assign_coords(hru=hru)
+    if not np.isin(hru, scenario['hru'].values).any():
+        raise ValueError("Szenario enthält keine HRU der Basisdaten")
+    return scenario.reindex(hru=hru)
+
+
+def _variable_bytes(dataset):
+    """Dekodierte Grösse aller Variablen."""
+    return sum(dataset[name].nbytes for name in dataset.data_vars)
+
+
+def _footprint(dataset):
+    """Geschätzter Speicherbedarf: Variablen plus abgeleitete Caches des Datensatzes."""
+    return _variable_bytes(dataset) + dataset_cache_bytes(dataset)
+
+
+def catalog_processes(backend=COMPUTE_BACKEND, workers=COMPUTE_WORKERS):
+    """Prozesse mit eigenem Katalog pro Serverprozess: er selbst plus die Worker im Prozess-Backend."""
+    return 1 + (workers if backend == 'process' else 0)
+
+
+class ScenarioCatalog:
+    """Lazy geöffnete Szenarien mit LRU-Verdrängung unter einem Speicherbudget."""
+
+    def __init__(self, entries, memory_bytes=None):
+        self.entries = dict(entries)
+        # Anteil dieses Prozesses am Budget
+        self.memory_bytes = memory_bytes if memory_bytes is not None \
+            else SCENARIO_MEMORY_MB * 2**20 / catalog_processes()
+        # Name -> Dataset, zuletzt verwendetes am Ende
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def names(self):
+        return list(self.entries)
+
+    def label(self, name):
+        return self.entries[name]['label'] if name in self.entries else name
+
+    def version(self, name):
+        """Version für Resultat-Schlüssel: Pfad, Änderungszeit und Grösse der Datei."""
+        entry = self.entries[name]
+        if 'path' not in entry:
+            return 'synthetic', entry['synthetic_seed']
+        stat = Path(entry['path']).stat()
+        return entry['path'], stat.st_mtime_ns, stat.st_size
+
+    def _load(self, name, base):
+        entry = self.entries[name]
+        if 'path' in entry:
+            return xr.open_dataset(entry['path'], cache=not LEAN_LOAD)
+        from dashboard.data.synthetic_data import make_synthetic_data
+        times = base.indexes['time']
+        return make_synthetic_data(n_hru=base.sizes['hru'], n_days=len(times), start=times[0],
+                                   seed=entry['synthetic_seed'])[1]
+
+    def get(self, name, base):
+        """Szenario name (ausgerichtet auf base); öffnet es beim ersten Zugriff."""
+        if name not in self.entries:
+            raise KeyError(f"Unbekanntes Szenario '{name}', erwartet: {', '.join(self.entries)}")
+        with self._lock:
+            dataset = self._open.get(name)
+            if dataset is not None:
+                self._open.move_to_end(name)
+            else:
+                # Szenarien nie mit dem gemeinsamen Speicher der Basisdaten verbinden
+                dataset = exclude_from_store(align_to_base(self._load(name, base), base))
+                self._open[name] = dataset
+            evicted = []
+            # Abgeleitete Caches wachsen nach dem Öffnen: Budget bei jedem Zugriff prüfen.
+            # Das gerade verwendete Szenario bleibt auch über dem Budget
+            while len(self._open) > 1 and sum(map(_footprint, self._open.values())) > self.memory_bytes:
+                evicted.append(self._open.popitem(last=False)[1])
+        for old in evicted:
+            release_dataset(old)
+            old.close()
+        return dataset
+
+    def size(self):
+        datasets = list(self._open.values())
+        # Abgeleitete Caches stehen im Speicherbericht in ihren eigenen Zeilen
+        return len(datasets), sum(map(_variable_bytes, datasets))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Szenario-Katalog dieses Prozesses (aus SCENARIO_CATALOG)."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ScenarioCatalog(default_entries())
+            register_cache('scenarios', _catalog.size)
+        return _catalog
@@ -0,0 +1,269 @@
+"""
+Gemeinsamer, read-only Datenspeicher für den Mehrprozess-Betrieb (serve.py).
+
+Jede Zeitvariable liegt als zusammenhängendes (time, hru)-Array in einer eigenen
+.npy-Datei. Alle Serverprozesse und ihre Rechen-Worker öffnen die Dateien mit
+np.load(mmap_mode='r'), die Seiten liegen damit nur einmal im Page-Cache des
+Systems statt einmal pro Prozess im Heap.
+
+Ein Datensatz wird über einen Fingerabdruck (hru, Zeitachse, Variablen und eine Stichprobe
+ihrer Werte) erkannt. Passt der Fingerabdruck nicht (andere Daten, alter Speicher), wird der
+Speicher ignoriert und wie bisher aus dem Datensatz geladen. Datensätze, die nur lokal
+gehalten werden (Szenarien aus dem Katalog, siehe exclude_from_store), verwenden ihn nie.
+Beim Ingest legt extend_store den verlängerten Datensatz unter seinem neuen Fingerabdruck an
+(bisherige Datei plus neue Tage), so bleiben auch die verlängerten Arrays geteilt.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from dashboard.config.settings import FLOAT32_DOWNCAST, SHARED_STORE_DIR
+from dashboard.data.data_loader import downcast_float32
+from dashboard.data.ingest import register_append_hook
+
+STORE_META = "meta.json"
+# Attribut für Datensätze, die den gemeinsamen Speicher nie verwenden
+LOCAL_ONLY_ATTR = 'dashboard_local_only'
+# Stichprobe der Werte im Fingerabdruck: Anzahl Tage über die ganze Zeitachse bzw. vom Beginn
+# (append-stabil); pro Tag alle HRUs, als float32 (unabhängig vom float32-Downcast)
+FINGERPRINT_SAMPLE_DAYS = 16
+STABLE_SAMPLE_DAYS = 8
+
+# id(dataset) -> (dataset, (Fingerabdruck, append-stabiler Fingerabdruck))
+_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+# store_dir -> (mtime, meta)
+_meta_cache = {}
+
+
+def _hash_values(h, dataset, time_index):
+    """Stichprobe der Werte aller Variablen (Zeitvariablen an den Tagen time_index) in den Hash."""
+    for name in sorted(dataset.data_vars):
+        var = dataset[name]
+        if var.dtype.kind not in 'fiub':
+            continue
+        sample = var.isel(time=time_index) if 'time' in var.dims else var
+        # Unabhängig von der Anordnung der Dimensionen (time_major_values schreibt (time, hru) zurück)
+        sample = sample.transpose(*sorted(sample.dims))
+        h.update(np.ascontiguousarray(sample.values, dtype=np.float32).tobytes())
+
+
+def _fingerprints_of(dataset):
+    """
+    (Fingerabdruck, append-stabiler Fingerabdruck), einmal pro Datensatz gemeinsam berechnet –
+    bevor der Speicher oder der float32-Downcast Variablen im Datensatz ersetzen.
+    """
+    with _fingerprint_lock:
+        entry = _fingerprints.get(id(dataset))
+        if entry is not None and entry[0] is dataset:
+            return entry[1]
+        n_days = dataset.sizes.get('time', 0)
+        full, stable = hashlib.sha1(), hashlib.sha1()
+        for h in (full, stable):
+            h.update(np.asarray(dataset['hru'].values, dtype=np.int64).tobytes())
+        if 'time' in dataset.indexes:
+            full.update(dataset.indexes['time'].values.astype('datetime64[ns]').astype(np.int64).tobytes())
+            stable.update(str(dataset.indexes['time'][0]).encode())
+        for name in sorted(dataset.data_vars):
+            var = dataset[name]
+            full.update(f"{name}:{sorted(var.dims)}:{var.size}".encode())
+            stable.update(f"{name}:{sorted(var.dims)}".encode())
+        spread = np.unique(np.linspace(0, n_days - 1, FINGERPRINT_SAMPLE_DAYS).round().astype(int)) if n_days else []
+        _hash_values(full, dataset, spread)
+        _hash_values(stable, dataset, np.arange(min(n_days, STABLE_SAMPLE_DAYS)))
+        fingerprints = (full.hexdigest()[:16], stable.hexdigest()[:16])
+        _fingerprints[id(dataset)] = (dataset, fingerprints)
+        return fingerprints
+
+
+def dataset_fingerprint(dataset):
+    """Kurzer Hash über hru-Koordinate, Zeitachse, Variablen (Name, Dims, Form) und Stichprobe der Werte."""
+    return _fingerprints_of(dataset)[0]
+
+
+def append_stable_fingerprint(dataset):
+    """
+    Wie dataset_fingerprint, aber ohne Länge der Zeitachse (nur Beginn) und mit Werten nur
+    der ersten Tage: bleibt gleich, wenn Tage angehängt werden (Ingest).
+    """
+    return _fingerprints_of(dataset)[1]
+
+
+def exclude_from_store(dataset):
+    """Datensatz nie mit dem gemeinsamen Speicher verbinden (z.B. Szenarien aus dem Katalog)."""
+    dataset.attrs[LOCAL_ONLY_ATTR] = 1
+    return dataset
+
+
+def window_version(datasets, window_ends=()):
+    """
+    Datenversion für Resultat-Schlüssel und ETags. Angehängte Tage ändern sie nur für Resultate,
+    deren Zeitfenster bis zum bisherigen Datenende reicht: nur für diese gehört das Datenende
+    zur Version.
+    """
+    datasets = [d for d in datasets if d is not None]
+    version = tuple(append_stable_fingerprint(d) for d in datasets)
+    ends = [d.indexes['time'][-1] for d in datasets if 'time' in d.indexes]
+    if ends and any(np.datetime64(e) >= np.datetime64(min(ends)) for e in window_ends):
+        version += tuple(str(e.date()) for e in ends)
+    return version
+
+
+
+
+def _var_file(fingerprint, var_name):
+    return f"{fingerprint}.{var_name}.npy"
+
+
+def read_meta(store_dir):
+    """meta.json des Speichers (gecacht bis zur nächsten Änderung der Datei)."""
+    path = Path(store_dir) / STORE_META
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return {}
+    cached = _meta_cache.get(str(store_dir))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path) as f:
+        meta = json.load(f)
+    _meta_cache[str(store_dir)] = (mtime, meta)
+    return meta
+
+
+def build_store(store_dir, datasets, float32=FLOAT32_DOWNCAST):
+    """
+    Schreibt alle Zeitvariablen der Datensätze (dict Name -> Dataset) in den Speicher.
+    Bereits vorhandene Datensätze (gleicher Fingerabdruck) werden übersprungen.
+    Ein Dateilock verhindert, dass mehrere Prozesse gleichzeitig schreiben.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    with open(store_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        meta = read_meta(store_dir)
+        for ds_name, dataset in datasets.items():
+            fingerprint = dataset_fingerprint(dataset)
+            if fingerprint in meta:
+                continue
+            entries = {}
+            for var_name in dataset.data_vars:
+                da = dataset[var_name]
+                if 'time' not in da.dims:
+                    continue
+                values = da.transpose('time', 'hru').values
+                max_err = 0.0
+                if float32:
+                    values, max_err = downcast_float32(values, var_name)
+                tmp = store_dir / (_var_file(fingerprint, var_name) + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, np.ascontiguousarray(values))
+                os.replace(tmp, store_dir / _var_file(fingerprint, var_name))
+                entries[var_name] = {"dtype": str(values.dtype), "shape": list(values.shape),
+                                     "max_rel_err": max_err}
+            meta[fingerprint] = {"name": ds_name, "vars": entries}
+            tmp = store_dir / (STORE_META + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(meta, f, indent=1)
+            os.replace(tmp, store_dir / STORE_META)
+    return store_dir
+
+
+def _copy_npy_data(src_path, dst):
+    """Datenteil einer .npy-Datei (ohne Header) nach dst kopieren."""
+    with open(src_path, "rb") as src:
+        version = np.lib.format.read_magic(src)
+        if version == (1, 0):
+            np.lib.format.read_array_header_1_0(src)
+        else:
+            np.lib.format.read_array_header_2_0(src)
+        shutil.copyfileobj(src, dst, 16 * 2**20)
+
+
+def extend_store(store_dir, old, new, n_old):
+    """
+    Ingest: den verlängerten Datensatz new unter seinem Fingerabdruck in den Speicher legen.
+    Zeitmajore Dateien lassen sich verlängern, indem die Tage hinten angehängt werden: die
+    bisherige Datei wird kopiert (ohne sie zu dekodieren) und nur um die neuen Tage ergänzt.
+    Einträge, die selbst aus einem Ingest stammen, werden danach entfernt (gemappte Dateien
+    bleiben für Prozesse gültig, die noch nicht migriert haben); der mit build_store
+    geschriebene Basis-Eintrag bleibt für Neustarts erhalten.
+    """
+    if not store_dir or old.attrs.get(LOCAL_ONLY_ATTR):
+        return
+    store_dir = Path(store_dir)
+    old_fingerprint, new_fingerprint = dataset_fingerprint(old), dataset_fingerprint(new)
+    with open(store_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        meta = read_meta(store_dir)
+        entry = meta.get(old_fingerprint)
+        # Anderer Serverprozess hat schon verlängert (gleiche Inkremente -> gleicher Fingerabdruck)
+        if entry is None or new_fingerprint in meta:
+            return
+        entries = {}
+        for var_name, info in entry["vars"].items():
+            if var_name not in new or 'time' not in new[var_name].dims:
+                continue
+            dtype = np.dtype(info["dtype"])
+            tail = new[var_name].isel(time=slice(n_old, None)).transpose('time', 'hru').values
+            max_err = info["max_rel_err"]
+            if dtype == np.float32 and tail.dtype == np.float64:
+                tail, tail_err = downcast_float32(tail, var_name)
+                max_err = max(max_err, tail_err)
+            if tail.dtype != dtype:
+                # float32 genügt für die neuen Tage nicht: Variable bleibt lokal
+                continue
+            shape = [info["shape"][0] + tail.shape[0], info["shape"][1]]
+            tmp = store_dir / (_var_file(new_fingerprint, var_name) + ".tmp")
+            with open(tmp, "wb") as f:
+                np.lib.format.write_array_header_1_0(f, {"descr": np.lib.format.dtype_to_descr(dtype),
+                                                        "fortran_order": False, "shape": tuple(shape)})
+                _copy_npy_data(store_dir / _var_file(old_fingerprint, var_name), f)
+                f.write(np.ascontiguousarray(tail).tobytes())
+            os.replace(tmp, store_dir / _var_file(new_fingerprint, var_name))
+            entries[var_name] = {"dtype": str(dtype), "shape": shape, "max_rel_err": max_err}
+        meta = dict(meta)
+        meta[new_fingerprint] = {"name": entry["name"], "vars": entries, "extends": old_fingerprint}
+        if "extends" in entry:
+            del meta[old_fingerprint]
+        tmp = store_dir / (STORE_META + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, store_dir / STORE_META)
+        if "extends" in entry:
+            for var_name in entry["vars"]:
+                (store_dir / _var_file(old_fingerprint, var_name)).unlink(missing_ok=True)
+
+
+def _extend_store_and_forget(old, new, n_old):
+    # Vor den Hooks der abgeleiteten Arrays registriert: der Speicher ist verlängert, bevor
+    # time_arrays den neuen Datensatz damit verbindet
+    if new is not None:
+        extend_store(SHARED_STORE_DIR, old, new, n_old)
+    # Eintrag hält den alten Datensatz sonst am Leben
+    with _fingerprint_lock:
+        entry = _fingerprints.get(id(old))
+        if entry is not None and entry[0] is old:
+            del _fingerprints[id(old)]
+
+
+register_append_hook('shared_store', _extend_store_and_forget)
+
+
+def open_store_array(store_dir, dataset, var_name):
+    """Memory-mapped (time, hru)-Array der Variable oder None, falls nicht im Speicher."""
+    if not store_dir or dataset.attrs.get(LOCAL_ONLY_ATTR):
+        return None
+    entry = read_meta(store_dir).get(dataset_fingerprint(dataset))
+    if entry is None or var_name not in entry["vars"]:
+        return None
+    try:
+        return np.load(Path(store_dir) / _var_file(dataset_fingerprint(dataset), var_name), mmap_mode='r')
+    except OSError:
+        return None
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+import geopandas as gpd
+from shapely.geometry import box
+
+from dashboard.config.settings import STATIC_FEATURES
+
+# Ungefähre Ausdehnung der Schweiz (EPSG:4326)
+CH_BOUNDS = (5.95, 45.82, 10.49, 47.81)
+
+
+def make_synthetic_data(n_hru=307, n_days=365 * 10, start="2000-01-01", seed=0):
+    """
+    Erzeugt synthetische Daten mit derselben Struktur wie chrun.nc / shap_rnn.nc
+    und dem Catchment-Shapefile (für Benchmarks und Lasttests ohne Originaldaten).
+    Gibt (gdf, ds, shap_ds) zurück.
+    """
+    rng = np.random.default_rng(seed)
+    hru = np.arange(1, n_hru + 1)
+    time = pd.date_range(start, periods=n_days, freq="D")
+    doy = time.dayofyear.values
+
+    # Saisonale Zyklen plus Rauschen, damit Aggregationen realistische Spannweiten haben
+    season = np.sin(2 * np.pi * (doy - 100) / 365.25)
+    elevation = rng.uniform(300, 3500, n_hru)
+    T = (10 - elevation / 250)[:, None] + 9 * season[None, :] + rng.normal(0, 3, (n_hru, n_days))
+    P = rng.gamma(0.6, 6.0, (n_hru, n_days)) * (rng.random((n_hru, n_days)) < 0.45)
+    Qmm_mod = 0.6 * P + rng.gamma(1.5, 0.8, (n_hru, n_days))
+    Qmm_prevah = Qmm_mod * rng.normal(1.0, 0.15, (n_hru, n_days)).clip(0.2)
+
+    dims = ("hru", "time")
+    data_vars = {
+        "P": (dims, P, {"long_name": "Precipitation", "units": "mm d-1"}),
+        "T": (dims, T, {"long_name": "Air temperature", "units": "°C"}),
+        "Qmm_mod": (dims, Qmm_mod, {"long_name": "Runoff CH-RUN", "units": "mm d-1"}),
+        "Qmm_prevah": (dims, Qmm_prevah, {"long_name": "Runoff PREVAH", "units": "mm d-1"}),
+    }
+    for name in STATIC_FEATURES:
+        values = elevation if name == "dhm" else rng.uniform(0, 1, n_hru)
+        if name == "area":
+            values = rng.uniform(5, 300, n_hru)
+        data_vars[name] = (("hru",), values, {"long_name": name, "units": "-"})
+    ds = xr.Dataset(data_vars, coords={"hru": hru, "time": time})
+
+    shap_vars = {
+        "sum_P": (dims, rng.normal(0, 0.3, (n_hru, n_days)) + 0.05 * P),
+        "sum_T": (dims, rng.normal(0, 0.3, (n_hru, n_days)) + 0.02 * T),
+        "Y": (dims, np.abs(Qmm_mod - Qmm_prevah)),
+    }
+    for name in STATIC_FEATURES:
+        shap_vars[name] = (dims, rng.normal(0, 0.05, (n_hru, n_days)))
+    shap_ds = xr.Dataset(shap_vars, coords={"hru": hru, "time": time})
+
+    # Rechteckiges Raster von Catchments über die Schweiz
+    n_cols = int(np.ceil(np.sqrt(n_hru * 1.6)))
+    n_rows = int(np.ceil(n_hru / n_cols))
+    x0, y0, x1, y1 = CH_BOUNDS
+    dx, dy = (x1 - x0) / n_cols, (y1 - y0) / n_rows
+    geoms = [
+        box(x0 + (i % n_cols) * dx, y0 + (i // n_cols) * dy,
+            x0 + (i % n_cols + 1) * dx, y0 + (i // n_cols + 1) * dy)
+        for i in range(n_hru)
+    ]
+    gdf = gpd.GeoDataFrame({"hru": hru}, geometry=geoms, crs="EPSG:4326")
+    return gdf, ds, shap_ds
@@ -4,18 +4,8 @@ import joblib
 import torch
 import shap
 
-STATIC_FEATURES = [
-    'abb', 'area', 'atb', 'btk', 'dhm', 'glm', 'kwt', 'pfc',
-    'frac_water', 'frac_urban_areas', 'frac_coniferous_forests',
-    'frac_deciduous_forests', 'frac_mixed_forests', 'frac_cereals',
-    'frac_pasture', 'frac_bush', 'frac_unknown', 'frac_firn',
-    'frac_bare_ice', 'frac_rock', 'frac_vegetables',
-    'frac_alpine_vegetation', 'frac_wetlands',
-    'frac_sub_Alpine_meadow', 'frac_alpine_meadow',
-    'frac_bare_soil_vegetation', 'frac_grapes', 'slp'
-]
-
-DYNAMIC_FEATURES = ['P', 'T']
+from dashboard.config.settings import STATIC_FEATURES, DYNAMIC_FEATURES
+
 TIME_FEATURE = 'time'
 
 
@@ -0,0 +1,239 @@
+"""
+Headless-Export des Play-Modus: jedes Frame der Karte(n) als PNG, optional als GIF/MP4.
+
+Statt pro Frame die Bokeh-Karte zu bauen, wird
+- die Geometrie einmal nach Mercator projiziert und als matplotlib-Pfade an die
+  Render-Worker gegeben (jeder Worker baut seine Figur einmal und setzt pro Frame
+  nur noch die Farbwerte),
+- die Aggregation aller Frames in einem Durchgang gerechnet (aggregate_frames).
+"""
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard.views.main_multiprocessing import shap_var_name
+from dashboard.views.window_batches import frame_windows, aggregate_frames
+
+PANELS = ('map', 'shap', 'diff')
+CLIM_MODES = ('global', 'frame')
+
+
+def _projected_paths(gdf):
+    """Polygone (EPSG:3857) als matplotlib-Pfade, Löcher gegenläufig orientiert."""
+    from matplotlib.path import Path as MplPath
+    from shapely.geometry.polygon import orient
+
+    paths = []
+    for geom in gdf.to_crs(epsg=3857).geometry:
+        polygons = getattr(geom, 'geoms', [geom])
+        rings = []
+        for polygon in polygons:
+            polygon = orient(polygon, 1.0)
+            rings.append(MplPath(np.asarray(polygon.exterior.coords)[:, :2], closed=True))
+            rings.extend(MplPath(np.asarray(r.coords)[:, :2], closed=True) for r in polygon.interiors)
+        paths.append(MplPath.make_compound_path(*rings))
+    return paths
+
+
+def _resolve_cmap(name):
+    import matplotlib
+    for candidate in (name, name.lower()):
+        try:
+            cmap = matplotlib.colormaps[candidate].copy()
+            break
+        except KeyError:
+            continue
+    else:
+        cmap = matplotlib.colormaps['viridis'].copy()
+    # HRUs ohne Wert (in der App per inner join entfernt) nicht einfärben
+    cmap.set_bad(alpha=0.0)
+    return cmap
+
+
+class _Renderer:
+    """Pro Worker einmal aufgebaute Figur; pro Frame werden nur Werte, clim und Titel gesetzt."""
+
+    def __init__(self, paths, panels, size, dpi):
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import PathCollection
+
+        width, height = size
+        self.dpi = dpi
+        self.fig, axes = plt.subplots(1, len(panels), figsize=(width * len(panels) / dpi, height / dpi),
+                                      dpi=dpi, squeeze=False)
+        self.collections = []
+        bounds = np.array([p.get_extents().bounds for p in paths])
+        x0, y0 = bounds[:, 0].min(), bounds[:, 1].min()
+        x1, y1 = (bounds[:, 0] + bounds[:, 2]).max(), (bounds[:, 1] + bounds[:, 3]).max()
+        for ax, (title, cmap) in zip(axes[0], panels):
+            collection = PathCollection(paths, cmap=_resolve_cmap(cmap), edgecolor='black', linewidth=0.1)
+            collection.set_array(np.ma.masked_all(len(paths)))
+            ax.add_collection(collection)
+            ax.set_xlim(x0, x1)
+            ax.set_ylim(y0, y1)
+            ax.set_aspect('equal')
+            ax.set_axis_off()
+            ax.set_title(title, fontsize=9)
+            self.fig.colorbar(collection, ax=ax, fraction=0.035, pad=0.02)
+            self.collections.append(collection)
+        self.suptitle = self.fig.suptitle("")
+        # Platz für den Zeitraum über den Karten
+        self.fig.tight_layout(rect=(0, 0, 1, 0.92))
+
+    def render(self, path, label, values, clims):
+        for collection, vals, clim in zip(self.collections, values, clims):
+            collection.set_array(np.ma.masked_invalid(vals))
+            collection.set_clim(*clim)
+        self.suptitle.set_text(label)
+        self.fig.savefig(path, dpi=self.dpi)
+
+
+_renderer = None
+
+
+def _init_renderer(paths, panels, size, dpi):
+    global _renderer
+    _renderer = _Renderer(paths, panels, size, dpi)
+
+
+def _render_chunk(jobs):
+    for path, label, values, clims in jobs:
+        _renderer.render(path, label, values, clims)
+    return len(jobs)
+
+
+def _clims(frames, kind, mode):
+    """Farbbereich pro Frame wie in der App (Hauptkarte: min/max, SHAP: symmetrisch, Differenz: 2–98 %)."""
+    def limits(values):
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return 0.0, 1.0
+        if kind == 'shap':
+            vmax = float(np.abs(values).max()) if mode == 'frame' else float(np.percentile(np.abs(values), 98))
+            return -(vmax or 1.0), (vmax or 1.0)
+        if kind == 'diff' or mode == 'global':
+            lo, hi = np.percentile(values, [2, 98])
+        else:
+            lo, hi = values.min(), values.max()
+        return float(lo), float(hi) if hi > lo else float(lo) + 1.0
+    if mode == 'global':
+        return [limits(frames.ravel())] * len(frames)
+    return [limits(values) for values in frames]
+
+
+def _encode(frame_dir, pattern, fps, video):
+    """PNG-Sequenz zu GIF (Pillow oder ffmpeg) bzw. MP4 (ffmpeg). Gibt den Pfad oder None zurück."""
+    out = Path(frame_dir) / f"animation.{video}"
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is not None:
+        cmd = [ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(fps), '-i', str(Path(frame_dir) / pattern)]
+        if video == 'mp4':
+            # yuv420p braucht gerade Seitenlängen
+            cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', '-c:v', 'libx264']
+        subprocess.run(cmd + [str(out)], check=True)
+        return out
+    if video == 'gif':
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        files = sorted(Path(frame_dir).glob('frame_*.png'))
+        if not files:
+            return None
+        frames = [Image.open(f).convert('P', palette=Image.ADAPTIVE) for f in files]
+        frames[0].save(out, save_all=True, append_images=frames[1:], duration=int(1000 / fps), loop=0)
+        return out
+    return None
+
+
+def export_animation(ds, shap_ds, gdf, variable, agg_method, date_range, day_stride, out_dir,
+                     panels=('map',), var_cmaps=None, time_max=None, clim='global', workers=None,
+                     size=(800, 500), dpi=100, fps=5, video=None, chunk_size=8):
+    """
+    Rendert alle Frames des Play-Modus für variable/agg_method ab date_range[0] bis date_range[1]
+    (bzw. time_max) als frame_00000.png, ... in out_dir.
+
+    panels:    Auswahl aus 'map' (Hauptkarte), 'shap' (SHAP-Karte), 'diff' (Runoff-Differenz)
+    clim:      'global' (fester Farbbereich über alle Frames) oder 'frame' (pro Frame wie in der App)
+    video:     None, 'gif' oder 'mp4' (nur mit lokalem Encoder: ffmpeg bzw. Pillow für GIF)
+    Gibt ein Dictionary mit Anzahl Frames, Dateien und Laufzeiten zurück.
+    """
+    unknown = set(panels) - set(PANELS)
+    if unknown or not panels:
+        raise ValueError(f"Unbekannte Karten {sorted(unknown)}, erwartet: {', '.join(PANELS)}")
+    if clim not in CLIM_MODES:
+        raise ValueError(f"Unbekannter Farbbereich '{clim}', erwartet: {', '.join(CLIM_MODES)}")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    timings = {}
+
+    t0 = time.perf_counter()
+    windows = frame_windows(date_range, day_stride, time_max)
+    if not windows:
+        raise ValueError("Zeitbereich enthält keine Frames")
+    # Reihenfolge der HRUs im Shapefile -> Spalten der Datensätze
+    hru_order = gdf['hru'].values
+    layers = []
+    for panel in panels:
+        if panel == 'map':
+            dataset, name, cmap = ds, variable, (var_cmaps or {}).get(variable, 'viridis')
+            title = f"{variable} ({agg_method})"
+        elif panel == 'shap':
+            dataset, name, cmap = shap_ds, shap_var_name(shap_ds, variable), 'coolwarm'
+            title = f"SHAP {variable} ({agg_method})"
+        else:
+            dataset, name, cmap = shap_ds, 'Y', 'YlGn'
+            title = f"Runoff-Differenz Y ({agg_method})"
+        if name is None or name not in dataset:
+            raise ValueError(f"Variable für Karte '{panel}' nicht vorhanden: {variable}")
+        if 'time' in dataset[name].dims:
+            frames = aggregate_frames(dataset, name, windows, agg_method)
+        else:
+            # Statische Variable: jedes Frame gleich
+            frames = np.broadcast_to(dataset[name].values.astype(np.float64), (len(windows), dataset.sizes['hru']))
+        columns = pd.Index(dataset['hru'].values).get_indexer(hru_order)
+        frames = np.where(columns >= 0, frames[:, np.clip(columns, 0, None)], np.nan)
+        kind = 'map' if panel == 'map' else panel
+        layers.append((title, cmap, frames, _clims(frames, kind, clim)))
+    timings['aggregate_s'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    paths = _projected_paths(gdf)
+    timings['project_s'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    jobs = []
+    for i, window in enumerate(windows):
+        label = f"{window[0]} – {window[1]}"
+        jobs.append((str(out_dir / f"frame_{i:05d}.png"), label,
+                     [layer[2][i] for layer in layers], [layer[3][i] for layer in layers]))
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    initargs = (paths, [(layer[0], layer[1]) for layer in layers], size, dpi)
+    if workers == 1:
+        _init_renderer(*initargs)
+        for chunk in chunks:
+            _render_chunk(chunk)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer,
+                                                    initargs=initargs) as pool:
+            for _ in pool.map(_render_chunk, chunks):
+                pass
+    timings['render_s'] = time.perf_counter() - t0
+
+    video_path = None
+    if video is not None:
+        t0 = time.perf_counter()
+        video_path = _encode(out_dir, 'frame_%05d.png', fps, video)
+        timings['encode_s'] = time.perf_counter() - t0
+
+    return dict(frames=len(windows), out_dir=str(out_dir), video=str(video_path) if video_path else None,
+                workers=workers, timings=timings)
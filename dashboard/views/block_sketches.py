@@ -0,0 +1,256 @@
+"""
+Quantil- und Streuungs-Aggregationen (median, p90, p99, std) über beliebige Zeitfenster.
+
+Für jede Variable werden einmal pro Prozess feste Zeitblöcke auf mehreren Ebenen
+(SKETCH_BLOCK_LEVELS Tage, an Vielfachen der Blocklänge ausgerichtet) vorberechnet:
+- Momente pro Block und HRU (Anzahl, Summe, Quadratsumme – um den HRU-Mittelwert
+  verschoben), daraus ist std über ganze Blöcke exakt.
+- Quantil-Sketch pro Block und HRU: SKETCH_POINTS Werte an den Wahrscheinlichkeiten
+  (j + 0.5) / k, jeder mit Gewicht n_Block / k. Sketches sind mergebar: ein Fenster
+  wird in möglichst grosse Blöcke plus Resttage (roh, Gewicht 1) zerlegt und das
+  gewichtete Quantil über alle Stützpunkte gebildet.
+
+Fehlerschranke: Jeder Block verschiebt den Rang eines Werts um höchstens n_Block / k,
+über das ganze Fenster also |F̂(x) − F(x)| ≤ 1 / SKETCH_POINTS (normierter Rang,
+bei 64 Punkten ≤ 1.6 %). std ist bis auf Rundung exakt. Fenster bis
+SKETCH_EXACT_MAX_DAYS Tage (oder SKETCH_FORCE_EXACT) werden exakt aus den Rohdaten
+berechnet.
+"""
+import threading
+
+import numpy as np
+
+from dashboard.config.settings import SKETCH_BLOCK_LEVELS, SKETCH_POINTS, SKETCH_EXACT_MAX_DAYS, SKETCH_FORCE_EXACT
+from dashboard.data.memory_report import register_cache
+from dashboard.data.ingest import register_append_hook
+from dashboard.views.time_arrays import time_major_values, time_index_range
+
+QUANTILE_METHODS = {'median': 0.5, 'p90': 0.9, 'p99': 0.99}
+SKETCH_METHODS = tuple(QUANTILE_METHODS) + ('std',)
+
+
+class _Level:
+    """Vorberechnete Blöcke einer Ebene (Blocklänge B), ab Block first_block."""
+
+    def __init__(self, values, block_days, n_points, shift, first_block=0):
+        self.block_days = block_days
+        n_blocks = len(values) // block_days - first_block
+        start = first_block * block_days
+        blocks = values[start:start + n_blocks * block_days].reshape(n_blocks, block_days, values.shape[1])
+        valid = ~np.isnan(blocks)
+        centered = np.where(valid, blocks - shift, 0.0)
+        self.count = valid.sum(axis=1)                       # (n_blocks, hru)
+        self.total = centered.sum(axis=1)                    # (n_blocks, hru)
+        self.total_sq = (centered ** 2).sum(axis=1)          # (n_blocks, hru)
+        probs = (np.arange(n_points) + 0.5) / n_points
+        with np.errstate(invalid='ignore'), _ignore_all_nan():
+            points = np.nanquantile(blocks, probs, axis=1)   # (k, n_blocks, hru)
+        # Ohne vollständigen Block (Reihe kürzer als B) fällt die k-Achse sonst weg
+        points = points.reshape(n_points, n_blocks, values.shape[1])
+        self.points = np.ascontiguousarray(points.transpose(1, 0, 2), dtype=np.float32)
+
+    def extend(self, values, n_points, shift):
+        """Neu vollständige Blöcke (angehängte Tage) anfügen; bestehende Blöcke bleiben."""
+        if len(values) // self.block_days <= len(self.count):
+            return
+        tail = _Level(values, self.block_days, n_points, shift, first_block=len(self.count))
+        for name in ('count', 'total', 'total_sq', 'points'):
+            setattr(self, name, np.concatenate([getattr(self, name), getattr(tail, name)]))
+
+
+class _ignore_all_nan:
+    """Warnungen für Blöcke ohne gültige Werte unterdrücken (ergibt NaN-Stützpunkte)."""
+
+    def __enter__(self):
+        import warnings
+        self._ctx = warnings.catch_warnings()
+        self._ctx.__enter__()
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def __exit__(self, *exc):
+        return self._ctx.__exit__(*exc)
+
+
+class BlockSketch:
+    """Mehrstufige Block-Sketches einer Variable (time, hru)."""
+
+    def __init__(self, values, levels=SKETCH_BLOCK_LEVELS, n_points=SKETCH_POINTS):
+        self.values = values
+        self.n_points = n_points
+        # Verschiebung um den HRU-Mittelwert hält die Quadratsummen numerisch stabil
+        with _ignore_all_nan():
+            self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+        self.levels = [_Level(values, b, n_points, self.shift) for b in sorted(levels, reverse=True)]
+
+    def extended(self, values):
+        """
+        Sketch für die verlängerte Zeitreihe values (ältere Tage unverändert): nur die durch
+        die neuen Tage vollständig gewordenen Blöcke werden berechnet. Die Verschiebung
+        (HRU-Mittelwert der alten Reihe) bleibt, std ist davon unabhängig.
+        """
+        sketch = BlockSketch.__new__(BlockSketch)
+        sketch.values = values
+        sketch.n_points = self.n_points
+        sketch.shift = self.shift
+        sketch.levels = []
+        for level in self.levels:
+            copy = _Level.__new__(_Level)
+            copy.__dict__.update(level.__dict__)
+            copy.extend(values, self.n_points, self.shift)
+            sketch.levels.append(copy)
+        return sketch
+
+    def _cover(self, i0, i1):
+        """Zerlegt [i0, i1) in ganze Blöcke (Ebene, b0, b1) und rohe Resttage (lo, hi)."""
+        blocks, raws = [], []
+
+        def rec(lo, hi, li):
+            if hi <= lo:
+                return
+            if li == len(self.levels):
+                raws.append((lo, hi))
+                return
+            size = self.levels[li].block_days
+            b0 = -(-lo // size)
+            b1 = min(hi // size, len(self.levels[li].count))
+            if b1 <= b0:
+                rec(lo, hi, li + 1)
+                return
+            rec(lo, b0 * size, li + 1)
+            blocks.append((li, b0, b1))
+            rec(b1 * size, hi, li + 1)
+
+        rec(i0, i1, 0)
+        return blocks, raws
+
+    def std(self, i0, i1):
+        blocks, raws = self._cover(i0, i1)
+        n = np.zeros(self.values.shape[1])
+        s1 = np.zeros_like(n)
+        s2 = np.zeros_like(n)
+        for li, b0, b1 in blocks:
+            level = self.levels[li]
+            n += level.count[b0:b1].sum(axis=0)
+            s1 += level.total[b0:b1].sum(axis=0)
+            s2 += level.total_sq[b0:b1].sum(axis=0)
+        for lo, hi in raws:
+            raw = self.values[lo:hi]
+            valid = ~np.isnan(raw)
+            centered = np.where(valid, raw - self.shift, 0.0)
+            n += valid.sum(axis=0)
+            s1 += centered.sum(axis=0)
+            s2 += (centered ** 2).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = s2 / n - (s1 / n) ** 2
+        # ddof=0 wie xarray.std
+        return np.where(n > 0, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def quantile(self, i0, i1, q):
+        blocks, raws = self._cover(i0, i1)
+        samples, weights = [], []
+        for li, b0, b1 in blocks:
+            level = self.levels[li]
+            pts = level.points[b0:b1]                                    # (nb, k, hru)
+            w = np.repeat(level.count[b0:b1, None, :] / self.n_points, self.n_points, axis=1)
+            samples.append(pts.reshape(-1, pts.shape[-1]).astype(np.float64))
+            weights.append(w.reshape(-1, w.shape[-1]))
+        for lo, hi in raws:
+            raw = self.values[lo:hi]
+            samples.append(raw)
+            weights.append(np.ones_like(raw))
+        return weighted_quantile(np.concatenate(samples), np.concatenate(weights), q)
+
+
+def weighted_quantile(samples, weights, q):
+    """Gewichtetes Quantil pro Spalte (HRU), NaN-Stützpunkte zählen nicht."""
+    weights = np.where(np.isnan(samples), 0.0, weights)
+    order = np.argsort(np.where(np.isnan(samples), np.inf, samples), axis=0, kind='stable')
+    samples = np.take_along_axis(samples, order, axis=0)
+    cum = np.cumsum(np.take_along_axis(weights, order, axis=0), axis=0)
+    total = cum[-1]
+    idx = np.argmax(cum >= q * total, axis=0)
+    out = samples[idx, np.arange(samples.shape[1])]
+    return np.where(total > 0, out, np.nan)
+
+
+def nan_quantile(values, q, axis=0):
+    """
+    Wie np.nanquantile (method='linear') entlang axis, aber vektorisiert: np.nanquantile rechnet
+    bei mehrdimensionalen Arrays jede Spalte einzeln (apply_along_axis). NaN zählen nicht.
+    """
+    values = np.moveaxis(np.asarray(values, dtype=np.float64), axis, 0)
+    ordered = np.sort(values, axis=0)                       # NaN ans Ende
+    n = (~np.isnan(values)).sum(axis=0)
+    # Virtueller Index wie numpy (method='linear'), damit die Rundung übereinstimmt
+    virtual = (n - 1) * q
+    lo = np.floor(virtual)
+    gamma = virtual - lo
+    last = np.maximum(n - 1, 0)
+    lo = np.clip(lo, 0, last).astype(np.int64)
+    hi = np.minimum(lo + 1, last)
+    a = np.take_along_axis(ordered, lo[None], axis=0)[0]
+    b = np.take_along_axis(ordered, hi[None], axis=0)[0]
+    diff = b - a
+    out = a + diff * gamma
+    out = np.where(gamma >= 0.5, b - diff * (1 - gamma), out)
+    return np.where(n > 0, out, np.nan)
+
+
+def _exact(values, method):
+    with _ignore_all_nan():
+        if method == 'std':
+            return np.nanstd(values, axis=0)
+        return nan_quantile(values, QUANTILE_METHODS[method], axis=0)
+
+
+# (id(dataset), var_name) -> (dataset, BlockSketch)
+_sketch_cache = {}
+_sketch_lock = threading.Lock()
+
+
+def get_sketch(dataset, var_name):
+    key = (id(dataset), var_name)
+    with _sketch_lock:
+        entry = _sketch_cache.get(key)
+        if entry is None or entry[0] is not dataset:
+            entry = (dataset, BlockSketch(time_major_values(dataset, var_name)))
+            _sketch_cache[key] = entry
+        return entry[1]
+
+
+def _sketch_size(of=None):
+    sketches = [entry[1] for entry in list(_sketch_cache.values()) if of is None or entry[0] is of]
+    nbytes = sum(level.points.nbytes + level.count.nbytes + level.total.nbytes + level.total_sq.nbytes
+                 for sketch in sketches for level in sketch.levels)
+    return len(sketches), nbytes
+
+
+register_cache('block_sketches', _sketch_size, per_dataset=True)
+
+
+def _extend_sketches(old, new, n_old):
+    """Ingest: Sketches auf den verlängerten Datensatz übertragen (time_arrays ist schon verlängert)."""
+    with _sketch_lock:
+        for key, (dataset, sketch) in list(_sketch_cache.items()):
+            if dataset is not old:
+                continue
+            del _sketch_cache[key]
+            if new is not None and key[1] in new and 'time' in new[key[1]].dims:
+                _sketch_cache[(id(new), key[1])] = (new, sketch.extended(time_major_values(new, key[1])))
+
+
+register_append_hook('block_sketches', _extend_sketches)
+
+
+def sketch_aggregate(dataset, var_name, date_range, agg_method):
+    """median/p90/p99/std über das Fenster als Array (hru,)."""
+    i0, i1 = time_index_range(dataset, date_range)
+    values = time_major_values(dataset, var_name)
+    if i1 <= i0:
+        return np.full(values.shape[1], np.nan)
+    if SKETCH_FORCE_EXACT or i1 - i0 <= SKETCH_EXACT_MAX_DAYS:
+        return _exact(values[i0:i1], agg_method)
+    sketch = get_sketch(dataset, var_name)
+    if agg_method == 'std':
+        return sketch.std(i0, i1)
+    return sketch.quantile(i0, i1, QUANTILE_METHODS[agg_method])
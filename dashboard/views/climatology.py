@@ -0,0 +1,229 @@
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import CLIMATOLOGY_SMOOTH_DAYS, CLIMATOLOGY_BASELINE_CACHE, CLIMATOLOGY_STACK_ELEMENTS, \
+    SKETCH_EXACT_MAX_DAYS, SKETCH_FORCE_EXACT
+from dashboard.data.memory_report import register_cache
+from dashboard.data.ingest import register_append_hook
+from dashboard.views.block_sketches import QUANTILE_METHODS, SKETCH_METHODS, sketch_aggregate, nan_quantile
+from dashboard.views.time_arrays import time_major_values, time_index_range
+
+CLIMATOLOGY_BASES = ('doy', 'month')
+
+
+def _group_index(times, basis):
+    """Gruppe pro Tag: Tag im Jahr auf 365-Tage-Kalender (29.2. -> 28.2.) oder Monat."""
+    times = pd.DatetimeIndex(times)
+    if basis == 'month':
+        return times.month.values - 1, 12
+    doy = times.dayofyear.values - 1
+    leap_after_feb = times.is_leap_year & (doy >= 59)
+    return np.where(leap_after_feb, doy - 1, doy), 365
+
+
+def _circular_smooth(clim, window):
+    """Zirkuläres gleitendes Mittel über den Jahreszyklus (Achse 0), NaN-tolerant."""
+    if window <= 1:
+        return clim
+    half = window // 2
+    valid = ~np.isnan(clim)
+    values = np.where(valid, clim, 0.0)
+    padded = np.concatenate([values[-half:], values, values[:half]])
+    padded_n = np.concatenate([valid[-half:], valid, valid[:half]]).astype(float)
+    kernel = np.ones(2 * half + 1)
+    sums = np.apply_along_axis(lambda c: np.convolve(c, kernel, mode='valid'), 0, padded)
+    counts = np.apply_along_axis(lambda c: np.convolve(c, kernel, mode='valid'), 0, padded_n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+class Climatology:
+    """
+    Tägliche (Tag im Jahr) oder monatliche Klimatologie pro HRU über eine Referenzperiode.
+    Liefert für jedes Fenster die Referenz (Baseline) für dieselbe Aggregation.
+    """
+
+    def __init__(self, values, times, ref_period, basis='doy', smooth_days=CLIMATOLOGY_SMOOTH_DAYS):
+        self.basis = basis
+        self.ref_period = ref_period
+        self.times = pd.DatetimeIndex(times)
+        self.groups, n_groups = _group_index(times, basis)
+        years = self.times.year.values
+        in_ref = (years >= ref_period[0]) & (years <= ref_period[1])
+        ref_values = values[in_ref]
+        ref_groups = self.groups[in_ref]
+        valid = ~np.isnan(ref_values)
+        sums = np.zeros((n_groups, values.shape[1]))
+        counts = np.zeros_like(sums)
+        np.add.at(sums, ref_groups, np.where(valid, ref_values, 0.0))
+        np.add.at(counts, ref_groups, valid)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            clim = np.where(counts > 0, sums / counts, np.nan)
+        self.clim = _circular_smooth(clim, smooth_days) if basis == 'doy' else clim
+        self.n_groups = n_groups
+        # (Monat, Tag des Fensterstarts, Länge, Aggregation) -> Baseline der übrigen Aggregationen
+        self.baselines = {}
+        self.lock = threading.Lock()
+
+    def baseline(self, i0, i1, agg_method):
+        """Erwartetes Aggregat für das Fenster [i0, i1) aus der Klimatologie (nur sum und mean)."""
+        if agg_method not in ('sum', 'mean'):
+            raise ValueError(f"Baseline aus der Klimatologie nur für sum/mean, nicht '{agg_method}'")
+        # Häufigkeit jeder Gruppe im Fenster x Klimatologie, O(Gruppen x HRU)
+        groups = self.groups[i0:i1]
+        freq = np.bincount(groups, minlength=self.n_groups).astype(float)
+        total = freq @ np.nan_to_num(self.clim)
+        return total if agg_method == 'sum' else total / max(len(groups), 1)
+
+    def reference_windows(self, start, n_days):
+        """
+        Zeilenbereiche [j0, j1) desselben Fensters (gleicher Kalendertag als Start, gleiche
+        Länge) in den Referenzjahren; Jahre, in denen das Fenster nicht ganz in den Daten liegt,
+        fallen weg. Ein Start am 29.2. wird in Nicht-Schaltjahren auf den 28.2. gelegt.
+        """
+        windows = []
+        for year in range(self.ref_period[0], self.ref_period[1] + 1):
+            day = 28 if start.month == 2 and start.day == 29 and not pd.Timestamp(year, 1, 1).is_leap_year \
+                else start.day
+            date = pd.Timestamp(year, start.month, day)
+            j0 = int(self.times.searchsorted(date))
+            if j0 < len(self.times) and self.times[j0] == date and j0 + n_days <= len(self.times):
+                windows.append((j0, j0 + n_days))
+        return windows
+
+    def window_baseline(self, start, n_days, agg_method, aggregates):
+        """
+        Baseline für max/min/std/Quantile: Mittel über die Referenzjahre des Aggregats desselben
+        Fensters; aggregates(windows) -> Array (Jahre, hru). Gecacht pro (Starttag, Länge, Aggregation).
+        """
+        key = (start.month, start.day, n_days, agg_method)
+        with self.lock:
+            base = self.baselines.get(key)
+        if base is not None:
+            return base
+        windows = self.reference_windows(start, n_days)
+        if windows:
+            with np.errstate(invalid='ignore'), warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                base = np.nanmean(aggregates(windows), axis=0)
+        else:
+            base = np.full(self.clim.shape[1], np.nan)
+        with self.lock:
+            if len(self.baselines) >= CLIMATOLOGY_BASELINE_CACHE:
+                # Ältesten Eintrag verwerfen (dict behält die Einfügereihenfolge)
+                del self.baselines[next(iter(self.baselines))]
+            self.baselines[key] = base
+        return base
+
+    @property
+    def nbytes(self):
+        return self.clim.nbytes + self.groups.nbytes + sum(b.nbytes for b in list(self.baselines.values()))
+
+
+# (id(dataset), var_name, ref_period, basis) -> (dataset, Climatology)
+_climatology_cache = {}
+_climatology_lock = threading.Lock()
+
+
+def get_climatology(dataset, var_name, ref_period, basis):
+    key = (id(dataset), var_name, tuple(ref_period), basis)
+    with _climatology_lock:
+        entry = _climatology_cache.get(key)
+        if entry is None or entry[0] is not dataset:
+            values = time_major_values(dataset, var_name)
+            entry = (dataset, Climatology(values, dataset.indexes['time'], tuple(ref_period), basis))
+            _climatology_cache[key] = entry
+        return entry[1]
+
+
+def _climatology_size(of=None):
+    entries = [entry[1] for entry in list(_climatology_cache.values()) if of is None or entry[0] is of]
+    return len(entries), sum(c.nbytes for c in entries)
+
+
+register_cache('climatologies', _climatology_size, per_dataset=True)
+
+
+def _extend_climatologies(old, new, n_old):
+    """
+    Ingest: Klimatologien, deren Referenzperiode vor den neuen Tagen endet, bleiben gültig;
+    nur die Gruppen (Tag im Jahr / Monat) der neuen Tage werden angehängt. Die übrigen verfallen.
+    """
+    new_times = new.indexes['time'][n_old:] if new is not None else None
+    with _climatology_lock:
+        for key, (dataset, climatology) in list(_climatology_cache.items()):
+            if dataset is not old:
+                continue
+            del _climatology_cache[key]
+            ref_period = key[2]
+            if new_times is None or ref_period[1] >= new_times[0].year:
+                continue
+            extended = Climatology.__new__(Climatology)
+            extended.__dict__.update(climatology.__dict__)
+            extended.groups = np.concatenate([climatology.groups, _group_index(new_times, climatology.basis)[0]])
+            # Referenzfenster können jetzt in die neuen Tage reichen: Baselines neu bestimmen
+            extended.times = new.indexes['time']
+            extended.baselines = {}
+            extended.lock = threading.Lock()
+            _climatology_cache[(id(new),) + key[1:]] = (new, extended)
+
+
+register_append_hook('climatologies', _extend_climatologies)
+
+
+def _reduce_windows(stack, agg_method):
+    """Aggregat pro Fenster eines Stapels (Fenster, Tage, hru) in einer Operation über Achse 1."""
+    if agg_method == 'max':
+        return np.fmax.reduce(stack, axis=1)
+    if agg_method == 'min':
+        return np.fmin.reduce(stack, axis=1)
+    if agg_method == 'std':
+        return np.nanstd(stack, axis=1)
+    if agg_method in QUANTILE_METHODS:
+        return nan_quantile(stack, QUANTILE_METHODS[agg_method], axis=1)
+    # Wie aggregate_data: unbekannte Aggregationen fallen auf die Summe zurück
+    return np.nansum(stack, axis=1)
+
+
+def _window_aggregates(dataset, var_name, agg_method):
+    """
+    Aggregate der Referenzfenster [(j0, j1), ...] als (Jahre, hru) auf demselben Weg wie die
+    Karte: alle Jahre gestapelt in einer vektorisierten Reduktion (blockweise über die Jahre),
+    lange Fenster der Sketch-Aggregationen wie sketch_aggregate aus den Block-Sketches.
+    """
+    values = time_major_values(dataset, var_name)
+    times = dataset.indexes['time']
+
+    def aggregates(windows):
+        n_days = windows[0][1] - windows[0][0]
+        if agg_method in SKETCH_METHODS and n_days > SKETCH_EXACT_MAX_DAYS and not SKETCH_FORCE_EXACT:
+            return np.stack([sketch_aggregate(dataset, var_name, (times[j0], times[j1 - 1]), agg_method)
+                             for j0, j1 in windows])
+        starts = np.array([j0 for j0, _ in windows])
+        offsets = np.arange(n_days)
+        per_chunk = max(1, CLIMATOLOGY_STACK_ELEMENTS // (n_days * values.shape[1]))
+        return np.concatenate([_reduce_windows(values[starts[k:k + per_chunk, None] + offsets], agg_method)
+                               for k in range(0, len(starts), per_chunk)])
+    return aggregates
+
+
+def anomaly(values, dataset, var_name, date_range, agg_method, ref_period, basis, relative=False):
+    """Anomalie des Fenster-Aggregats `values` gegenüber der Klimatologie (absolut oder in %)."""
+    i0, i1 = time_index_range(dataset, date_range)
+    if i1 <= i0:
+        return np.full_like(values, np.nan, dtype=float)
+    climatology = get_climatology(dataset, var_name, ref_period, basis)
+    if agg_method in ('sum', 'mean'):
+        base = climatology.baseline(i0, i1, agg_method)
+    else:
+        start = dataset.indexes['time'][i0]
+        base = climatology.window_baseline(start, i1 - i0, agg_method,
+                                           _window_aggregates(dataset, var_name, agg_method))
+    diff = values - base
+    if not relative:
+        return diff
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(np.abs(base) > 1e-12, 100.0 * diff / np.abs(base), np.nan)
@@ -0,0 +1,96 @@
+"""
+Feste, vergleichbare Farbbereiche für die drei Karten.
+
+Statt pro Frame zu skalieren (Bokeh-Autoscale, np.percentile bzw. symmetrisches vmax
+bei jedem Frame), werden die Perzentile COLOR_SCALE_PERCENTILES der Fenster-Aggregate
+einmal pro (Datensatz, Variable, Aggregation, Fensterlängen-Klasse) über den ganzen
+Datensatz bestimmt. Die Fensterlänge wird auf die nächste Klasse in COLOR_SCALE_BUCKETS
+gerundet; gerechnet wird über höchstens COLOR_SCALE_MAX_WINDOWS gleichmässig verteilte,
+nicht überlappende Fenster dieser Länge (Stichprobe, skaliert damit auf lange Zeitreihen).
+Danach ist die clim ein Lookup. Summen wachsen mit der Anzahl Tage (nicht linear, Extreme
+mitteln sich über längere Fenster aus): bei sum wird die Skala deshalb für die exakte
+Fensterlänge bestimmt, ohne Rundung auf eine Klasse.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import COLOR_SCALE_BUCKETS, COLOR_SCALE_MAX_WINDOWS, COLOR_SCALE_PERCENTILES
+from dashboard.data.memory_report import register_cache
+from dashboard.views.window_batches import aggregate_frames
+
+SCALE_KINDS = ('sequential', 'symmetric')
+
+
+def window_bucket(n_days):
+    """Fensterlänge (Tage) auf die nächste Klasse runden (logarithmischer Abstand)."""
+    n_days = max(int(n_days), 1)
+    return min(COLOR_SCALE_BUCKETS, key=lambda b: abs(np.log(b) - np.log(n_days)))
+
+
+def sample_windows(dataset, n_days, max_windows=COLOR_SCALE_MAX_WINDOWS):
+    """Bis zu max_windows gleichmässig verteilte, nicht überlappende Fenster über den Datensatz."""
+    times = dataset.indexes['time']
+    n_total = len(times) // n_days
+    if n_total == 0:
+        return [(times[0].date(), times[-1].date())]
+    slots = np.unique(np.linspace(0, n_total - 1, min(n_total, max_windows)).round().astype(int))
+    return [(times[i * n_days].date(), (times[i * n_days] + pd.Timedelta(days=n_days - 1)).date()) for i in slots]
+
+
+def color_scale_quantiles(dataset, var_name, agg_method, bucket):
+    """(unteres Perzentil, oberes Perzentil, oberes Perzentil von |x|) oder None ohne Werte."""
+    if 'time' in dataset[var_name].dims:
+        values = aggregate_frames(dataset, var_name, sample_windows(dataset, bucket), agg_method)
+    else:
+        values = dataset[var_name].values
+    values = np.asarray(values, dtype=np.float64).ravel()
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return None
+    lo, hi = np.percentile(values, COLOR_SCALE_PERCENTILES)
+    abs_hi = np.percentile(np.abs(values), COLOR_SCALE_PERCENTILES[1])
+    return float(lo), float(hi), float(abs_hi)
+
+
+def scale_length(agg_method, n_days):
+    """Fensterlänge, für die die Skala bestimmt wird: exakt bei sum, sonst die Klasse."""
+    return max(int(n_days), 1) if agg_method == 'sum' else window_bucket(n_days)
+
+
+def clim_from_scale(scale, kind):
+    """clim für Bokeh: 'sequential' (unteres/oberes Perzentil) oder 'symmetric' um 0."""
+    if scale is None:
+        return None
+    lo, hi, abs_hi = scale
+    if kind == 'symmetric':
+        vmax = abs_hi or 1.0
+        return -vmax, vmax
+    return (lo, hi) if hi > lo else (lo, lo + 1.0)
+
+
+# (Datenversion, Datensatz, Variable, Aggregation, Länge bzw. Klasse) -> Quantile; pro Serverprozess
+_scales = {}
+_scales_lock = threading.Lock()
+
+
+def lookup_scale(key):
+    """(True, Skala) wenn bekannt, sonst (False, None)."""
+    with _scales_lock:
+        if key in _scales:
+            return True, _scales[key]
+        return False, None
+
+
+def store_scale(key, scale):
+    with _scales_lock:
+        _scales[key] = scale
+
+
+def _scales_size():
+    # Drei floats pro Skala plus Schlüssel (grob)
+    return len(_scales), 128 * len(_scales)
+
+
+register_cache('color_scales', _scales_size)
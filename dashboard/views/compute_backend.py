@@ -0,0 +1,97 @@
+import concurrent.futures
+import threading
+
+from dashboard.config.settings import COMPUTE_BACKEND, COMPUTE_WORKERS
+from dashboard.views.main_multiprocessing import init_global_vars, data_ends, run_synced
+
+BACKENDS = ('process', 'thread', 'inline')
+
+
+class InlineExecutor(concurrent.futures.Executor):
+    """
+    Führt Jobs sofort im aufrufenden Thread aus (kein Pickling, keine Datenkopie).
+    Blockiert den Event-Loop für die Dauer der Berechnung – sinnvoll für kleine
+    Fenster oder Deployments mit nur einem Nutzer.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = concurrent.futures.Future()
+        if not future.set_running_or_notify_cancel():
+            return future
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+
+class MigratingProcessPool(concurrent.futures.ProcessPoolExecutor):
+    """
+    ProcessPoolExecutor, der nach einem Ingest weiterläuft: jeder Job trägt den Datenstand des
+    Servers mit, ein Worker mit älterem Stand holt die neuen Tage vor dem Job selbst nach
+    (main_multiprocessing.sync_global_vars) und behält dabei seine Caches.
+    """
+
+    def __init__(self, max_workers, ds, shap_ds):
+        super().__init__(max_workers=max_workers, initializer=init_global_vars, initargs=(ds, shap_ds))
+        self.data_ends = data_ends(ds, shap_ds)
+
+    def update_data(self, ds, shap_ds):
+        self.data_ends = data_ends(ds, shap_ds)
+        # Später gestartete Worker beginnen gleich mit den neuen Daten; der Pool hält die alten
+        # Datensätze sonst über seine Initializer-Argumente am Leben
+        self._initargs = (ds, shap_ds)
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(run_synced, self.data_ends, fn, *args, **kwargs)
+
+
+def create_executor(ds, shap_ds, backend=COMPUTE_BACKEND, max_workers=COMPUTE_WORKERS):
+    """
+    Erzeugt einen Executor für die compute_*_df-Funktionen.
+    - process: MigratingProcessPool, Daten werden per Initializer in jeden Worker kopiert,
+               Resultate werden zurück-gepickelt (umgeht den GIL).
+    - thread:  ThreadPoolExecutor im Serverprozess, teilt die Daten ohne Kopie
+               (numpy-Reduktionen geben den GIL frei).
+    - inline:  synchron im Event-Loop-Thread.
+    """
+    if backend == 'process':
+        return MigratingProcessPool(max_workers, ds, shap_ds)
+    # Thread und Inline laufen im Serverprozess: globale Datensätze hier setzen
+    init_global_vars(ds, shap_ds)
+    if backend == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    if backend == 'inline':
+        return InlineExecutor()
+    raise ValueError(f"Unbekanntes Compute-Backend '{backend}', erwartet: {', '.join(BACKENDS)}")
+
+
+# Ein Executor pro Serverprozess, geteilt von allen Sessions
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(ds, shap_ds):
+    """Gibt den prozessweiten Executor für COMPUTE_BACKEND zurück (beim ersten Aufruf erzeugt)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = create_executor(ds, shap_ds)
+        return _executor
+
+
+def update_executor_data(ds, shap_ds):
+    """
+    Neue Datensätze (Ingest) an den prozessweiten Executor geben. Thread/Inline: globale
+    Datensätze ersetzen. Prozess-Pool: der Pool bleibt, die Worker ziehen beim nächsten Job
+    auf den neuen Datenstand nach (Caches bleiben warm). Gibt den aktuellen Executor zurück
+    (None, falls noch keiner).
+    """
+    with _executor_lock:
+        if _executor is None:
+            return None
+        if isinstance(_executor, MigratingProcessPool):
+            _executor.update_data(ds, shap_ds)
+        else:
+            init_global_vars(ds, shap_ds)
+        return _executor
@@ -0,0 +1,298 @@
+"""
+Daten-API neben der Panel-App (Tornado-Handler für pn.serve(extra_patterns=API_PATTERNS)).
+
+GET /api/aggregate   Fenster-Aggregat pro HRU, wie die Karten (compute_map_df / compute_shap_df)
+GET /api/timeseries  Tageswerte pro HRU im Fenster (Long-Format), gestreamt in Batches
+GET /api/regions     Gebietssummen pro Tag (ganzes Gebiet, Regionen aus REGIONS_FILE) im Fenster
+
+Parameter:
+    variables  kommagetrennt, z.B. P,T
+    start, end Fenster (ISO-Datum, inklusive)
+    agg        Aggregation (nur /api/aggregate), Standard INIT_AGG_METHOD
+    hru        optional, kommagetrennte HRU-IDs (/api/regions: eine zusätzliche Ad-hoc-Region)
+    regions    optional, kommagetrennte Regionsnamen (nur /api/regions, Standard alle)
+    dataset    chrun (Standard) oder shap
+    format     arrow (Arrow IPC Stream, Standard) oder parquet
+
+Die Aggregate laufen über denselben Job-Scheduler, SingleFlight und Resultat-Cache wie die
+UI. Jede Antwort trägt ein ETag aus Anfrage und Datenversion; If-None-Match liefert 304.
+
+    curl -o p.arrow 'http://localhost:5006/api/aggregate?variables=P,T&start=2020-01-01&end=2020-01-31&agg=mean'
+    pd.read_feather / pyarrow.ipc.open_stream(...).read_pandas()
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+
+import numpy as np
+import tornado.web
+
+from dashboard.config.settings import AGG_METHODS, INIT_AGG_METHOD, JOB_PRIORITIES, API_BATCH_HRUS, \
+    API_MAX_VARIABLES
+from dashboard.data.shared_store import window_version
+from dashboard.views.job_scheduler import get_job_scheduler
+from dashboard.views.main_multiprocessing import compute_map_df, compute_shap_df, shap_var_name
+from dashboard.views.single_flight import compute_flights
+from dashboard.views.regional_totals import region_totals, selection_totals
+from dashboard.views.time_arrays import time_major_values, time_index_range
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # Daten-API optional
+    pa = pc = pq = None
+
+FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+DATASETS = ('chrun', 'shap')
+
+
+class _ChunkSink:
+    """Schreibziel für pyarrow, das die geschriebenen Bytes bis zum nächsten Flush sammelt."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _load_data():
+    from dashboard.app import load_app_data
+    return load_app_data()
+
+
+class _ApiHandler(tornado.web.RequestHandler):
+
+    def compute_etag(self):
+        # ETag setzen die Handler selbst (gestreamte Antworten)
+        return None
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header("Content-Type", "application/json")
+        message = self._reason
+        if "exc_info" in kwargs and isinstance(kwargs["exc_info"][1], tornado.web.HTTPError):
+            message = kwargs["exc_info"][1].log_message or message
+        self.finish(json.dumps({"error": message}))
+
+    def parse(self, with_agg):
+        if pa is None:
+            raise tornado.web.HTTPError(501, "pyarrow ist nicht installiert")
+        gdf, ds, shap_ds = _load_data()
+        dataset_name = self.get_argument("dataset", "chrun")
+        if dataset_name not in DATASETS:
+            raise tornado.web.HTTPError(400, f"dataset muss eines von {', '.join(DATASETS)} sein")
+        dataset = ds if dataset_name == 'chrun' else shap_ds
+        variables = [v for v in self.get_argument("variables", "").split(",") if v]
+        if not variables or len(variables) > API_MAX_VARIABLES:
+            raise tornado.web.HTTPError(400, f"1 bis {API_MAX_VARIABLES} Variablen angeben")
+        for var_name in variables:
+            name = shap_var_name(dataset, var_name) if dataset_name == 'shap' else var_name
+            if name is None or name not in dataset.data_vars:
+                raise tornado.web.HTTPError(404, f"Unbekannte Variable '{var_name}'")
+        try:
+            start = datetime.date.fromisoformat(self.get_argument("start"))
+            end = datetime.date.fromisoformat(self.get_argument("end"))
+        except (tornado.web.MissingArgumentError, ValueError):
+            raise tornado.web.HTTPError(400, "start und end als ISO-Datum angeben")
+        if end < start:
+            raise tornado.web.HTTPError(400, "end liegt vor start")
+        agg_method = self.get_argument("agg", INIT_AGG_METHOD) if with_agg else None
+        if with_agg and agg_method not in AGG_METHODS:
+            raise tornado.web.HTTPError(400, f"agg muss eines von {', '.join(AGG_METHODS)} sein")
+        try:
+            hru = sorted({int(h) for h in self.get_argument("hru", "").split(",") if h}) or None
+        except ValueError:
+            raise tornado.web.HTTPError(400, "hru als kommagetrennte Ganzzahlen angeben")
+        fmt = self.get_argument("format", "arrow")
+        if fmt not in FORMATS:
+            raise tornado.web.HTTPError(400, f"format muss eines von {', '.join(FORMATS)} sein")
+        params = dict(dataset=dataset_name, variables=variables, start=start, end=end,
+                      agg=agg_method, hru=hru, format=fmt)
+        return ds, shap_ds, dataset, params
+
+    def not_modified(self, kind, params, ds, shap_ds):
+        """ETag aus Anfrage und Datenversion setzen; True, wenn der Client die Antwort schon hat."""
+        # Angehängte Tage (Ingest) ändern das ETag nur, wenn das Fenster bis zum Datenende reicht
+        version = window_version((ds, shap_ds), [params["end"]])
+        etag = '"%s"' % hashlib.sha1(repr((kind, sorted(params.items()), version)).encode()).hexdigest()
+        self.set_header("ETag", etag)
+        self.set_header("Cache-Control", "no-cache")
+        match = self.request.headers.get("If-None-Match", "")
+        tags = {t.strip().removeprefix("W/") for t in match.split(",")}
+        if etag in tags or "*" in tags:
+            self.set_status(304)
+            self.finish()
+            return True
+        return False
+
+    def start_body(self, params, kind):
+        fmt = params["format"]
+        self.set_header("Content-Type", FORMATS[fmt])
+        name = f"{kind}_{params['start']}_{params['end']}.{fmt}"
+        self.set_header("Content-Disposition", f'attachment; filename="{name}"')
+
+    async def write_tables(self, fmt, schema, batches):
+        """Batches (pyarrow.RecordBatch, async iterierbar) als Arrow-Stream bzw. Parquet streamen."""
+        sink = _ChunkSink()
+        stream = pa.PythonFile(sink, mode='w')
+        if fmt == 'parquet':
+            writer = pq.ParquetWriter(stream, schema)
+            write = lambda batch: writer.write_table(pa.Table.from_batches([batch], schema))
+        else:
+            writer = pa.ipc.new_stream(stream, schema)
+            write = writer.write_batch
+        async for batch in batches:
+            write(batch)
+            data = sink.take()
+            if data:
+                self.write(data)
+                await self.flush()
+        writer.close()
+        self.write(sink.take())
+
+
+class AggregateHandler(_ApiHandler):
+
+    async def get(self):
+        ds, shap_ds, dataset, params = self.parse(with_agg=True)
+        if self.not_modified('aggregate', params, ds, shap_ds):
+            return
+        fn = compute_map_df if params["dataset"] == 'chrun' else compute_shap_df
+        jobs = get_job_scheduler(ds, shap_ds)
+        date_range = (params["start"], params["end"])
+        # Dieselben Jobs wie die Karten: laufende UI-Anfragen werden geteilt, Resultate gecacht
+        futures = [asyncio.wrap_future(compute_flights.submit(jobs, fn, var_name, date_range, params["agg"],
+                                                              priority=JOB_PRIORITIES['api'], session='api'))
+                   for var_name in params["variables"]]
+        frames = await asyncio.gather(*futures)
+        hru = dataset['hru'].values
+        columns = {'hru': hru}
+        for var_name, df in zip(params["variables"], frames):
+            column = np.full(len(hru), np.nan)
+            if df is not None:
+                column = df[var_name].reindex(hru).to_numpy(dtype=np.float64)
+            columns[var_name] = column
+        table = pa.table(columns)
+        if params["hru"] is not None:
+            table = table.filter(pc.is_in(table['hru'], pa.array(params["hru"], table['hru'].type)))
+
+        async def batches():
+            for batch in table.to_batches():
+                yield batch
+
+        self.start_body(params, 'aggregate')
+        await self.write_tables(params["format"], table.schema, batches())
+
+
+class TimeSeriesHandler(_ApiHandler):
+
+    async def get(self):
+        ds, shap_ds, dataset, params = self.parse(with_agg=False)
+        if self.not_modified('timeseries', params, ds, shap_ds):
+            return
+        names = {v: (shap_var_name(dataset, v) if params["dataset"] == 'shap' else v) for v in params["variables"]}
+        static = [v for v, name in names.items() if 'time' not in dataset[name].dims]
+        if static:
+            raise tornado.web.HTTPError(400, f"Keine Zeitvariable: {', '.join(static)}")
+        i0, i1 = time_index_range(dataset, (params["start"], params["end"]))
+        times = dataset.indexes['time'][i0:i1]
+        hru_all = dataset['hru'].values
+        if params["hru"] is None:
+            positions = np.arange(len(hru_all))
+        else:
+            positions = np.flatnonzero(np.isin(hru_all, params["hru"]))
+        schema = pa.schema([('time', pa.timestamp('ns')), ('hru', pa.from_numpy_dtype(hru_all.dtype))]
+                           + [(v, pa.float64()) for v in params["variables"]])
+        loop = asyncio.get_running_loop()
+
+        def make_batch(cols):
+            # Long-Format: pro HRU alle Tage des Fensters
+            columns = [np.tile(times.values, len(cols)), np.repeat(hru_all[cols], len(times))]
+            for var_name in params["variables"]:
+                values = time_major_values(dataset, names[var_name])[i0:i1, cols]
+                columns.append(values.T.reshape(-1).astype(np.float64))
+            return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+        async def batches():
+            for k in range(0, len(positions), API_BATCH_HRUS):
+                # Slicen und Umkopieren nicht im Event-Loop
+                yield await loop.run_in_executor(None, make_batch, positions[k:k + API_BATCH_HRUS])
+
+        self.start_body(params, 'timeseries')
+        await self.write_tables(params["format"], schema, batches())
+
+
+class RegionsHandler(_ApiHandler):
+
+    async def get(self):
+        ds, shap_ds, dataset, params = self.parse(with_agg=False)
+        if params["dataset"] != 'chrun':
+            raise tornado.web.HTTPError(400, "Gebietssummen nur für dataset=chrun")
+        static = [v for v in params["variables"] if 'time' not in dataset[v].dims]
+        if static:
+            raise tornado.web.HTTPError(400, f"Keine Zeitvariable: {', '.join(static)}")
+        gdf = _load_data()[0]
+        loop = asyncio.get_running_loop()
+        # Reihen über den ganzen Datensatz (einmal pro Variable gerechnet, danach aus dem Cache)
+        totals = [await loop.run_in_executor(None, region_totals, gdf, dataset, v) for v in params["variables"]]
+        names = totals[0].names
+        regions = [r for r in self.get_argument("regions", "").split(",") if r] or list(names)
+        unknown = [r for r in regions if r not in names]
+        if unknown:
+            raise tornado.web.HTTPError(404, f"Unbekannte Region '{unknown[0]}', erwartet: {', '.join(names)}")
+        params["regions"] = regions
+        if self.not_modified('regions', params, ds, shap_ds):
+            return
+        date_range = (params["start"], params["end"])
+        i0, i1 = time_index_range(dataset, date_range)
+        sources = [(region, i0, i1, totals) for region in regions]
+        if params["hru"] is not None:
+            try:
+                selection = [selection_totals(dataset, v, params["hru"], date_range) for v in params["variables"]]
+            except ValueError as exc:
+                raise tornado.web.HTTPError(404, str(exc))
+            sources.append(('selection', 0, i1 - i0, selection))
+        times = dataset.indexes['time'][i0:i1]
+        # Einheit und Grösse (Volumen bzw. flächengewichtetes Mittel) pro Variable als Schema-Metadaten
+        metadata = {t.var_name: f"{t.quantity} [{t.unit}]" for t in totals}
+        schema = pa.schema([('time', pa.timestamp('ns')), ('region', pa.string())]
+                           + [(v, pa.float64()) for v in params["variables"]], metadata=metadata)
+
+        async def batches():
+            for region, j0, j1, source in sources:
+                columns = [times.values, pa.array([region] * len(times), pa.string())]
+                columns += [t.series(region, j0, j1) for t in source]
+                yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+        self.start_body(params, 'regions')
+        await self.write_tables(params["format"], schema, batches())
+
+
+API_PATTERNS = [
+    (r"/api/aggregate", AggregateHandler),
+    (r"/api/timeseries", TimeSeriesHandler),
+    (r"/api/regions", RegionsHandler),
+]
@@ -0,0 +1,152 @@
+"""
+Rangliste der statischen Attribute (STATIC_FEATURES) nach ihrem Zusammenhang mit dem
+Fenster-Aggregat einer Zielgrösse (Runoff bzw. SHAP-Werte) über alle HRUs.
+
+Die statischen Attribute werden einmal pro Datensatz als Matrix (hru, Attribut) abgelegt,
+zusammen mit ihren Rängen (Spearman) und Quantil-Klassen (Antwortkurven). Pro Fenster
+bleibt dann eine vektorisierte Spaltenkorrelation der Matrix mit dem Zielvektor und ein
+bincount über alle Attribute für die Antwortkurven – unabhängig von der Fensterlänge.
+
+Die Antwortkurven sind eine modellfreie partielle Abhängigkeit: mittlere Zielgrösse pro
+Quantil-Klasse eines Attributs (ohne die übrigen Attribute konstant zu halten).
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import STATIC_FEATURES, DRIVER_METHODS, DRIVER_PD_BINS
+from dashboard.data.ingest import register_append_hook
+from dashboard.data.memory_report import register_cache
+
+
+class StaticTable:
+    """Statische Attribute eines Datensatzes als Matrix (hru, Attribut) mit Rängen und Quantil-Klassen."""
+
+    def __init__(self, dataset, features=STATIC_FEATURES, n_bins=DRIVER_PD_BINS):
+        self.features = [f for f in features if f in dataset and dataset[f].dims == ('hru',)]
+        self.hru = dataset['hru'].values
+        self.n_bins = n_bins
+        self.values = np.column_stack([dataset[f].values.astype(np.float64) for f in self.features]) \
+            if self.features else np.empty((len(self.hru), 0))
+        self.ranks = _ranks(self.values)
+        self.bins = _quantile_bins(self.ranks, n_bins)
+        # Mittlerer Attributwert pro Klasse (x-Achse der Antwortkurven)
+        self.bin_centers = _bin_means(self.bins, self.values, n_bins)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.ranks.nbytes + self.bins.nbytes + self.bin_centers.nbytes
+
+
+def _ranks(values):
+    """Mittlere Ränge pro Spalte (Bindungen gemittelt), fehlende Werte bleiben NaN."""
+    return pd.DataFrame(values).rank(method='average').to_numpy(dtype=np.float64)
+
+
+def _quantile_bins(ranks, n_bins):
+    """Gleich besetzte Klassen 0..n_bins-1 aus den Rängen, -1 = fehlender Wert."""
+    n_valid = np.isfinite(ranks).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bins = np.floor((ranks - 1) / n_valid * n_bins)
+    return np.where(np.isfinite(bins), np.clip(bins, 0, n_bins - 1), -1).astype(np.int64)
+
+
+def _bin_means(bins, y, n_bins):
+    """
+    Mittelwert von y (Vektor pro HRU oder Matrix wie bins) pro (Attribut, Klasse) in einem
+    bincount über alle Attribute. Gibt (Attribut, Klasse) zurück, leere Klassen NaN.
+    """
+    n_features = bins.shape[1]
+    y = np.broadcast_to(y if y.ndim == 2 else y[:, None], bins.shape)
+    valid = (bins >= 0) & np.isfinite(y)
+    flat = (bins + np.arange(n_features) * n_bins)[valid]
+    total = np.bincount(flat, weights=y[valid], minlength=n_features * n_bins)
+    count = np.bincount(flat, minlength=n_features * n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (total / count).reshape(n_features, n_bins)
+
+
+def column_correlation(x, y):
+    """
+    Pearson-Korrelation jeder Spalte von x (hru, Attribut) mit y (hru,) als eine Matrixoperation.
+    HRUs mit fehlendem Wert zählen pro Spalte nicht. Gibt (r, n) zurück.
+    """
+    valid = np.isfinite(x) & np.isfinite(y)[:, None]
+    n = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, x, 0.0).sum(axis=0) / n
+        mean_y = np.where(valid, y[:, None], 0.0).sum(axis=0) / n
+        dx = np.where(valid, x - mean_x, 0.0)
+        dy = np.where(valid, y[:, None] - mean_y, 0.0)
+        r = (dx * dy).sum(axis=0) / np.sqrt((dx ** 2).sum(axis=0) * (dy ** 2).sum(axis=0))
+    return np.where(n >= 3, r, np.nan), n
+
+
+def rank_drivers(table, target, method='spearman'):
+    """
+    Attribute nach |r| mit target (Array pro HRU in der Reihenfolge von table.hru).
+    Gibt dict(ranking=DataFrame[feature, r, n], response=DataFrame[feature, class, x, mean]) zurück.
+    """
+    if method not in DRIVER_METHODS:
+        raise ValueError(f"Unbekanntes Korrelationsmass '{method}', erwartet: {', '.join(DRIVER_METHODS)}")
+    target = np.asarray(target, dtype=np.float64)
+    if method == 'spearman':
+        rows = np.isfinite(target)
+        if rows.all():
+            x = table.ranks
+        else:
+            # Ränge nur über die HRUs mit Zielwert
+            x = np.full_like(table.ranks, np.nan)
+            x[rows] = _ranks(table.values[rows])
+        y = _ranks(target[:, None])[:, 0]
+    else:
+        x, y = table.values, target
+    r, n = column_correlation(x, y)
+    ranking = pd.DataFrame({'feature': table.features, 'r': r, 'n': n})
+    ranking = ranking.iloc[np.argsort(-np.nan_to_num(np.abs(r), nan=-1.0), kind='stable')].reset_index(drop=True)
+    means = _bin_means(table.bins, target, table.n_bins)
+    response = pd.DataFrame({
+        'feature': np.repeat(table.features, table.n_bins),
+        'class': np.tile(np.arange(1, table.n_bins + 1), len(table.features)),
+        'x': table.bin_centers.ravel(),
+        'mean': means.ravel(),
+    })
+    return dict(ranking=ranking, response=response)
+
+
+# id(dataset) -> (dataset, StaticTable)
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def static_table(dataset):
+    """StaticTable des Datensatzes (einmal pro Prozess aufgebaut)."""
+    with _tables_lock:
+        entry = _tables.get(id(dataset))
+        if entry is None or entry[0] is not dataset:
+            entry = (dataset, StaticTable(dataset))
+            _tables[id(dataset)] = entry
+        return entry[1]
+
+
+def _tables_size(of=None):
+    tables = [entry[1] for entry in list(_tables.values()) if of is None or entry[0] is of]
+    return len(tables), sum(table.nbytes for table in tables)
+
+
+register_cache('static_tables', _tables_size, per_dataset=True)
+
+
+def _move_tables(old, new, n_old):
+    # Ingest ändert keine statischen Variablen: Tabelle für den verlängerten Datensatz übernehmen
+    with _tables_lock:
+        entry = _tables.get(id(old))
+        if entry is None or entry[0] is not old:
+            return
+        del _tables[id(old)]
+        if new is not None:
+            _tables[id(new)] = (new, entry[1])
+
+
+register_append_hook('static_tables', _move_tables)
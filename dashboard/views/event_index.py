@@ -0,0 +1,183 @@
+"""
+Ereignis-Index für Schwellenwert-Abfragen: an welchen Tagen lag eine HRU über ihrem
+Perzentil (z.B. p99 des Abflusses), in wie vielen Episoden, wie lange am Stück, ab wann?
+
+Pro (Datensatz, Variable, Perzentil, Referenzperiode) werden einmal die Schwellen pro HRU
+(Perzentil der Tageswerte in der Referenzperiode) und alle Überschreitungs-Episoden
+lauflängenkodiert abgelegt: Start und Ende (exklusiv) pro Episode, nach HRU und Zeit sortiert
+(CSR über die HRUs), dazu die kumulierten Episodenlängen. Eine Fensterabfrage sucht pro HRU
+mit searchsorted die erste und letzte Episode im Fenster, summiert die Längen über die
+Präfixsummen und bestimmt die längste Episode mit einem reduceat über die Episoden im
+Fenster: der Aufwand wächst mit der Anzahl Ereignisse, nicht mit der Anzahl Tage.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import EVENT_METRICS
+from dashboard.data.ingest import register_append_hook
+from dashboard.data.memory_report import register_cache
+from dashboard.views.time_arrays import time_major_values, hru_major_values, time_index_range
+
+# Abstand der HRUs in den globalen Sortierschlüsseln (Zeile * _ROW_STRIDE + Tag)
+_ROW_STRIDE = np.int64(2 ** 32)
+
+
+def _episodes(exceed, offset=0):
+    """Episoden einer Matrix (hru, Tage) von Überschreitungen: (Zeilen, Starts, Enden), sortiert."""
+    padded = np.zeros((exceed.shape[0], exceed.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = exceed
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows.astype(np.int64), starts.astype(np.int64) + offset, ends.astype(np.int64) + offset
+
+
+def _thresholds(dataset, var_name, percentile, ref_period):
+    ref_range = (pd.Timestamp(int(ref_period[0]), 1, 1), pd.Timestamp(int(ref_period[1]), 12, 31))
+    i0, i1 = time_index_range(dataset, ref_range)
+    if i1 <= i0:
+        # Referenzperiode ausserhalb der Daten: keine Schwellen, keine Ereignisse
+        return np.full(dataset.sizes['hru'], np.nan)
+    with np.errstate(invalid='ignore'):
+        return np.nanpercentile(time_major_values(dataset, var_name)[i0:i1], percentile, axis=0)
+
+
+class EventIndex:
+    """Schwellen und lauflängenkodierte Überschreitungs-Episoden aller HRUs einer Variable."""
+
+    def __init__(self, thresholds, rows, starts, ends, n_days):
+        self.thresholds = thresholds
+        self.n_days = n_days
+        self.starts = starts
+        self.ends = ends
+        self.rows = rows
+        # Globale, aufsteigend sortierte Schlüssel für searchsorted über alle HRUs zugleich
+        self.start_keys = rows * _ROW_STRIDE + starts
+        self.end_keys = rows * _ROW_STRIDE + ends
+        self.lengths = ends - starts
+        self.cum_lengths = np.concatenate([[0], np.cumsum(self.lengths)])
+
+    @classmethod
+    def build(cls, dataset, var_name, percentile, ref_period):
+        thresholds = _thresholds(dataset, var_name, percentile, ref_period)
+        with np.errstate(invalid='ignore'):
+            # (hru, time)-Sicht auf das zeitmajore Array: eine Zeile pro HRU
+            exceed = hru_major_values(dataset, var_name) > thresholds[:, None]
+        return cls(thresholds, *_episodes(exceed), n_days=exceed.shape[1])
+
+    def extended(self, tail):
+        """
+        Index nach dem Anhängen der Tage tail (hru, neue Tage) bei gleichen Schwellen. Episoden,
+        die am bisherigen Datenende laufen, werden mit ihrer Fortsetzung zusammengeführt.
+        """
+        with np.errstate(invalid='ignore'):
+            rows, starts, ends = _episodes(tail > self.thresholds[:, None], offset=self.n_days)
+        # Pro HRU höchstens eine offene Episode und höchstens eine Fortsetzung am ersten neuen Tag
+        open_idx = np.flatnonzero(self.ends == self.n_days)
+        continuing = np.flatnonzero(starts == self.n_days)
+        _, a, b = np.intersect1d(self.rows[open_idx], rows[continuing], return_indices=True)
+        old_ends = self.ends.copy()
+        old_ends[open_idx[a]] = ends[continuing[b]]
+        keep = np.ones(len(rows), dtype=bool)
+        keep[continuing[b]] = False
+        rows = np.concatenate([self.rows, rows[keep]])
+        starts = np.concatenate([self.starts, starts[keep]])
+        ends = np.concatenate([old_ends, ends[keep]])
+        order = np.lexsort((starts, rows))
+        return EventIndex(self.thresholds, rows[order], starts[order], ends[order],
+                          n_days=self.n_days + tail.shape[1])
+
+    def query(self, i0, i1):
+        """
+        Kennzahlen pro HRU für das Fenster [i0, i1): dict mit days, episodes, max_length
+        (Episoden am Fensterrand gekürzt) und first_day (Tage ab i0, NaN ohne Ereignis).
+        """
+        n_hru = len(self.thresholds)
+        base = np.arange(n_hru, dtype=np.int64) * _ROW_STRIDE
+        # Erste Episode, die nach i0 endet, und erste, die ab i1 beginnt
+        lo = np.searchsorted(self.end_keys, base + i0, side='right')
+        hi = np.searchsorted(self.start_keys, base + i1, side='left')
+        episodes = np.maximum(hi - lo, 0)
+        has = episodes > 0
+        first, last = lo[has], hi[has] - 1
+        # Am Fensterrand abgeschnittene Teile der ersten und letzten Episode
+        cut_start = np.maximum(i0 - self.starts[first], 0)
+        cut_end = np.maximum(self.ends[last] - i1, 0)
+        days = np.zeros(n_hru)
+        days[has] = self.cum_lengths[last + 1] - self.cum_lengths[first] - cut_start - cut_end
+        max_length = np.zeros(n_hru)
+        same = first == last
+        first_len = self.lengths[first] - cut_start - np.where(same, cut_end, 0)
+        last_len = self.lengths[last] - cut_end - np.where(same, cut_start, 0)
+        longest = np.maximum(first_len, last_len)
+        inner = last - first >= 2
+        if inner.any():
+            # Längste innere Episode: reduceat über die Episoden im Fenster (Segmentpaare)
+            bounds = np.column_stack([first[inner] + 1, last[inner]]).ravel()
+            inner_max = np.maximum.reduceat(self.lengths, bounds)[::2]
+            longest[inner] = np.maximum(longest[inner], inner_max)
+        max_length[has] = longest
+        first_day = np.full(n_hru, np.nan)
+        first_day[has] = np.maximum(self.starts[first], i0) - i0
+        return dict(days=days, episodes=episodes.astype(np.float64), max_length=max_length, first_day=first_day)
+
+    @property
+    def nbytes(self):
+        return (self.thresholds.nbytes + self.rows.nbytes + self.starts.nbytes + self.ends.nbytes
+                + self.start_keys.nbytes + self.end_keys.nbytes + self.lengths.nbytes + self.cum_lengths.nbytes)
+
+
+# (id(dataset), var_name, percentile, ref_period) -> (dataset, EventIndex)
+_index_cache = {}
+_index_lock = threading.Lock()
+
+
+def get_event_index(dataset, var_name, percentile, ref_period):
+    key = (id(dataset), var_name, percentile, tuple(int(y) for y in ref_period))
+    with _index_lock:
+        entry = _index_cache.get(key)
+        if entry is None or entry[0] is not dataset:
+            entry = (dataset, EventIndex.build(dataset, var_name, percentile, key[3]))
+            _index_cache[key] = entry
+        return entry[1]
+
+
+def exceedance(dataset, var_name, date_range, percentile, ref_period, metric):
+    """Kennzahl metric (EVENT_METRICS) pro HRU für das Fenster; None ohne Tage im Fenster."""
+    if metric not in EVENT_METRICS:
+        raise ValueError(f"Unbekannte Kennzahl '{metric}', erwartet: {', '.join(EVENT_METRICS)}")
+    i0, i1 = time_index_range(dataset, date_range)
+    if i1 <= i0:
+        return None
+    return get_event_index(dataset, var_name, percentile, ref_period).query(i0, i1)[metric]
+
+
+def _index_size(of=None):
+    entries = [entry[1] for entry in list(_index_cache.values()) if of is None or entry[0] is of]
+    return len(entries), sum(index.nbytes for index in entries)
+
+
+register_cache('event_indexes', _index_size, per_dataset=True)
+
+
+def _extend_indexes(old, new, n_old):
+    """
+    Ingest: Indizes, deren Referenzperiode vor den neuen Tagen endet, behalten ihre Schwellen
+    und werden nur um die Episoden der neuen Tage ergänzt. Die übrigen verfallen.
+    """
+    new_times = new.indexes['time'][n_old:] if new is not None else None
+    with _index_lock:
+        for key, (dataset, index) in list(_index_cache.items()):
+            if dataset is not old:
+                continue
+            del _index_cache[key]
+            ref_period = key[3]
+            if new_times is None or ref_period[1] >= new_times[0].year:
+                continue
+            tail = new[key[1]].isel(time=slice(n_old, None)).transpose('hru', 'time').values
+            _index_cache[(id(new),) + key[1:]] = (new, index.extended(tail))
+
+
+register_append_hook('event_indexes', _extend_indexes)
@@ -0,0 +1,70 @@
+import math
+import time
+from collections import deque
+
+
+class FramePacer:
+    """
+    Misst die Dauer der Frames im Play-Modus und entscheidet über Frame-Drops.
+
+    Ein Frame gilt als fertig, wenn alle Karten für das neue Zeitfenster berechnet
+    und gebaut sind. Dauert ein Frame länger als das Intervall `play_speed`, ist der
+    Abspielkopf der Wanduhr voraus: die dazwischenliegenden Frames werden
+    übersprungen statt nachgeholt, damit sich keine Arbeit im Pool staut.
+    """
+
+    def __init__(self, window=20, smoothing=0.3, history=1000):
+        self.smoothing = smoothing
+        # Zeitstempel der zuletzt gezeigten Frames (für die erreichte FPS)
+        self._shown = deque(maxlen=window)
+        # Ungeglättete Dauer der letzten Frames (Perzentile, Lasttests)
+        self.frame_history = deque(maxlen=history)
+        self.frame_s = None     # geglättete Gesamtdauer pro Frame
+        self.compute_s = None   # geglättete Rechenzeit (Executor)
+        self.render_s = None    # geglättete Renderzeit (Karten bauen, Tabelle, Patch)
+        self.dropped = 0
+        self.shown = 0
+
+    def _ema(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def record(self, frame_s, compute_s):
+        """Dauer eines gezeigten Frames erfassen."""
+        self._shown.append(time.perf_counter())
+        self.frame_history.append(frame_s)
+        self.shown += 1
+        self.frame_s = self._ema(self.frame_s, frame_s)
+        self.compute_s = self._ema(self.compute_s, compute_s)
+        self.render_s = self._ema(self.render_s, max(frame_s - compute_s, 0.0))
+
+    def frames_to_advance(self, frame_s, interval_s, drop_frames=True):
+        """
+        Anzahl Schritte (day_stride) bis zum nächsten Frame. 1 = kein Drop.
+        Bei Überlauf werden die Frames übersprungen, die während der Verspätung
+        hätten gezeigt werden sollen.
+        """
+        if not drop_frames or interval_s <= 0 or frame_s <= interval_s:
+            return 1
+        steps = math.ceil(frame_s / interval_s)
+        self.dropped += steps - 1
+        return steps
+
+    def sustainable_speed_ms(self, bounds, headroom=1.15, step=50):
+        """Kleinste Intervalllänge (ms), die bei der gemessenen Framedauer haltbar ist."""
+        if self.frame_s is None:
+            return None
+        speed = math.ceil(self.frame_s * 1000.0 * headroom / step) * step
+        return int(min(max(speed, bounds[0]), bounds[1]))
+
+    @property
+    def fps(self):
+        if len(self._shown) < 2:
+            return 0.0
+        span = self._shown[-1] - self._shown[0]
+        return (len(self._shown) - 1) / span if span > 0 else 0.0
+
+    def format_stats(self):
+        if self.frame_s is None:
+            return ""
+        return (f"⏱️ {self.fps:.2f} fps · {self.dropped} dropped · "
+                f"compute {self.compute_s * 1000:.0f} ms · render {self.render_s * 1000:.0f} ms")
@@ -0,0 +1,136 @@
+"""
+Mehrfachauswahl von Catchments (Box/Lasso auf der Hauptkarte) und flächengewichtete
+Aggregate über die Auswahl.
+
+Eine HRU gilt als ausgewählt, wenn ihr repräsentativer Punkt (liegt immer im Polygon)
+in der Box bzw. im Lasso liegt. Die Punkte werden einmal pro GeoDataFrame in Lon/Lat
+und Mercator berechnet; der Test ist ein vektorisierter contains_xy-Aufruf.
+
+Gewichtet wird mit der statischen Variable 'area'. Statt pro HRU zu aggregieren, wird
+das Fenster als ein Block (time, k) gelesen und mit einem Matrix-Vektor-Produkt zur
+flächengewichteten Gebietsreihe reduziert; darauf läuft die gewählte Aggregation.
+"""
+import threading
+
+import numpy as np
+import shapely
+import cartopy.crs as ccrs
+from shapely.geometry import box, Polygon
+
+from dashboard.views.time_arrays import time_major_values, hru_major_values, time_index_range
+
+# Aggregation einer (Gebiets-)Zeitreihe wie aggregate_data über die Zeitachse
+SERIES_REDUCERS = {
+    'sum': np.nansum,
+    'mean': np.nanmean,
+    'max': np.nanmax,
+    'min': np.nanmin,
+    'median': np.nanmedian,
+    'p90': lambda values: np.nanpercentile(values, 90),
+    'p99': lambda values: np.nanpercentile(values, 99),
+    'std': np.nanstd,
+}
+
+
+class _SelectionPoints:
+    """Repräsentative Punkte der Polygone in Lon/Lat (CRS des GeoDataFrames) und Mercator."""
+
+    def __init__(self, gdf):
+        points = gdf.geometry.representative_point()
+        self.lonlat = np.column_stack([points.x.values, points.y.values])
+        mercator = points.to_crs(ccrs.Mercator())
+        self.mercator = np.column_stack([mercator.x.values, mercator.y.values])
+        self.hru = gdf['hru'].values
+
+
+# id(gdf) -> (gdf, _SelectionPoints)
+_points = {}
+_points_lock = threading.Lock()
+
+
+def _selection_points(gdf):
+    with _points_lock:
+        entry = _points.get(id(gdf))
+        if entry is None or entry[0] is not gdf:
+            entry = (gdf, _SelectionPoints(gdf))
+            _points[id(gdf)] = entry
+        return entry[1]
+
+
+def _hrus_in(shape, points, hru):
+    inside = shapely.contains_xy(shape, points[:, 0], points[:, 1])
+    return tuple(sorted(int(h) for h in hru[inside]))
+
+
+def hrus_in_bounds(gdf, bounds, mercator=False):
+    """HRUs in der Box (x0, y0, x1, y1); mercator=True bei Raster-Karten (Bild-CRS)."""
+    points = _selection_points(gdf)
+    return _hrus_in(box(*bounds), points.mercator if mercator else points.lonlat, points.hru)
+
+
+def hrus_in_lasso(gdf, geometry):
+    """HRUs im Lasso (Eckpunkte in Kartenkoordinaten, Mercator)."""
+    geometry = np.asarray(geometry, dtype=np.float64)
+    if len(geometry) < 3:
+        return ()
+    points = _selection_points(gdf)
+    return _hrus_in(Polygon(geometry).buffer(0), points.mercator, points.hru)
+
+
+def hrus_in_polygon(gdf, geometry):
+    """HRUs im Polygon (shapely-Geometrie in Lon/Lat, z.B. eine Region aus REGIONS_FILE)."""
+    points = _selection_points(gdf)
+    return _hrus_in(geometry, points.lonlat, points.hru)
+
+
+def area_weights(area_ds, dataset, hrus):
+    """
+    Spalten der HRUs in dataset und ihre Gewichte (Fläche aus area_ds['area'], sonst gleich).
+    HRUs, die in dataset fehlen, werden ausgelassen.
+    """
+    index = dataset.indexes['hru']
+    cols = index.get_indexer(list(hrus))
+    hrus = np.asarray(hrus)[cols >= 0]
+    cols = cols[cols >= 0]
+    if 'area' in area_ds and 'time' not in area_ds['area'].dims:
+        weights = area_ds['area'].sel(hru=hrus).values.astype(np.float64)
+        weights = np.where(np.isfinite(weights) & (weights > 0), weights, 0.0)
+    else:
+        weights = np.ones(len(cols))
+    return cols, weights
+
+
+def weighted_mean(block, weights, axis):
+    """Flächengewichtetes Mittel über die HRU-Achse von block; fehlende Werte zählen nicht."""
+    finite = np.isfinite(block)
+    values = np.where(finite, block, 0.0)
+    if axis == 1:
+        num, den = values @ weights, finite @ weights
+    else:
+        num, den = weights @ values, weights @ finite
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def regional_window_value(dataset, var_name, cols, weights, date_range, agg_method):
+    """Aggregat der flächengewichteten Gebietsreihe über das Fenster (statisch: gewichtetes Mittel)."""
+    if len(cols) == 0:
+        return None
+    if 'time' not in dataset[var_name].dims:
+        value = weighted_mean(dataset[var_name].values[cols][None, :], weights, axis=1)[0]
+        return None if np.isnan(value) else float(value)
+    i0, i1 = time_index_range(dataset, date_range)
+    if i1 <= i0:
+        return None
+    # Ein zusammenhängender Zeilenblock des zeitmajoren Arrays, dann eine gewichtete Reduktion
+    block = time_major_values(dataset, var_name)[i0:i1].take(cols, axis=1)
+    series = weighted_mean(block, weights, axis=1)
+    if not np.isfinite(series).any():
+        return None
+    return float(SERIES_REDUCERS.get(agg_method, np.nansum)(series))
+
+
+def regional_series(dataset, var_name, cols, weights, i0=0, i1=None):
+    """Flächengewichtete Gebietsreihe [i0, i1) aus den Zeilen des hru-majoren Arrays."""
+    rows = hru_major_values(dataset, var_name)[:, i0:i1].take(cols, axis=0)
+    return weighted_mean(rows, weights, axis=0)
@@ -0,0 +1,115 @@
+"""
+Zeitreihen einer einzelnen HRU für die Detailansicht.
+
+Gelesen wird über die (hru, time)-Sicht auf das zeitmajore Array (hru_major_values, keine
+Kopie): eine Zeile ist die ganze Zeitreihe der HRU. Das Array baut die Ansicht vor dem ersten
+Zugriff im Thread-Pool auf (MainView._series_arrays_ready), nicht im Event-Loop. Anschliessend wird serverseitig auf die Pixelbreite der
+Kurve reduziert ('lttb' oder 'minmax'); beim Zoomen wird nur der sichtbare Bereich
+neu gelesen und reduziert, so dass mehr Details erscheinen. Bei einer Mehrfachauswahl
+wird statt einer Zeile die flächengewichtete Gebietsreihe gezeigt (hru_selection),
+für die Gebietssummen die gecachte Reihe einer Region (regional_totals).
+"""
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import TIMESERIES_WIDTH, TIMESERIES_DOWNSAMPLE
+from dashboard.views.time_arrays import hru_major_values
+from dashboard.views.hru_selection import area_weights, regional_series
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(values, n_out):
+    """
+    Largest-Triangle-Three-Buckets auf gleichabständigen Punkten (x = Position):
+    pro Bucket der Punkt mit der grössten Dreiecksfläche zum zuletzt gewählten Punkt
+    und zum Mittelwert des nächsten Buckets. Erster und letzter Punkt bleiben erhalten.
+    """
+    n = len(values)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 Buckets über die inneren Punkte
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    x = np.arange(n, dtype=np.float64)
+    y = np.asarray(values, dtype=np.float64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    # Mittelwert des nächsten Buckets; nach dem letzten Bucket der Endpunkt
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(values, n_out):
+    """Minimum und Maximum pro Pixel (n_out // 2 Buckets), zeitlich sortiert."""
+    n = len(values)
+    buckets = max(n_out // 2, 1)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((values, bucket))
+    # Nach bucket, dann Wert sortiert: erstes Element = Minimum, letztes = Maximum
+    starts = np.searchsorted(bucket[order], np.arange(buckets), side='left')
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample_indices(values, n_out, method=TIMESERIES_DOWNSAMPLE):
+    """Indizes der darzustellenden Punkte; fehlende Werte (NaN) werden vorher entfernt."""
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unbekannte Reduktion '{method}', erwartet: {', '.join(DOWNSAMPLE_METHODS)}")
+    valid = np.flatnonzero(np.isfinite(values))
+    if len(valid) <= n_out:
+        return valid
+    reduce = lttb_indices if method == 'lttb' else minmax_indices
+    return valid[reduce(values[valid], n_out)]
+
+
+def _visible_range(times, x_range):
+    """Indexbereich [i0, i1) des sichtbaren Ausschnitts (plus je ein Punkt Rand)."""
+    if x_range is None:
+        return 0, len(times)
+    start, end = map(pd.Timestamp, x_range)
+    return (max(int(times.searchsorted(start, side='left')) - 1, 0),
+            min(int(times.searchsorted(end, side='right')) + 1, len(times)))
+
+
+def hru_series(dataset, var_name, hru, x_range=None, n_out=TIMESERIES_WIDTH, method=TIMESERIES_DOWNSAMPLE):
+    """
+    Zeitreihe (Zeitpunkte, Werte) der HRU, reduziert auf etwa n_out Punkte.
+    x_range (Start, Ende) begrenzt auf den sichtbaren Bereich.
+    """
+    row = dataset.indexes['hru'].get_loc(hru)
+    times = dataset.indexes['time']
+    i0, i1 = _visible_range(times, x_range)
+    values = hru_major_values(dataset, var_name)[row, i0:i1]
+    idx = downsample_indices(values, n_out, method)
+    return times[i0:i1][idx], values[idx]
+
+
+def selection_series(area_ds, dataset, var_name, hrus, x_range=None, n_out=TIMESERIES_WIDTH,
+                     method=TIMESERIES_DOWNSAMPLE):
+    """Wie hru_series, aber die flächengewichtete Gebietsreihe über mehrere HRUs."""
+    times = dataset.indexes['time']
+    i0, i1 = _visible_range(times, x_range)
+    cols, weights = area_weights(area_ds, dataset, hrus)
+    values = regional_series(dataset, var_name, cols, weights, i0, i1)
+    idx = downsample_indices(values, n_out, method)
+    return times[i0:i1][idx], values[idx]
+
+
+def region_total_series(totals, region, x_range=None, n_out=TIMESERIES_WIDTH, method=TIMESERIES_DOWNSAMPLE):
+    """Wie hru_series, aber die Gebietssumme einer Region (RegionTotals aus regional_totals)."""
+    i0, i1 = _visible_range(totals.times, x_range)
+    values = totals.series(region, i0, i1)
+    idx = downsample_indices(values, n_out, method)
+    return totals.times[i0:i1][idx], values[idx]
@@ -0,0 +1,209 @@
+import concurrent.futures
+import itertools
+import threading
+import time
+from collections import deque
+
+from dashboard.config.settings import JOB_PRIORITIES, JOB_PREFETCH_RESERVE
+from dashboard.views.compute_backend import get_executor, update_executor_data
+
+
+class _QueuedJob:
+    def __init__(self, fn, args, kwargs, priority, session):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.session = session
+        self.queued_at = time.perf_counter()
+        # Future für den Aufrufer; bleibt PENDING (abbrechbar), solange der Job wartet
+        self.future = concurrent.futures.Future()
+
+
+class JobScheduler(concurrent.futures.Executor):
+    """
+    Prioritäts-Warteschlange vor dem prozessweiten Executor.
+
+    Der Executor arbeitet Jobs in Einreichungsreihenfolge ab: ein Play-Lauf einer
+    Session konnte so den Klick einer anderen Session verhungern lassen. Hier werden
+    nur so viele Jobs an den Executor gegeben, wie er Worker hat; der Rest wartet und
+    wird bei jedem freien Worker neu ausgewählt:
+
+    - Priorität: kleinere Zahl zuerst (siehe JOB_PRIORITIES: Hauptkarte, dann SHAP-/
+      Differenzkarte und Tabelle, dann Prefetch).
+    - Fairness: innerhalb einer Priorität kommt die Session mit den wenigsten laufenden
+      Jobs dran, bei Gleichstand die am längsten nicht bediente (Round Robin).
+    - Prefetch belegt nie die letzten JOB_PREFETCH_RESERVE Worker.
+
+    Wartende Jobs lassen sich abbrechen (Future.cancel) und in der Priorität anheben
+    (promote), z.B. wenn eine sichtbare Anfrage auf einen Prefetch-Job wartet.
+    """
+
+    def __init__(self, executor, capacity=None, prefetch_reserve=JOB_PREFETCH_RESERVE):
+        self.executor = executor
+        # None: Executor ohne Worker-Limit (inline) – Jobs werden direkt abgegeben
+        self.capacity = capacity if capacity is not None else getattr(executor, '_max_workers', None)
+        self.prefetch_priority = JOB_PRIORITIES['prefetch']
+        self.prefetch_reserve = prefetch_reserve if (self.capacity or 0) > prefetch_reserve else 0
+        self._lock = threading.RLock()
+        # priority -> session -> deque von _QueuedJob
+        self._queues = {}
+        # session -> Anzahl laufender Jobs
+        self._running = {}
+        self._running_total = 0
+        # session -> Zeitpunkt der letzten Zuteilung (Zähler)
+        self._served = {}
+        self._tick = itertools.count()
+        # Executor-Future -> _QueuedJob (für promote)
+        self._by_future = {}
+        self.stats = dict(dispatched=0, cancelled=0, promoted=0, max_wait_ms=0.0)
+
+    def submit(self, fn, /, *args, priority=None, session=None, **kwargs):
+        """Wie Executor.submit; priority (Default: Prefetch) und session steuern die Zuteilung."""
+        job = _QueuedJob(fn, args, kwargs, self.prefetch_priority if priority is None else priority, session)
+        if self.capacity is None:
+            self._start(job)
+            return job.future
+        with self._lock:
+            self._queues.setdefault(job.priority, {}).setdefault(session, deque()).append(job)
+            self._by_future[job.future] = job
+        self._dispatch()
+        return job.future
+
+    def promote(self, future, priority):
+        """Wartenden Job auf eine höhere Priorität setzen (laufende Jobs: ohne Wirkung)."""
+        with self._lock:
+            job = self._by_future.get(future)
+            if job is None or priority >= job.priority:
+                return False
+            sessions = self._queues.get(job.priority, {})
+            queue = sessions.get(job.session)
+            if queue is None or job not in queue:
+                return False
+            queue.remove(job)
+            if not queue:
+                del sessions[job.session]
+            job.priority = priority
+            self._queues.setdefault(priority, {}).setdefault(job.session, deque()).append(job)
+            self.stats['promoted'] += 1
+        self._dispatch()
+        return True
+
+    def _next_job(self):
+        """Nächsten Job wählen (unter Lock). None, wenn nichts gestartet werden darf."""
+        free = self.capacity - self._running_total
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if priority >= self.prefetch_priority and free <= self.prefetch_reserve:
+                return None
+            while sessions:
+                session = min(sessions, key=lambda s: (self._running.get(s, 0), self._served.get(s, -1)))
+                queue = sessions[session]
+                job = queue.popleft()
+                if not queue:
+                    del sessions[session]
+                if job.future.set_running_or_notify_cancel():
+                    return job
+                # Während des Wartens abgebrochen
+                self._by_future.pop(job.future, None)
+                self.stats['cancelled'] += 1
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._running_total >= self.capacity:
+                    return
+                job = self._next_job()
+                if job is None:
+                    return
+                self._by_future.pop(job.future, None)
+                self._running[job.session] = self._running.get(job.session, 0) + 1
+                self._running_total += 1
+                self._served[job.session] = next(self._tick)
+                wait_ms = (time.perf_counter() - job.queued_at) * 1000
+                self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], wait_ms)
+                self.stats['dispatched'] += 1
+            # Ausserhalb des Locks abgeben: inline/Thread-Executoren rufen _finished sofort auf
+            self._start(job, running=True)
+
+    def _start(self, job, running=False):
+        if not running and not job.future.set_running_or_notify_cancel():
+            return
+        try:
+            inner = self.executor.submit(job.fn, *job.args, **job.kwargs)
+        except BaseException as exc:
+            job.future.set_exception(exc)
+            if running:
+                self._finished(job)
+            return
+        inner.add_done_callback(lambda f: self._done(job, f, running))
+
+    def _done(self, job, inner, running):
+        if inner.cancelled():
+            job.future.set_exception(concurrent.futures.CancelledError())
+        elif inner.exception() is not None:
+            job.future.set_exception(inner.exception())
+        else:
+            job.future.set_result(inner.result())
+        if running:
+            self._finished(job)
+
+    def _finished(self, job):
+        with self._lock:
+            self._running_total -= 1
+            remaining = self._running.get(job.session, 1) - 1
+            if remaining:
+                self._running[job.session] = remaining
+            else:
+                self._running.pop(job.session, None)
+            if len(self._served) > 4 * len(self._running) + 1024:
+                # Beendete Sessions nicht unbegrenzt merken
+                queued = {s for sessions in self._queues.values() for s in sessions}
+                self._served = {s: t for s, t in self._served.items() if s in queued or s in self._running}
+        self._dispatch()
+
+    def waiting(self):
+        with self._lock:
+            return {priority: sum(len(q) for q in sessions.values())
+                    for priority, sessions in sorted(self._queues.items()) if sessions}
+
+    def format_stats(self):
+        with self._lock:
+            waiting = sum(self.waiting().values())
+            return (f"Queue: {self._running_total}/{self.capacity or '∞'} laufend · {waiting} wartend · "
+                    f"max. Wartezeit {self.stats['max_wait_ms']:.0f} ms")
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        if cancel_futures:
+            with self._lock:
+                for sessions in self._queues.values():
+                    for queue in sessions.values():
+                        for job in queue:
+                            job.future.cancel()
+                self._queues.clear()
+                self._by_future.clear()
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+# Ein Scheduler pro Serverprozess, geteilt von allen Sessions
+_job_scheduler = None
+_job_scheduler_lock = threading.Lock()
+
+
+def get_job_scheduler(ds, shap_ds):
+    """Gibt den prozessweiten JobScheduler vor get_executor() zurück (beim ersten Aufruf erzeugt)."""
+    global _job_scheduler
+    with _job_scheduler_lock:
+        if _job_scheduler is None:
+            _job_scheduler = JobScheduler(get_executor(ds, shap_ds))
+        return _job_scheduler
+
+
+def update_job_data(ds, shap_ds):
+    """Ingest: Executor mit den neuen Datensätzen; wartende Jobs gehen an den neuen Executor."""
+    executor = update_executor_data(ds, shap_ds)
+    with _job_scheduler_lock:
+        if _job_scheduler is not None and executor is not None:
+            with _job_scheduler._lock:
+                _job_scheduler.executor = executor
@@ -1,16 +1,88 @@
+import datetime
+import os
+import threading
+
 import pandas as pd
+import xarray as xr
+
+from dashboard.config.settings import BASE_SCENARIO, EVENT_VARS, INGEST_DIR
+
+from dashboard.views.sliding_window import SlidingWindowRegistry, SLIDING_METHODS
+from dashboard.views.block_sketches import SKETCH_METHODS, sketch_aggregate
+from dashboard.views.climatology import anomaly
+from dashboard.views.color_scales import color_scale_quantiles
+from dashboard.views.hru_selection import area_weights, regional_window_value
+from dashboard.views.scenario_diff import scenario_difference
+from dashboard.views.driver_ranking import static_table, rank_drivers
+from dashboard.views.event_index import exceedance
+from dashboard.data.scenarios import get_catalog
+from dashboard.data.memory_report import register_cache
+from dashboard.data.shared_store import window_version
+from dashboard.data.ingest import register_append_hook, IngestWatcher
+from dashboard.views.result_cache import shared_result
+from dashboard.views.profiler import profiled_compute
+from dashboard.views.time_arrays import time_major_values, time_index_range, attach_shared_store
 
 # Globale vars
 ds = None
 shap_ds = None
 
+# Inkrementelle Fenster-Aggregation pro (Session, Datensatz, Variable, Aggregation)
+_sliding = SlidingWindowRegistry()
+register_cache('sliding_windows', _sliding.size)
+def _reset_sliding(old, new, n_old):
+    # Ingest: Zustände halten die alten Arrays; werden beim nächsten Fenster neu aufgebaut.
+    # Freigegebene Szenarien haben keine Zustände (ohne session_id gerechnet)
+    if new is not None:
+        _sliding.clear()
+
+register_append_hook('sliding_windows', _reset_sliding)
+
 def init_global_vars(_ds, _shap_ds):
     global ds, shap_ds
-    ds = _ds
-    shap_ds = _shap_ds
+    ds = attach_shared_store(_ds)
+    shap_ds = attach_shared_store(_shap_ds)
+
+def data_ends(_ds, _shap_ds):
+    """Letzter Tag beider Datensätze (None ohne Datensatz) – Datenstand für sync_global_vars."""
+    return {target: None if dataset is None else dataset.indexes['time'][-1]
+            for target, dataset in (('ds', _ds), ('shap', _shap_ds))}
+
+# Im Rechen-Worker: eigener IngestWatcher, um den Datenstand des Servers nachzuholen
+_worker_watcher = None
+_worker_sync_lock = threading.Lock()
+
+def sync_global_vars(ends):
+    """
+    Im Rechen-Worker: nach einem Ingest des Servers dieselben Tage aus INGEST_DIR anhängen
+    (bis zu den Datenenden ends). Die Append-Hooks verlängern dabei die Caches des Workers
+    wie im Server, statt sie mit einem neuen Pool kalt zu verlieren.
+    """
+    global _worker_watcher
+    if data_ends(ds, shap_ds) == ends:
+        return
+    with _worker_sync_lock:
+        if data_ends(ds, shap_ds) == ends or not INGEST_DIR:
+            return
+        if _worker_watcher is None:
+            _worker_watcher = IngestWatcher(INGEST_DIR, ds, shap_ds)
+        _worker_watcher.datasets = {'ds': ds, 'shap': shap_ds}
+        _worker_watcher.poll(until=ends)
+        init_global_vars(_worker_watcher.datasets['ds'], _worker_watcher.datasets['shap'])
+        if data_ends(ds, shap_ds) != ends:
+            print(f"[ingest] Worker {os.getpid()}: Datenstand {data_ends(ds, shap_ds)} statt {ends}")
+
+def run_synced(ends, fn, *args, **kwargs):
+    """Job im Rechen-Worker auf dem Datenstand ends ausführen (siehe MigratingProcessPool)."""
+    sync_global_vars(ends)
+    return fn(*args, **kwargs)
 
 def aggregate_data(dataset, var_name, date_range, agg_method):
     da = dataset[var_name]
+    if "time" in da.dims and agg_method in SKETCH_METHODS:
+        # median/p90/p99/std: exakt für kurze Fenster, sonst aus Block-Sketches
+        values = sketch_aggregate(dataset, var_name, date_range, agg_method)
+        return xr.DataArray(values, coords={'hru': dataset['hru'].values}, dims=['hru'], name=var_name)
     if "time" in da.dims:
         start, end = map(pd.to_datetime, date_range)
         sel = da.sel(time=slice(start, end))
@@ -20,28 +92,252 @@ def aggregate_data(dataset, var_name, date_range, agg_method):
             return sel.sum(dim="time")
     return da
 
-def compute_df(dataset, var_name, date_range, agg_method):
+def sliding_aggregate(dataset, var_name, date_range, agg_method, state_key):
+    """Aggregat über das Fenster, inkrementell aus dem letzten Fenster von state_key."""
+    i0, i1 = time_index_range(dataset, date_range)
+    if i1 <= i0:
+        return None
+    values = time_major_values(dataset, var_name)
+    aggregator = _sliding.get(state_key + (var_name, agg_method), values, agg_method)
+    with aggregator.lock:
+        return aggregator.update(i0, i1)
+
+def compute_df(dataset, var_name, date_range, agg_method, state_key=None):
     if var_name not in dataset:
         return None
+    if (state_key is not None and agg_method in SLIDING_METHODS
+            and 'time' in dataset[var_name].dims):
+        values = sliding_aggregate(dataset, var_name, date_range, agg_method, state_key)
+        if values is not None:
+            hru = pd.Index(dataset['hru'].values, name='hru')
+            return pd.DataFrame({var_name: values}, index=hru)
     agg_da = aggregate_data(dataset, var_name, date_range, agg_method)
     if agg_da is None:
         return None
     return agg_da.to_series().to_frame(name=var_name)
 
-def compute_map_df(var_name, date_range, agg_method):
-    return compute_df(ds, var_name, date_range, agg_method)
-
-def compute_shap_df(var_name, date_range, agg_method):
-    SHAP_VAR_MAPPING = {'P': 'sum_P', 'T': 'sum_T'}
-    shap_var = (
-        var_name
-        if var_name in shap_ds.data_vars
-        else SHAP_VAR_MAPPING.get(var_name)
-    )
-    df = compute_df(shap_ds, shap_var, date_range, agg_method) if shap_var else None
+def _state_key(session_id, dataset_name):
+    return None if session_id is None else (session_id, dataset_name)
+
+SHAP_VAR_MAPPING = {'P': 'sum_P', 'T': 'sum_T'}
+
+def shap_var_name(dataset, var_name):
+    """Name der SHAP-Variable zu var_name (P/T heissen im SHAP-Datensatz sum_P/sum_T)."""
+    return var_name if var_name in dataset.data_vars else SHAP_VAR_MAPPING.get(var_name)
+
+def _window_ends(args):
+    """Enddaten aller Zeitfenster (date_range) unter den Argumenten eines compute-Aufrufs."""
+    return [arg[1] for arg in args
+            if isinstance(arg, tuple) and len(arg) == 2 and all(isinstance(a, datetime.date) for a in arg)]
+
+def data_version(*args):
+    """
+    Version der geladenen Daten (Teil der Schlüssel im geteilten Resultat-Cache). Angehängte
+    Tage (Ingest) ändern sie nur für Aufrufe, deren Zeitfenster bis zum Datenende reicht.
+    """
+    return window_version((ds, shap_ds), _window_ends(args))
+
+def scale_version(*args):
+    """
+    Farbskalen: ohne Datenende, wie der Schlüssel in MainView._clim. Eine Skala bleibt beim
+    Ingest gültig; wird sie danach erst berechnet, gilt die aus dem verlängerten Datensatz.
+    """
+    return window_version((ds, shap_ds))
+
+def anomaly_version(var_name, date_range, agg_method, ref_period, *args):
+    """Anomalien hängen zusätzlich von der Referenzperiode ab (Klimatologie)."""
+    ref_end = datetime.date(int(ref_period[1]), 12, 31)
+    return window_version((ds, shap_ds), _window_ends((date_range,)) + [ref_end])
+
+def event_version(var_name, date_range, ref_period, *args):
+    """Schwellen des Ereignis-Index hängen von der Referenzperiode ab (wie die Klimatologie)."""
+    return anomaly_version(var_name, date_range, None, ref_period)
+
+def _scenario_versions(names):
+    catalog = get_catalog()
+    return tuple(catalog.version(name) for name in names if name != BASE_SCENARIO)
+
+def scenario_version(scenario, *args):
+    """data_version plus Version der Szenario-Datei (Basisdaten: keine)."""
+    return data_version(*args) + _scenario_versions([scenario])
+
+def scenario_diff_version(scenario, reference, *args):
+    return data_version(*args) + _scenario_versions([scenario, reference])
+
+def scenario_dataset(name):
+    """Datensatz eines Szenarios: Basisdaten oder aus dem Katalog (beim ersten Zugriff geöffnet)."""
+    return ds if name == BASE_SCENARIO else get_catalog().get(name, ds)
+
+@profiled_compute
+@shared_result(data_version)
+def compute_map_df(var_name, date_range, agg_method, session_id=None):
+    return compute_df(ds, var_name, date_range, agg_method, _state_key(session_id, 'ds'))
+
+@profiled_compute
+@shared_result(data_version)
+def compute_shap_df(var_name, date_range, agg_method, session_id=None):
+    shap_var = shap_var_name(shap_ds, var_name)
+    df = compute_df(shap_ds, shap_var, date_range, agg_method, _state_key(session_id, 'shap')) if shap_var else None
     if df is not None and shap_var != var_name:
         df.columns = [var_name]
     return df
 
-def compute_runoff_df(date_range, agg_method):
-    return compute_df(shap_ds, "Y", date_range, agg_method)
\ No newline at end of file
+@profiled_compute
+@shared_result(data_version)
+def compute_runoff_df(date_range, agg_method, session_id=None):
+    return compute_df(shap_ds, "Y", date_range, agg_method, _state_key(session_id, 'shap'))
+
+@profiled_compute
+@shared_result(anomaly_version)
+def compute_anomaly_df(var_name, date_range, agg_method, ref_period, basis, relative, session_id=None):
+    """Fenster-Aggregat als Anomalie gegenüber der (gecachten) Klimatologie der Referenzperiode."""
+    if var_name not in ds or 'time' not in ds[var_name].dims:
+        return None
+    df = compute_map_df(var_name, date_range, agg_method, session_id=session_id)
+    if df is None:
+        return None
+    df[var_name] = anomaly(df[var_name].values, ds, var_name, date_range, agg_method,
+                           ref_period, basis, relative=relative)
+    return df
+
+@profiled_compute
+@shared_result(scenario_version)
+def compute_scenario_df(scenario, var_name, date_range, agg_method, session_id=None):
+    """Hauptkarte für ein Szenario aus dem Katalog (Basisdaten wie compute_map_df)."""
+    if scenario == BASE_SCENARIO:
+        return compute_map_df(var_name, date_range, agg_method, session_id=session_id)
+    # Ohne Fensterzustand: das Szenario kann jederzeit aus dem Katalog verdrängt werden
+    return compute_df(scenario_dataset(scenario), var_name, date_range, agg_method)
+
+@profiled_compute
+@shared_result(scenario_diff_version)
+def compute_scenario_diff_df(scenario, reference, var_name, date_range, agg_method, session_id=None):
+    """Differenzkarte Szenario minus Referenz, in einem Durchlauf über beide Datensätze."""
+    dataset, reference_ds = scenario_dataset(scenario), scenario_dataset(reference)
+    if var_name not in dataset or var_name not in reference_ds:
+        return None
+    values = scenario_difference(dataset, reference_ds, var_name, date_range, agg_method)
+    if values is None:
+        return None
+    return pd.DataFrame({var_name: values}, index=pd.Index(ds['hru'].values, name='hru'))
+
+@profiled_compute
+@shared_result(data_version)
+def compute_window_comparison_df(var_name, date_range, compare_range, agg_method, session_id=None):
+    """
+    Vergleich zweier Zeitfenster in einem Job: Aggregat des Hauptfensters ('a'), des
+    Vergleichsfensters ('b') und die Differenz a - b. Beide laufen über compute_df mit je
+    einem eigenen Fensterzustand der Session: das Hauptfenster teilt ihn mit der Hauptkarte,
+    das Vergleichsfenster steht meist still und kostet dann nichts. median/p90/p99/std
+    kommen aus den Block-Sketches.
+    """
+    df_a = compute_df(ds, var_name, date_range, agg_method, _state_key(session_id, 'ds'))
+    df_b = compute_df(ds, var_name, compare_range, agg_method, _state_key(session_id, 'ds_compare'))
+    if df_a is None or df_b is None:
+        return None
+    a = df_a[var_name]
+    b = df_b[var_name].reindex(a.index)
+    return pd.DataFrame({'a': a, 'b': b, 'diff': a - b})
+
+@profiled_compute
+@shared_result(event_version)
+def compute_exceedance_df(var_name, date_range, ref_period, percentile, metric, session_id=None):
+    """
+    Überschreitungen des Perzentils (Schwelle pro HRU über die Referenzperiode) im Fenster,
+    als Kennzahl metric aus dem Ereignis-Index statt eines Durchlaufs über alle Tage.
+    """
+    if var_name not in EVENT_VARS or var_name not in ds or 'time' not in ds[var_name].dims:
+        return None
+    values = exceedance(ds, var_name, date_range, percentile, ref_period, metric)
+    if values is None:
+        return None
+    return pd.DataFrame({var_name: values}, index=pd.Index(ds['hru'].values, name='hru'))
+
+def _hru_value(da, hru):
+    try:
+        return float(da.sel(hru=hru).values)
+    except Exception:
+        return None
+
+@profiled_compute
+@shared_result(data_version)
+def compute_table_values(hru, var_name, date_range, agg_method, time_vars, static_vars, session_id=None):
+    """
+    Basiswerte der angeklickten HRU für die Aggregationstabelle.
+    Gibt (row_data, dynamic_keys) zurück: Variable -> Wert und die dynamischen Variablen.
+    """
+    row_data = {}
+    # Dynamische Gruppenvariablen (P, T) immer zuerst aggregieren
+    dynamic_keys = [dyn for dyn in ['P', 'T', 'Qmm_mod', 'Qmm_prevah'] if dyn in time_vars]
+    # Aktuelle Variable (evtl. dynamisch oder statisch)
+    if var_name in time_vars and var_name not in dynamic_keys:
+        dynamic_keys.append(var_name)
+    for name in dynamic_keys:
+        try:
+            row_data[name] = _hru_value(aggregate_data(ds, name, date_range, agg_method), hru)
+        except Exception:
+            row_data[name] = None
+    if var_name not in time_vars:
+        row_data[var_name] = _hru_value(ds[var_name], hru) if var_name in ds else None
+    # Statische Variablen
+    for stat in static_vars:
+        row_data[stat] = _hru_value(ds[stat], hru) if stat in ds else None
+    return row_data, dynamic_keys
+
+def _regional_value(name, cols, weights, date_range, agg_method):
+    if name not in ds:
+        return None
+    try:
+        return regional_window_value(ds, name, cols, weights, date_range, agg_method)
+    except Exception:
+        return None
+
+@profiled_compute
+@shared_result(data_version)
+def compute_selection_values(hrus, var_name, date_range, agg_method, time_vars, static_vars, session_id=None):
+    """
+    Wie compute_table_values, aber flächengewichtet über mehrere HRUs (Box/Lasso-Auswahl):
+    pro Variable eine gewichtete Reduktion über den Fensterblock statt einer pro HRU.
+    """
+    cols, weights = area_weights(ds, ds, hrus)
+    row_data = {}
+    dynamic_keys = [dyn for dyn in ['P', 'T', 'Qmm_mod', 'Qmm_prevah'] if dyn in time_vars]
+    if var_name in time_vars and var_name not in dynamic_keys:
+        dynamic_keys.append(var_name)
+    for name in dynamic_keys:
+        row_data[name] = _regional_value(name, cols, weights, date_range, agg_method)
+    if var_name not in time_vars:
+        row_data[var_name] = _regional_value(var_name, cols, weights, date_range, agg_method)
+    for stat in static_vars:
+        row_data[stat] = _regional_value(stat, cols, weights, date_range, agg_method)
+    return row_data, dynamic_keys
+
+@profiled_compute
+@shared_result(data_version)
+def compute_driver_ranking(target, var_name, date_range, agg_method, method, session_id=None):
+    """
+    Rangliste der statischen Attribute nach Korrelation mit dem Fenster-Aggregat der Zielgrösse
+    (Runoff-Variable, 'Y' oder 'shap' = SHAP-Werte von var_name). Die Aggregate sind dieselben
+    Jobs wie die der Karten und kommen meist aus dem Cache bzw. dem Fensterzustand der Session.
+    """
+    if target == 'shap':
+        df, column = compute_shap_df(var_name, date_range, agg_method, session_id=session_id), var_name
+    elif target == 'Y':
+        df, column = compute_runoff_df(date_range, agg_method, session_id=session_id), 'Y'
+    else:
+        df, column = compute_map_df(target, date_range, agg_method, session_id=session_id), target
+    if df is None or df.empty:
+        return None
+    table = static_table(ds)
+    return rank_drivers(table, df[column].reindex(table.hru).values, method)
+
+@profiled_compute
+@shared_result(scale_version)
+def compute_color_scale(dataset_name, var_name, agg_method, bucket, session_id=None):
+    """Quantile für die feste Farbskala (siehe color_scales) aus ds bzw. shap_ds."""
+    dataset = ds if dataset_name == 'ds' else shap_ds
+    if dataset_name == 'shap':
+        var_name = shap_var_name(shap_ds, var_name)
+    if var_name is None or var_name not in dataset:
+        return None
+    return color_scale_quantiles(dataset, var_name, agg_method, bucket)
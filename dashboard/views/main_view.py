@@ -1,11 +1,41 @@
 import asyncio
-import os
-from concurrent.futures import ProcessPoolExecutor
+import datetime
+import time
+import uuid
+from functools import partial
 import numpy as np
 
-from dashboard.config.settings import MIN_DAY_STRIDE, MAX_DAY_STRIDE, INIT_SPEED_MS, INIT_AGG_METHOD
-from dashboard.views.main_multiprocessing import init_global_vars, compute_map_df, compute_runoff_df, compute_shap_df
-from dashboard.widgets.table_aggregation_widget import create_aggregation_widget
+from dashboard.config.settings import MIN_DAY_STRIDE, MAX_DAY_STRIDE, INIT_SPEED_MS, INIT_AGG_METHOD, AGG_METHODS, \
+    CLIMATOLOGY_REF_PERIOD, JOB_PRIORITIES, MAP_RENDER_ENGINE, TIMESERIES_VARS, TIMESERIES_WIDTH, BASE_SCENARIO, \
+    DRIVER_TARGETS, DRIVER_METHODS, DRIVER_TOP_N, DRIVER_PD_CURVES, DOMAIN_REGION, REGION_TOTAL_VARS, \
+    EVENT_PERCENTILES, EVENT_METRICS, EVENT_VARS
+from dashboard.views.main_multiprocessing import compute_map_df, compute_runoff_df, compute_shap_df, compute_anomaly_df, \
+    compute_table_values, compute_color_scale, compute_selection_values, compute_scenario_df, compute_scenario_diff_df, \
+    compute_driver_ranking, compute_exceedance_df, compute_window_comparison_df
+from dashboard.views.color_scales import scale_length, lookup_scale, store_scale, clim_from_scale
+from dashboard.data.shared_store import append_stable_fingerprint
+from dashboard.views.climatology import CLIMATOLOGY_BASES
+from dashboard.views.compute_backend import get_executor
+from dashboard.views.job_scheduler import get_job_scheduler
+from dashboard.data.ingest import register_data_listener
+from dashboard.data.scenarios import get_catalog
+from dashboard.views.raster_maps import choropleth, choropleths, get_grid
+from dashboard.views.hru_series import hru_series, selection_series, region_total_series
+from dashboard.views.time_arrays import time_major_values, time_major_ready
+from dashboard.views.regional_totals import region_weights, region_totals
+from dashboard.views.hru_selection import hrus_in_bounds, hrus_in_lasso
+from dashboard.views.request_scheduler import RequestScheduler
+from dashboard.views.frame_pacer import FramePacer
+from dashboard.views.single_flight import compute_flights
+from dashboard.views.profiler import profiled, profile_block, profiling_enabled
+from dashboard.widgets.table_aggregation_widget import create_aggregation_widget, table_rows, set_table_labels, \
+    update_table_values
+from dashboard.widgets.driver_widgets import create_driver_target_selector, create_driver_method_selector, \
+    DRIVER_TARGET_LABELS
+from dashboard.widgets.event_widgets import EVENT_METRIC_LABELS
+from dashboard.widgets.compare_widgets import create_compare_toggle
+from dashboard.widgets.date_picker import create_date_picker, on_start_change, on_end_change
+from dashboard.widgets.region_widgets import create_region_selector, create_region_var_selector
 
 # Link Aggregationsfunktion an MainView
 import param
@@ -14,10 +44,38 @@ import pandas as pd
 
 import holoviews as hv
 import geoviews as gv
-from holoviews.streams import Tap
+from holoviews.streams import Tap, RangeX, Params, BoundsXY, Lasso, Pipe
 import cartopy.crs as ccrs
 from shapely.geometry import Point
 
+def _busy_start():
+    """Lade-Spinner einschalten (Panel >= 1.9 führt eine Liste aktiver Events statt eines Zählers)."""
+    if hasattr(pn.state, '_add_busy_event'):
+        event_id = f"play-{uuid.uuid4().hex}"
+        pn.state._add_busy_event(event_id)
+        return event_id
+    pn.state._busy_counter += 1
+    return None
+
+def _busy_end(event_id):
+    if event_id is not None:
+        pn.state._remove_busy_event(event_id)
+    else:
+        pn.state._busy_counter -= 1
+
+def _touches_appended(key, first_new):
+    """
+    Ob sich das Resultat zum Cache-Key durch die ab first_new angehängten Tage ändert: ein Datum im
+    Key (Fensterende) ab first_new oder eine Referenzperiode (Jahre), die bis dahin reicht.
+    """
+    for item in key:
+        if isinstance(item, datetime.date) and pd.Timestamp(item) >= pd.Timestamp(first_new):
+            return True
+        if (isinstance(item, tuple) and len(item) == 2 and all(isinstance(y, int) for y in item)
+                and item[1] >= first_new.year):
+            return True
+    return False
+
 class MainView(param.Parameterized):
     # Alle Variablen sollen in der Combobox auswählbar sein.
     variable = param.ObjectSelector(default=None, objects=[])
@@ -32,20 +90,69 @@ class MainView(param.Parameterized):
     playing = False
     # Spielgeschwindigkeit in Millisekunden (Standard: 300 ms)
     play_speed = param.Number(default=INIT_SPEED_MS, bounds=(50, 100000))
+    # Frames überspringen, wenn die Berechnung nicht mit play_speed mithält
+    play_drop_frames = param.Boolean(default=True)
+    # play_speed automatisch auf eine haltbare Rate erhöhen
+    play_adaptive = param.Boolean(default=False, label='Adapt speed')
+    # Erreichte FPS und Frame-Drops (Anzeige neben den Play-Controls)
+    play_stats = param.String(default="", precedence=-1)
+
+    # Vergleichsmodus: zweites, unabhängiges Zeitfenster (B); Karten beider Fenster und A - B
+    compare_mode = param.Boolean(default=False, label='Compare windows')
+    compare_start_date = param.CalendarDate(default=None)
+    compare_end_date = param.CalendarDate(default=None)
 
     # Zeitbereich (für Slider)
     time_min = param.CalendarDate(default=None)
     time_max = param.CalendarDate(default=None)
 
-    # Aggregationsfunktion für Zeitdimension (sum, mean, max, min)
+    # Aggregationsfunktion für Zeitdimension (sum, mean, max, min, median, p90, p99, std)
     agg_method = param.ObjectSelector(
         default=INIT_AGG_METHOD,
-        objects=['sum', 'mean', 'max', 'min'],
+        objects=AGG_METHODS,
         label='Aggregation'
     )
 
     # Tap-Stream für Klicks
     tap_stream = Tap(x=None, y=None, source=None)
+    # Box- und Lasso-Auswahl auf der Hauptkarte
+    box_stream = BoundsXY(bounds=None, source=None)
+    lasso_stream = Lasso(geometry=None, source=None)
+
+    # HRU der Zeitreihen-Ansicht (letzter Klick auf ein Catchment)
+    series_hru = param.Integer(default=None, allow_None=True, precedence=-1)
+    # HRUs der letzten Box-/Lasso-Auswahl (Tuple, None = Einzelklick); Tabelle und Zeitreihen
+    # zeigen dann flächengewichtete Werte über die Auswahl
+    selected_hrus = param.Parameter(default=None, precedence=-1)
+
+    # Kartenmodus: absolute Werte, Anomalie gegenüber der Klimatologie (absolut / in %),
+    # Differenz zwischen zwei Szenarien oder Überschreitungen einer Perzentil-Schwelle
+    map_mode = param.ObjectSelector(default='absolute',
+                                    objects=['absolute', 'anomaly', 'anomaly_pct', 'scenario_diff', 'exceedance'])
+    # Szenario der Hauptkarte (Katalog, siehe SCENARIO_CATALOG) und Referenz der Differenzkarte;
+    # Anomalien, SHAP-Karten, Tabelle und Zeitreihen zeigen die Basisdaten
+    scenario = param.ObjectSelector(default=BASE_SCENARIO, objects=[BASE_SCENARIO])
+    compare_scenario = param.ObjectSelector(default=BASE_SCENARIO, objects=[BASE_SCENARIO])
+    # Referenzperiode (Jahre, inklusive) und Basis der Klimatologie (Tag im Jahr oder Monat)
+    ref_period = param.Range(default=CLIMATOLOGY_REF_PERIOD)
+    clim_basis = param.ObjectSelector(default='doy', objects=list(CLIMATOLOGY_BASES))
+    # Ereignis-Karte: Perzentil der Schwelle (über die Referenzperiode) und Kennzahl pro HRU
+    event_percentile = param.ObjectSelector(default=EVENT_PERCENTILES[-1], objects=list(EVENT_PERCENTILES))
+    event_metric = param.ObjectSelector(default=EVENT_METRICS[0], objects=list(EVENT_METRICS))
+
+    # Treiber-Ranking der statischen Attribute: Zielgrösse und Korrelationsmass
+    driver_target = param.ObjectSelector(default=DRIVER_TARGETS[0], objects=list(DRIVER_TARGETS))
+    driver_method = param.ObjectSelector(default=DRIVER_METHODS[0], objects=list(DRIVER_METHODS))
+
+    # Gebietssummen: Region (ganzes Gebiet oder aus REGIONS_FILE) und Variable
+    region = param.ObjectSelector(default=DOMAIN_REGION, objects=[DOMAIN_REGION])
+    region_var = param.ObjectSelector(default=None, objects=[])
+
+    # Statistik des Request-Schedulers (verworfene/abgebrochene Jobs)
+    job_stats = param.String(default="", precedence=-1)
+
+    # Letzter Tag der Daten; wächst, wenn neue Tage angehängt werden (Ingest)
+    data_end = param.CalendarDate(default=None, precedence=-1)
 
     def __init__(self,
                  var_metadata,
@@ -70,19 +177,52 @@ class MainView(param.Parameterized):
         super().__init__(**params)
         # Variable Selector mit verfügbaren Variablen bestücken
         self.param.variable.objects = self.all_vars
+        scenarios = [BASE_SCENARIO] + get_catalog().names
+        self.param.scenario.objects = scenarios
+        self.param.compare_scenario.objects = scenarios
+        self.param.region.objects = region_weights(self.gdf, self.ds).names
+        region_vars = [v for v in REGION_TOTAL_VARS if v in self.ds and 'time' in self.ds[v].dims]
+        self.param.region_var.objects = region_vars
+        if self.region_var is None and region_vars:
+            self.region_var = region_vars[0]
         # Platzhalter für den DateRangeSlider
         self.date_range_slider = None
         # Caches for map visualizations to avoid redundant recomputations
         self._cache_map = {}
         self._cache_map_shap = {}
         self._cache_map_diff = {}
-        # Executor for asynchronous map building across processes (bypass GIL)
-        # Use initializer to set up global datasets in worker processes
-        self._executor = ProcessPoolExecutor(
-            max_workers=os.cpu_count(),
-            initializer=init_global_vars,
-            initargs=(self.ds, self.shap_ds)
-        )
+        self._cache_compare = {}
+        # Eine Aggregationstabelle pro Session; pro Frame wird nur die Spalte 'Value' gepatcht.
+        # Zeilen (Reihenfolge, lange Namen) pro Variablenmenge einmal berechnet
+        self._table_widget = None
+        self._table_order = None
+        self._table_rows = {}
+        self._table_header = pn.pane.Markdown("", margin=(0, 10))
+        self._table_view = None
+        # Treiber-Rankings pro Fenster; das Panel bekommt neue Daten über den Pipe-Stream
+        self._cache_drivers = {}
+        self._driver_pipe = Pipe(data=None)
+        # Executor for asynchronous map building (process pool, thread pool or inline,
+        # see COMPUTE_BACKEND); shared by all sessions of this server process
+        self._executor = get_executor(self.ds, self.shap_ds)
+        # Prioritäten und Fairness zwischen Sessions vor dem Executor
+        self._jobs = get_job_scheduler(self.ds, self.shap_ds)
+        # Vorab eingereichte Jobs des nächsten Play-Frames: (fn-Name, *args) -> Future
+        self._prefetched = {}
+        # Schlüssel für sessionbezogene Zustände in den Workern
+        self._session_id = uuid.uuid4().hex
+        # Debounce, Coalescing und Verwerfen überholter Anfragen
+        self._scheduler = RequestScheduler(on_stats=self._on_job_stats)
+        # Frame-Messung des letzten Play-Laufs
+        self.pacer = None
+        # Opt-in Profiler (DASHBOARD_PROFILE=on bzw. =url und ?profile=1)
+        self._profiling = profiling_enabled()
+        # Neue Tage (Ingest) kommen aus dem Event-Loop, angewendet im Dokument der Session
+        self.data_end = self.ds.indexes['time'][-1].date()
+        if self.compare_start_date is None and self.start_date is not None and self.end_date is not None:
+            self.compare_range = self._previous_window()
+        self._document = pn.state.curdoc
+        register_data_listener(self)
 
     @property
     def date_range(self):
@@ -109,9 +249,59 @@ class MainView(param.Parameterized):
         if self.end_date != computed_end:
             self.end_date = computed_end
 
+    @property
+    def compare_range(self):
+        return self.compare_start_date, self.compare_end_date
+
+    @compare_range.setter
+    def compare_range(self, value):
+        with param.parameterized.batch_call_watchers(self):
+            self.compare_start_date, self.compare_end_date = value
+
+    def _previous_window(self):
+        """
+        Standard-Vergleichsfenster: gleich lang, direkt vor dem Hauptfenster. Beginnt das
+        Hauptfenster zu nah am Datenbeginn, das Fenster direkt danach; sind die Daten für zwei
+        getrennte Fenster zu kurz, das erste Fenster der Daten.
+        """
+        start, end = pd.to_datetime(self.start_date), pd.to_datetime(self.end_date)
+        length = end - start
+        day = pd.Timedelta(days=1)
+        times = self.ds.indexes['time']
+        if start - day - length >= times[0]:
+            return (start - day - length).date(), (start - day).date()
+        if end + day + length <= times[-1]:
+            return (end + day).date(), (end + day + length).date()
+        return times[0].date(), (times[0] + length).date()
+
     def get_start_date(self):
         return self.date_range[0]
 
+    def on_data_appended(self, ds, shap_ds, first_new):
+        """Ingest-Benachrichtigung: Datensätze im nächsten Tick der Session austauschen."""
+        apply = partial(self._apply_appended, ds, shap_ds, first_new)
+        if self._document is not None and self._document.session_context is not None:
+            self._document.add_next_tick_callback(apply)
+        else:
+            apply()
+
+    def _apply_appended(self, ds, shap_ds, first_new):
+        self.ds = ds
+        self.shap_ds = shap_ds
+        # Nur gebaute Resultate verwerfen, die von den neuen Tagen abhängen: Fenster bis über das
+        # alte Datenende und Anomalien/Ereignisse, deren Referenzperiode neu bestimmt wird. Die
+        # Farbskalen bleiben beim Ingest gleich (siehe _clim), die übrigen Karten gültig.
+        for cache in (self._cache_map, self._cache_map_shap, self._cache_map_diff, self._cache_compare,
+                      self._cache_drivers):
+            for key in [k for k in cache if _touches_appended(k, first_new)]:
+                del cache[key]
+        self._prefetch(None)
+        self.data_end = ds.indexes['time'][-1].date()
+        if self.end_date is not None and self.end_date >= first_new:
+            self.param.trigger('end_date')
+        if self.series_hru is not None or self.selected_hrus:
+            self.param.trigger('series_hru')
+
     @pn.depends('play', watch=True)
     def toggle_play(self):
         self.playing = not self.playing
@@ -121,47 +311,218 @@ class MainView(param.Parameterized):
         else:
             self.play_button.name = "Play"
 
+    async def _await_frame(self):
+        """Wartet, bis alle Karten des aktuellen Zeitfensters berechnet und gebaut sind."""
+        self._scheduler.timings.clear()
+        maps = [self.get_map(), self.get_map_shap_ds(), self.get_map_run_off_diff()]
+        if self.compare_mode:
+            maps.append(self.get_compare_maps())
+        await asyncio.gather(*maps)
+        # Panel die Gelegenheit geben, die neuen Objekte auszuliefern
+        await asyncio.sleep(0)
+        # Nur die Karten zählen (das Treiber-Ranking läuft nebenher und bremst keinen Frame)
+        timings = self._scheduler.timings
+        return max((timings[slot][0] for slot in ('map', 'shap', 'diff', 'compare') if slot in timings),
+                   default=0.0)
+
     async def _play_loop(self):
         # Show loading spinner
-        pn.state._busy_counter += 1
+        busy_event = _busy_start()
+        pacer = self.pacer = FramePacer()
+        steps = 1
         try:
             while self.playing:
-                current_start = pd.to_datetime(self.get_start_date())
-                next_start = current_start + pd.Timedelta(days=self.day_stride)
-
-                if next_start.date() > pd.to_datetime(self.time_max).date():
-                    self.playing = False
-                    self.play_button.name = "Play"
+                t_frame = time.perf_counter()
+                if self._profiling:
+                    with profile_block('play_frame', self._profile_tag(), code=MainView._play_step.__code__,
+                                       allow_cprofile=False):
+                        steps = await self._play_step(pacer, steps)
+                else:
+                    steps = await self._play_step(pacer, steps)
+                if steps is None:
                     break
+                # Nächsten Frame mit niedriger Priorität vorab rechnen lassen
+                self._prefetch(self._next_window(steps))
+                # Nur die Restzeit des Intervalls warten
+                await asyncio.sleep(max(self.play_speed / 1000.0 - (time.perf_counter() - t_frame), 0.0))
+        finally:
+            self._prefetch(None)
+            # Hide loading spinner
+            _busy_end(busy_event)
 
-                self.date_range = (next_start.date(), (next_start + pd.Timedelta(days=self.day_stride - 1)).date())
+    def _next_window(self, steps):
+        """Zeitfenster steps Frames nach dem aktuellen, None nach dem Ende der Zeitreihe."""
+        next_start = pd.to_datetime(self.get_start_date()) + pd.Timedelta(days=self.day_stride * steps)
+        if next_start.date() > pd.to_datetime(self.time_max).date():
+            return None
+        return next_start.date(), (next_start + pd.Timedelta(days=self.day_stride - 1)).date()
 
-                # Warten, bis die UI Zeit hatte, zu reagieren
-                await asyncio.sleep(self.play_speed / 1000.0)
-        finally:
-            # Decrement busy counter to hide spinner
-            pn.state._busy_counter -= 1
+    async def _play_step(self, pacer, steps):
+        """Ein Frame des Play-Modus. Gibt die Schritte bis zum nächsten Frame zurück (None = Ende)."""
+        t_frame = time.perf_counter()
+        next_window = self._next_window(steps)
+
+        if next_window is None:
+            self.playing = False
+            self.play_button.name = "Play"
+            return None
+
+        self.date_range = next_window
+
+        # Latenz messen: Frame ist fertig, wenn alle Karten gebaut sind
+        compute_s = await self._await_frame()
+        frame_s = time.perf_counter() - t_frame
+        pacer.record(frame_s, compute_s)
+
+        if self.play_adaptive:
+            # Geschwindigkeit senken statt Frames zu verwerfen
+            sustainable = pacer.sustainable_speed_ms(self.param.play_speed.bounds)
+            if sustainable is not None and sustainable > self.play_speed:
+                self.play_speed = sustainable
+            steps = 1
+        else:
+            steps = pacer.frames_to_advance(frame_s, self.play_speed / 1000.0, self.play_drop_frames)
+        self.play_stats = pacer.format_stats()
+        return steps
 
     def _get_cmap_for_var(self, var_name):
         if var_name in self.var_cmaps:
             return self.var_cmaps[var_name]
         return self.var_cmaps.get('*default*', 'Viridis')
 
+    def _on_job_stats(self, stats):
+        self.job_stats = f"{self._scheduler.format_stats()} · {self._jobs.format_stats()}"
+
+    def _profile_tag(self):
+        """Parameter der aktuellen Anfrage für die Dateinamen des Profilers."""
+        return dict(session=self._session_id[:8], variable=self.variable, agg=self.agg_method,
+                    start=self.start_date, end=self.end_date, mode=self.map_mode)
+
+    def _submit(self, priority, fn, *args, **kwargs):
+        # Identische Anfragen anderer Sessions teilen sich den laufenden Job;
+        # session_id erlaubt die inkrementelle Fenster-Aggregation im Worker
+        return compute_flights.submit(self._jobs, fn, *args, priority=priority, session=self._session_id,
+                                      session_id=self._session_id, **kwargs)
+
+    def _submit_or_prefetched(self, priority, fn, *args, **kwargs):
+        """Job einreichen; ein fertiger Prefetch desselben Jobs wird direkt verwendet."""
+        prefetched = self._prefetched.pop((fn.__name__,) + args, None)
+        if prefetched is not None and prefetched.done() and not prefetched.cancelled():
+            return prefetched
+        # Läuft der Prefetch noch, hängt sich die Anfrage an und zieht ihn vor
+        future = self._submit(priority, fn, *args, **kwargs)
+        if prefetched is not None:
+            prefetched.cancel()
+        return future
+
+    def _prefetch(self, date_range):
+        """Karten-Jobs für date_range mit Prefetch-Priorität einreichen (None: nur aufräumen)."""
+        stale, self._prefetched = self._prefetched, {}
+        for future in stale.values():
+            future.cancel()
+        if date_range is None:
+            return
+        for cache, key, job in self._frame_jobs(date_range):
+            if key in cache:
+                continue
+            fn, args = job[0], job[1:]
+            self._prefetched[(fn.__name__,) + args] = self._submit(JOB_PRIORITIES['prefetch'], fn, *args)
+
+    async def _clim(self, slot, dataset_name, var_name, kind):
+        """
+        Fester Farbbereich für (Variable, Aggregation, Fensterlängen-Klasse): Lookup, beim
+        ersten Mal pro Serverprozess über den Executor aus dem ganzen Datensatz berechnet.
+        Bei sum zählt die exakte Fensterlänge.
+        """
+        dataset = self.ds if dataset_name == 'ds' else self.shap_ds
+        # Schlüssel bleibt beim Ingest gleich: gebaute Karten älterer Fenster behalten ihre Farben.
+        # Der geteilte Cache von compute_color_scale verwendet dieselbe Version (scale_version)
+        key = (append_stable_fingerprint(dataset), dataset_name, var_name, self.agg_method,
+               scale_length(self.agg_method, self.day_stride or 1))
+        found, scale = lookup_scale(key)
+        if not found:
+            future = compute_flights.submit(self._jobs, compute_color_scale, *key[1:],
+                                            priority=JOB_PRIORITIES[slot], session=self._session_id)
+            scale = await asyncio.wrap_future(future)
+            store_scale(key, scale)
+        return clim_from_scale(scale, kind)
+
+    async def _run_job(self, slot, key, build, fn, *args):
+        """Berechnung über den Request-Scheduler: nur der neueste Stand pro Slot wird gerendert."""
+        kwargs = {}
+        if self._profiling:
+            # Worker profiliert den zugehörigen compute_*_df-Aufruf
+            kwargs['profile_tag'] = self._profile_tag()
+        return await self._scheduler.run(
+            slot,
+            key,
+            lambda: self._submit_or_prefetched(JOB_PRIORITIES[slot], fn, *args, **kwargs),
+            build,
+            # Im Play-Modus gibt es keine Kaskaden: sofort rechnen
+            debounce=0 if self.playing else None
+        )
+
+    def _from_cache(self, slot, cache, key):
+        """Cache-Treffer beim Scheduler als neuesten Stand melden (überholt laufende Jobs)."""
+        return self._scheduler.resolve(slot, key, cache[key])
+
+    def _map_job(self, date_range):
+        """Cache-Key und compute-Job (fn, *args) der Hauptkarte für ein Zeitfenster."""
+        var_name = self.variable
+        start, end = date_range
+        if self.map_mode == 'scenario_diff':
+            key = (var_name, start, end, self.agg_method, self.map_mode, self.scenario, self.compare_scenario)
+            return key, (compute_scenario_diff_df, self.scenario, self.compare_scenario,
+                         var_name, date_range, self.agg_method)
+        if self.map_mode == 'exceedance':
+            ref_period = tuple(int(y) for y in self.ref_period)
+            key = (var_name, start, end, self.map_mode, ref_period, self.event_percentile, self.event_metric)
+            return key, (compute_exceedance_df, var_name, date_range, ref_period,
+                         self.event_percentile, self.event_metric)
+        if self.map_mode == 'absolute' and self.scenario != BASE_SCENARIO:
+            return ((var_name, start, end, self.agg_method, self.scenario),
+                    (compute_scenario_df, self.scenario, var_name, date_range, self.agg_method))
+        if self.map_mode == 'absolute':
+            return (var_name, start, end, self.agg_method), (compute_map_df, var_name, date_range, self.agg_method)
+        ref_period = tuple(int(y) for y in self.ref_period)
+        key = (var_name, start, end, self.agg_method, self.map_mode, ref_period, self.clim_basis)
+        return key, (compute_anomaly_df, var_name, date_range, self.agg_method,
+                     ref_period, self.clim_basis, self.map_mode == 'anomaly_pct')
+
+    def _frame_jobs(self, date_range):
+        """(Cache, Key, Job) aller Karten eines Frames, in der Reihenfolge ihrer Priorität."""
+        start, end = date_range
+        jobs = []
+        if self.variable is not None:
+            jobs.append((self._cache_map,) + self._map_job(date_range))
+            jobs.append((self._cache_map_shap, (self.variable, start, end, self.agg_method),
+                         (compute_shap_df, self.variable, date_range, self.agg_method)))
+        jobs.append((self._cache_map_diff, (start, end, self.agg_method),
+                     (compute_runoff_df, date_range, self.agg_method)))
+        if self.compare_mode and self.variable is not None:
+            jobs.append((self._cache_compare,) + self._compare_job(date_range))
+        return jobs
+
     @pn.depends('variable', 'start_date', 'end_date', 'agg_method', watch=False)
+    @profiled('get_map_shap_ds')
     async def get_map_shap_ds(self):
         """Async SHAP-Karte für die aktuell gewählte Variable."""
         var_name = self.variable
         key = (var_name, self.start_date, self.end_date, self.agg_method)
         if key in self._cache_map_shap:
-            return self._cache_map_shap[key]
-        loop = asyncio.get_running_loop()
-        df_values = await loop.run_in_executor(
-            self._executor,
+            return self._from_cache('shap', self._cache_map_shap, key)
+        clim = await self._clim('shap', 'shap', var_name, 'symmetric')
+        return await self._run_job(
+            'shap',
+            key,
+            partial(self._build_map_shap_ds, var_name, key, clim),
             compute_shap_df,
             var_name,
             self.date_range,
             self.agg_method
         )
+
+    def _build_map_shap_ds(self, var_name, key, clim, df_values):
         if df_values is None or df_values.empty:
             result = pn.pane.Markdown(f"Keine SHAP-Werte für Variable {var_name} vorhanden.", width=300)
         else:
@@ -182,27 +543,34 @@ class MainView(param.Parameterized):
                     xformatter='%.2e',
                     yformatter='%.2e'
                 )
-                values = merged[var_name].values
-                vmax = max(abs(values.max()), abs(values.min()))
-                opts['clim'] = (-vmax, vmax)
-                result = gv.Polygons(merged, crs=ccrs.PlateCarree(), vdims=[var_name, 'hru']).opts(**opts)
+                if clim is None:
+                    values = merged[var_name].values
+                    vmax = max(abs(values.max()), abs(values.min()))
+                    clim = (-vmax, vmax)
+                opts['clim'] = clim
+                result = choropleth(MAP_RENDER_ENGINE, self.gdf, merged, var_name, opts)
         self._cache_map_shap[key] = result
         return result
 
     @pn.depends('start_date', 'end_date', 'agg_method', watch=False)
+    @profiled('get_map_run_off_diff')
     async def get_map_run_off_diff(self):
         """Async Runoff-Differenz-Karte."""
         key = (self.start_date, self.end_date, self.agg_method)
         if key in self._cache_map_diff:
-            return self._cache_map_diff[key]
-        var_name = 'Y'
-        loop = asyncio.get_running_loop()
-        df_values = await loop.run_in_executor(
-            self._executor,
+            return self._from_cache('diff', self._cache_map_diff, key)
+        clim = await self._clim('diff', 'shap', 'Y', 'sequential')
+        return await self._run_job(
+            'diff',
+            key,
+            partial(self._build_map_run_off_diff, key, clim),
             compute_runoff_df,
             self.date_range,
             self.agg_method
         )
+
+    def _build_map_run_off_diff(self, key, clim, df_values):
+        var_name = 'Y'
         if df_values is None or df_values.empty:
             result = pn.pane.Markdown(f"Keine SHAP-Daten für Runoff-Differenz darstellbar.", width=300)
         else:
@@ -220,37 +588,53 @@ class MainView(param.Parameterized):
                 xformatter='%.2e',
                 yformatter='%.2e'
             )
-            values = merged[var_name].values
-            vmin, vmax = np.percentile(values, [2, 98])
-            opts['clim'] = (vmin, vmax)
-            result = gv.Polygons(merged, crs=ccrs.PlateCarree(), vdims=[var_name, 'hru']).opts(**opts)
+            if clim is None:
+                clim = tuple(np.percentile(merged[var_name].values, [2, 98]))
+            opts['clim'] = clim
+            result = choropleth(MAP_RENDER_ENGINE, self.gdf, merged, var_name, opts)
         self._cache_map_diff[key] = result
         return result
 
-    @pn.depends('variable', 'start_date', 'end_date', 'agg_method', watch=False)
+    @pn.depends('variable', 'start_date', 'end_date', 'agg_method',
+                'map_mode', 'ref_period', 'clim_basis', 'scenario', 'compare_scenario',
+                'event_percentile', 'event_metric', watch=False)
+    @profiled('get_map')
     async def get_map(self):
-        """Async aggregierte Karte für die gewählte Variable."""
+        """Async aggregierte Karte (absolut oder als Anomalie) für die gewählte Variable."""
         var_name = self.variable
         if var_name is None:
             return hv.Curve([]).opts(width=800, height=500)
-        key = (var_name, self.start_date, self.end_date, self.agg_method)
+        key, job = self._map_job(self.date_range)
         if key in self._cache_map:
-            return self._cache_map[key]
-        loop = asyncio.get_running_loop()
-        df_values = await loop.run_in_executor(
-            self._executor,
-            compute_map_df,
-            var_name,
-            self.date_range,
-            self.agg_method
+            result = self._from_cache('map', self._cache_map, key)
+            if isinstance(result, hv.Element):
+                self._attach_selection_streams(result)
+            return result
+        # Szenarien mit der Farbskala der Basisdaten: gleiche Farbe = gleicher Wert
+        clim = await self._clim('map', 'ds', var_name, 'sequential') if self.map_mode == 'absolute' else None
+        return await self._run_job(
+            'map',
+            key,
+            partial(self._build_map, var_name, key, self.map_mode, clim),
+            *job
         )
+
+    def _build_map(self, var_name, key, map_mode, clim, df_values):
         if df_values is None or df_values.empty:
-            result = hv.Curve([]).opts(width=800, height=500)
+            if map_mode == 'scenario_diff':
+                result = pn.pane.Markdown(f"Keine Szenario-Differenz für {var_name} im gewählten Zeitraum.", width=300)
+            elif map_mode == 'exceedance':
+                result = pn.pane.Markdown(f"Kein Ereignis-Index für {var_name} (nur {', '.join(EVENT_VARS)}).",
+                                          width=300)
+            elif map_mode != 'absolute':
+                result = pn.pane.Markdown(f"Keine Anomalie für {var_name} (nur zeitabhängige Variablen).", width=300)
+            else:
+                result = hv.Curve([]).opts(width=800, height=500)
         else:
             merged = self.gdf.join(df_values, on="hru", how="inner").dropna(subset=[var_name])
             opts = dict(
                 projection=ccrs.Mercator(),
-                tools=['hover', 'tap'],
+                tools=['hover', 'tap', 'box_select', 'lasso_select'],
                 color=var_name,
                 cmap=self._get_cmap_for_var(var_name),
                 colorbar=True,
@@ -261,30 +645,134 @@ class MainView(param.Parameterized):
                 xformatter='%.2e',
                 yformatter='%.2e'
             )
-            result = gv.Polygons(merged, crs=ccrs.PlateCarree(), vdims=[var_name, 'hru']).opts(**opts)
+            if map_mode == 'exceedance' and not merged.empty:
+                # Anzahlen und Dauern ab 0; erstes Auftreten: früh = dunkel
+                vmax = float(np.nanmax(merged[var_name].values)) or 1.0
+                opts['cmap'] = 'YlOrRd_r' if self.event_metric == 'first_day' else 'YlOrRd'
+                opts['clim'] = (0, vmax)
+            elif map_mode != 'absolute' and not merged.empty:
+                # Anomalien und Szenario-Differenzen: divergierende Farbskala symmetrisch um 0
+                values = merged[var_name].values
+                vmax = float(np.nanpercentile(np.abs(values), 98)) or 1.0
+                opts['cmap'] = 'BrBG' if var_name != 'T' else 'RdBu_r'
+                opts['clim'] = (-vmax, vmax)
+            elif clim is not None:
+                opts['clim'] = clim
+            result = choropleth(MAP_RENDER_ENGINE, self.gdf, merged, var_name, opts)
         self._cache_map[key] = result
-        self.tap_stream.source = result
+        if isinstance(result, hv.Element):
+            self._attach_selection_streams(result)
         return result
 
-    @pn.depends('tap_stream.x', 'tap_stream.y', 'agg_method', watch=False)
-    def get_table(self):
+    def _compare_job(self, date_range):
+        """Cache-Key und Job des Fenstervergleichs: beide Aggregate und die Differenz in einem Aufruf."""
+        start, end = date_range
+        key = (self.variable, start, end, self.compare_start_date, self.compare_end_date, self.agg_method)
+        return key, (compute_window_comparison_df, self.variable, date_range, self.compare_range, self.agg_method)
+
+    @pn.depends('compare_mode', 'variable', 'start_date', 'end_date', 'compare_start_date', 'compare_end_date',
+                'agg_method', watch=False)
+    @profiled('get_compare_maps')
+    async def get_compare_maps(self):
+        """Karten von Fenster A (Hauptfenster) und B (Vergleichsfenster) und ihre Differenz A - B."""
+        if not self.compare_mode:
+            return pn.pane.Markdown("Comparison mode is off.", width=300)
+        if self.variable is None:
+            return pn.pane.Markdown("No variable selected.", width=300)
+        key, job = self._compare_job(self.date_range)
+        if key in self._cache_compare:
+            return self._from_cache('compare', self._cache_compare, key)
+        return await self._run_job('compare', key, partial(self._build_compare_maps, key), *job)
+
+    def _build_compare_maps(self, key, df_values):
+        var_name, start, end, compare_start, compare_end, agg_method = key
+        if df_values is None or df_values.empty:
+            result = pn.pane.Markdown(f"Kein Vergleich für {var_name} in den gewählten Zeiträumen.", width=300)
+            self._cache_compare[key] = result
+            return result
+        # Zoomen und Verschieben sind über die Achsen gekoppelt
+        merged = self.gdf.join(df_values, on="hru", how="inner")
+        opts = dict(
+            projection=ccrs.Mercator(),
+            tools=['hover'],
+            colorbar=True,
+            line_color='black',
+            line_width=0.1,
+            width=420,
+            height=300,
+            xformatter='%.2e',
+            yformatter='%.2e'
+        )
+        # A und B mit derselben Farbskala: gleiche Farbe = gleicher Wert
+        both = np.concatenate([merged['a'].values, merged['b'].values])
+        lo, hi = (float(v) for v in np.nanpercentile(both, (2, 98))) if np.isfinite(both).any() else (0.0, 1.0)
+        clim = (lo, hi) if hi > lo else (lo, lo + 1.0)
+        diff = merged['diff'].values
+        vmax = (float(np.nanpercentile(np.abs(diff), 98)) if np.isfinite(diff).any() else 0.0) or 1.0
+        cmap = self._get_cmap_for_var(var_name)
+        # Eine Datenquelle mit den Spalten a, b und diff für alle drei Karten (Geometrie einmal)
+        maps = choropleths(MAP_RENDER_ENGINE, self.gdf, merged, ['a', 'b', 'diff'], [
+            dict(opts, color='a', cmap=cmap, clim=clim, title=f"A: {start} – {end}"),
+            dict(opts, color='b', cmap=cmap, clim=clim, title=f"B: {compare_start} – {compare_end}"),
+            dict(opts, color='diff', cmap='BrBG' if var_name != 'T' else 'RdBu_r',
+                 clim=(-vmax, vmax), title="A − B"),
+        ])
+        result = hv.Layout(maps).opts(shared_axes=True, shared_datasource=True).cols(3)
+        self._cache_compare[key] = result
+        return result
+
+    @pn.depends('variable', 'agg_method', 'compare_mode')
+    def get_compare_title(self):
+        if not self.compare_mode:
+            return pn.panel("### Window comparison")
+        return pn.panel(f"### Window comparison of '{self._get_long_name(self.variable)}' ({self.agg_method})")
+
+    def _attach_selection_streams(self, element):
+        self.tap_stream.source = element
+        self.box_stream.source = element
+        self.lasso_stream.source = element
+
+    @pn.depends('tap_stream.x', 'tap_stream.y', 'selected_hrus', 'variable', 'start_date', 'end_date',
+                'agg_method', watch=False)
+    @profiled('get_table')
+    async def get_table(self):
+        if self.selected_hrus:
+            if self.variable is None:
+                return pn.pane.Markdown("No variable selected.", width=300)
+            # Eine gewichtete Reduktion pro Variable über den Fensterblock (im Executor)
+            key = ('selection', self.selected_hrus, self.variable, self.start_date, self.end_date, self.agg_method)
+            return await self._run_job(
+                'table',
+                key,
+                partial(self._build_table, self.selected_hrus),
+                compute_selection_values,
+                self.selected_hrus,
+                self.variable,
+                self.date_range,
+                self.agg_method,
+                tuple(self.time_vars),
+                tuple(self.static_vars)
+            )
         if self.tap_stream.x is not None and self.tap_stream.y is not None:
             # Prüfe Klick-Koordinaten
-            click_point = Point(self.tap_stream.x, self.tap_stream.y)
-            selected = self.gdf[self.gdf.geometry.contains(click_point)]
-            if len(selected) > 0:
-                hru_clicked = selected.iloc[0]['hru']
-                # Aggregations-Widget (Tabelle mit Basiswerten)
-                table_widget, table_hru = create_aggregation_widget(self, hru_clicked)
-                # Bei Markdown-Fallback direkt zurückgeben
-                if table_hru is None:
-                    return table_widget
-                # Aggregationstabelle mit Titel und voller Breite
-                agg_panel = pn.Column(
-                    table_widget,
-                    sizing_mode="stretch_width"
+            hru_clicked = self._hru_at(self.tap_stream.x, self.tap_stream.y)
+            if hru_clicked is not None:
+                if self.variable is None:
+                    return pn.pane.Markdown("No variable selected.", width=300)
+                # Basiswerte im Executor aggregieren, nicht im Event-Loop
+                key = (hru_clicked, self.variable, self.start_date, self.end_date, self.agg_method)
+                return await self._run_job(
+                    'table',
+                    key,
+                    partial(self._build_table, hru_clicked),
+                    compute_table_values,
+                    hru_clicked,
+                    self.variable,
+                    self.date_range,
+                    self.agg_method,
+                    tuple(self.time_vars),
+                    tuple(self.static_vars)
                 )
-                return agg_panel
             else:
                 # No polygon under click point: show Markdown message
                 return pn.pane.Markdown("No polygon found at the click location.", width=300)
@@ -292,6 +780,232 @@ class MainView(param.Parameterized):
             # Before clicking: show prompt
             return pn.pane.Markdown("Click on a polygon to see details.", width=300)
 
+    def _hru_at(self, x, y):
+        """HRU unter dem Klick: Raster-Karten liefern Mercator-Koordinaten und lösen über das Gitter auf."""
+        if MAP_RENDER_ENGINE == 'raster':
+            hru = get_grid(self.gdf, 800).hru_at(x, y)
+            return None if hru is None else int(hru)
+        selected = self.gdf[self.gdf.geometry.contains(Point(x, y))]
+        return int(selected.iloc[0]['hru']) if len(selected) > 0 else None
+
+    def _series_vars(self):
+        """(dataset_name, var_name, Datensatz) der Zeitreihen-Variablen, die es in den Daten gibt."""
+        for dataset_name, var_name in TIMESERIES_VARS:
+            dataset = self.ds if dataset_name == 'ds' else self.shap_ds
+            if dataset is not None and var_name in dataset and 'time' in dataset[var_name].dims:
+                yield dataset_name, var_name, dataset
+
+    async def _series_arrays_ready(self):
+        """
+        Zeitmajore Arrays der Zeitreihen-Variablen vor der ersten Auswahl im Thread-Pool aufbauen:
+        im Prozess-Backend liegen sie im Serverprozess sonst erst beim ersten Klick vor, und
+        Laden/Transponieren würde den Event-Loop blockieren.
+        """
+        pending = [(dataset, var_name) for _, var_name, dataset in self._series_vars()
+                   if not time_major_ready(dataset, var_name)]
+        if pending:
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: [time_major_values(dataset, var_name) for dataset, var_name in pending])
+
+    @pn.depends('tap_stream.x', 'tap_stream.y', watch=True)
+    async def _update_series_hru(self):
+        if self.tap_stream.x is not None and self.tap_stream.y is not None:
+            hru = self._hru_at(self.tap_stream.x, self.tap_stream.y)
+            if hru is not None:
+                await self._series_arrays_ready()
+            with param.parameterized.batch_call_watchers(self):
+                # Ein Klick ersetzt eine Box-/Lasso-Auswahl
+                self.selected_hrus = None
+                self.series_hru = hru
+
+    @pn.depends('box_stream.bounds', watch=True)
+    async def _on_box_select(self):
+        if self.box_stream.bounds is not None:
+            # Raster-Karten liefern Mercator-Koordinaten (CRS des Bildes), Polygone Lon/Lat
+            hrus = hrus_in_bounds(self.gdf, self.box_stream.bounds, mercator=MAP_RENDER_ENGINE == 'raster')
+            if hrus:
+                await self._series_arrays_ready()
+            self.selected_hrus = hrus or None
+
+    @pn.depends('lasso_stream.geometry', watch=True)
+    async def _on_lasso_select(self):
+        if self.lasso_stream.geometry is not None:
+            hrus = hrus_in_lasso(self.gdf, self.lasso_stream.geometry)
+            if hrus:
+                await self._series_arrays_ready()
+            self.selected_hrus = hrus or None
+
+    def get_timeseries(self):
+        """
+        Zeitreihen der angeklickten HRU über den ganzen Datensatz, eine Kurve pro Variable
+        mit gemeinsamer Zeitachse. Ein RangeX-Stream für alle Kurven: beim Zoomen wird der
+        sichtbare Bereich neu gelesen und auf die Pixelbreite reduziert.
+        """
+        hru = Params(self, ['series_hru', 'selected_hrus'])
+        range_x = RangeX()
+        curves = []
+        for dataset_name, var_name, _ in self._series_vars():
+            label = var_name if dataset_name == 'ds' else f"SHAP {var_name}"
+            curves.append(hv.DynamicMap(partial(self._build_series, dataset_name, var_name, label),
+                                        streams=[hru, range_x]))
+        if not curves:
+            return pn.pane.Markdown("No time series available.", width=300)
+        return hv.Layout(curves).cols(1)
+
+    def _build_series(self, dataset_name, var_name, label, series_hru=None, selected_hrus=None, x_range=None):
+        # Datensatz erst hier auflösen: nach einem Ingest die verlängerte Version
+        dataset = self.ds if dataset_name == 'ds' else self.shap_ds
+        times = dataset.indexes['time']
+        # Fester x-Bereich (angefragter Ausschnitt), sonst passt framewise ihn an die Punkte an
+        xlim = tuple(map(pd.Timestamp, x_range)) if x_range is not None else (times[0], times[-1])
+        opts = dict(width=TIMESERIES_WIDTH, height=160, tools=['hover'], framewise=True,
+                    xlim=xlim, color='#1f77b4', line_width=1)
+        if selected_hrus:
+            x, y = selection_series(self.ds, dataset, var_name, selected_hrus, x_range)
+            title = f"{label} · area-weighted, {len(selected_hrus)} HRUs"
+        elif series_hru is not None and series_hru in dataset.indexes['hru']:
+            x, y = hru_series(dataset, var_name, series_hru, x_range)
+            title = f"{label} · HRU {series_hru}"
+        else:
+            return hv.Curve([], 'time', label).opts(title=label, **opts)
+        if len(y):
+            lo, hi = float(np.min(y)), float(np.max(y))
+            pad = (hi - lo) * 0.05 or 1.0
+            opts['ylim'] = (lo - pad, hi + pad)
+        return hv.Curve((x, y), 'time', label).opts(title=title, **opts)
+
+    def get_region_totals(self):
+        """
+        Gebietssumme der gewählten Region über den ganzen Datensatz (eine gecachte Reihe pro
+        Variable für alle Regionen); das aktuelle Fenster ist hinterlegt, sein Wert im Titel.
+        Kurve und Fenster sind getrennte DynamicMaps: ein neues Fenster (Play-Modus) ersetzt nur
+        den hinterlegten Bereich und den Titel, die Kurve wird nur bei Region, Variable, Ingest
+        oder Zoom neu gelesen.
+        """
+        if not self.param.region_var.objects:
+            return pn.pane.Markdown("No regional totals available.", width=300)
+        curve = hv.DynamicMap(self._build_region_series,
+                              streams=[Params(self, ['region', 'region_var', 'data_end']), RangeX()])
+        window = hv.DynamicMap(self._build_region_window,
+                               streams=[Params(self, ['region', 'region_var', 'start_date', 'end_date', 'data_end'])])
+        return curve * window
+
+    def _build_region_series(self, region=None, region_var=None, data_end=None, x_range=None):
+        totals = region_totals(self.gdf, self.ds, region_var)
+        times = totals.times
+        xlim = tuple(map(pd.Timestamp, x_range)) if x_range is not None else (times[0], times[-1])
+        label = self.var_metadata.get(region_var, {}).get('long_name', region_var)
+        opts = dict(width=TIMESERIES_WIDTH, height=200, tools=['hover'], framewise=True,
+                    xlim=xlim, color='#1f77b4', line_width=1, ylabel=totals.unit)
+        x, y = region_total_series(totals, region, x_range)
+        if len(y):
+            lo, hi = float(np.min(y)), float(np.max(y))
+            pad = (hi - lo) * 0.05 or 1.0
+            opts['ylim'] = (lo - pad, hi + pad)
+        return hv.Curve((x, y), 'time', label).opts(**opts)
+
+    def _build_region_window(self, region=None, region_var=None, start_date=None, end_date=None, data_end=None):
+        """Aktuelles Fenster als hinterlegter Bereich; Titel mit dem Fensterwert der Region."""
+        totals = region_totals(self.gdf, self.ds, region_var)
+        label = self.var_metadata.get(region_var, {}).get('long_name', region_var)
+        title = f"{label} · {totals.label(region)}"
+        if start_date is None or end_date is None:
+            # Leerer Bereich, damit das Overlay immer dieselben Ebenen hat
+            return hv.VSpan(None, None).opts(title=title)
+        value = totals.window_value(region, (start_date, end_date))
+        kind = 'total' if totals.quantity == 'volume' else 'mean'
+        if value is not None:
+            title += f" · window {kind} {value:.4g} {totals.window_unit}"
+        return hv.VSpan(pd.Timestamp(start_date), pd.Timestamp(end_date)).opts(color='orange', alpha=0.15,
+                                                                               title=title)
+
+    def _driver_job(self):
+        """Cache-Key und compute-Job des Treiber-Rankings für das aktuelle Fenster."""
+        start, end = self.date_range
+        # Nur das SHAP-Ziel hängt von der gewählten Variable ab
+        var_name = self.variable if self.driver_target == 'shap' else None
+        key = (self.driver_target, var_name, start, end, self.agg_method, self.driver_method)
+        return key, (compute_driver_ranking, self.driver_target, var_name, self.date_range,
+                     self.agg_method, self.driver_method)
+
+    @pn.depends('variable', 'start_date', 'end_date', 'agg_method', 'driver_target', 'driver_method', watch=True)
+    async def update_drivers(self):
+        """
+        Ranking mit niedriger Priorität im Hintergrund: im Play-Modus wartet kein Frame darauf,
+        überholte Fenster verwirft der Request-Scheduler.
+        """
+        key, job = self._driver_job()
+        if key in self._cache_drivers:
+            self._send_drivers(key, self._from_cache('drivers', self._cache_drivers, key))
+            return
+        await self._run_job('drivers', key, partial(self._send_drivers, key), *job)
+
+    def _send_drivers(self, key, result):
+        self._cache_drivers[key] = result
+        target, var_name, start, end, agg_method, method = key
+        label = f"SHAP {var_name}" if target == 'shap' else DRIVER_TARGET_LABELS.get(target, target)
+        # Methode mitschicken: die Achse gehört zum Resultat, nicht zur aktuellen Auswahl
+        self._driver_pipe.send((f"{label} · {agg_method} · {start} – {end}", result, method))
+        return result
+
+    def get_drivers(self):
+        """
+        Treiber-Ranking (Balken) und Antwortkurven der stärksten Attribute. Beide hängen am
+        selben Pipe-Stream: ein neues Fenster schickt nur Daten an die bestehenden Plots.
+        """
+        bars = hv.DynamicMap(self._build_driver_bars, streams=[self._driver_pipe])
+        curves = hv.DynamicMap(self._build_driver_response, streams=[self._driver_pipe])
+        return (bars + curves).cols(2)
+
+    def _build_driver_bars(self, data):
+        opts = dict(invert_axes=True, width=420, height=320, tools=['hover'], framewise=True,
+                    color='r', cmap='RdBu_r', clim=(-1, 1), ylim=(-1, 1))
+        if data is None or data[1] is None:
+            return hv.Bars([], 'feature', ['r', 'n']).opts(title="No ranking available", **opts)
+        title, result, method = data
+        # Stärkstes Attribut oben
+        top = result['ranking'].dropna(subset=['r']).head(DRIVER_TOP_N).iloc[::-1]
+        name = 'Spearman ρ' if method == 'spearman' else 'Pearson r'
+        return hv.Bars(top, 'feature', ['r', 'n']).redim.label(r=name).opts(title=title, **opts)
+
+    def _build_driver_response(self, data):
+        opts = dict(width=420, height=320, tools=['hover'], framewise=True, show_legend=True,
+                    xlabel='Quantile class of attribute', ylabel='Mean target')
+        curves = {rank: hv.Curve([], 'class', ['mean', 'feature', 'x']) for rank in range(1, DRIVER_PD_CURVES + 1)}
+        if data is not None and data[1] is not None:
+            ranking, response = data[1]['ranking'], data[1]['response']
+            top = ranking.dropna(subset=['r'])['feature'].head(DRIVER_PD_CURVES)
+            for rank, feature in enumerate(top, start=1):
+                curves[rank] = hv.Curve(response[response['feature'] == feature], 'class',
+                                        ['mean', 'feature', 'x'], label=feature)
+        return hv.NdOverlay(curves, kdims='rank').opts(title="Partial dependence (binned)", **opts)
+
+    def _build_table(self, hru_clicked, table_values):
+        """
+        Werte in die bestehende Aggregationstabelle schreiben. Gibt immer dieselbe Ansicht zurück:
+        der Browser behält die Tabelle und bekommt nur die geänderten Zellen.
+        """
+        if self.variable is None or table_values is None:
+            return pn.pane.Markdown("No variable selected.", width=300)
+        row_data, dynamic_keys = table_values
+        layout_key = (tuple(row_data), tuple(dynamic_keys))
+        if layout_key not in self._table_rows:
+            self._table_rows[layout_key] = table_rows(self.var_metadata, list(row_data), dynamic_keys)
+        order, labels = self._table_rows[layout_key]
+        if self._table_widget is None:
+            self._table_widget = create_aggregation_widget(labels)
+            self._table_view = pn.Column(self._table_header, self._table_widget, sizing_mode="stretch_width")
+        elif order != self._table_order:
+            set_table_labels(self._table_widget, labels)
+        self._table_order = order
+        update_table_values(self._table_widget, order, row_data)
+        # Box-/Lasso-Auswahl: Werte sind flächengewichtet über alle HRUs
+        header = f"Area-weighted over {len(hru_clicked)} selected HRUs" if isinstance(hru_clicked, tuple) else ""
+        if self._table_header.object != header:
+            self._table_header.object = header
+        self._table_header.visible = bool(header)
+        return self._table_view
+
     def get_date_range_slider(self):
         """
         Erstellt einen DateRangeSlider, der den gesamten Zeitbereich auswählt.
@@ -332,9 +1046,25 @@ class MainView(param.Parameterized):
         long_name = meta.get('long_name') or self.variable
         return long_name
 
-    @pn.depends('variable')
+    @pn.depends('variable', 'map_mode', 'ref_period', 'scenario', 'compare_scenario',
+                'event_percentile', 'event_metric')
     def get_map1_title(self):
-        return pn.panel(f"### Aggregated values for '{self._get_long_name(self.variable)}'")
+        catalog = get_catalog()
+        if self.map_mode == 'exceedance':
+            ref_start, ref_end = (int(y) for y in self.ref_period)
+            return pn.panel(f"### {EVENT_METRIC_LABELS.get(self.event_metric, self.event_metric)}: "
+                            f"'{self._get_long_name(self.variable)}' above p{self.event_percentile} "
+                            f"of {ref_start}–{ref_end}")
+        if self.map_mode == 'scenario_diff':
+            return pn.panel(f"### '{self._get_long_name(self.variable)}': {catalog.label(self.scenario)} "
+                            f"minus {catalog.label(self.compare_scenario)}")
+        if self.map_mode == 'absolute':
+            suffix = f" ({catalog.label(self.scenario)})" if self.scenario != BASE_SCENARIO else ""
+            return pn.panel(f"### Aggregated values for '{self._get_long_name(self.variable)}'{suffix}")
+        unit = " (%)" if self.map_mode == 'anomaly_pct' else ""
+        ref_start, ref_end = (int(y) for y in self.ref_period)
+        return pn.panel(f"### Anomaly{unit} of '{self._get_long_name(self.variable)}' "
+                        f"vs. {ref_start}–{ref_end} climatology")
 
     @pn.depends('variable')
     def get_map3_title(self):
@@ -349,6 +1079,12 @@ class MainView(param.Parameterized):
             self.date_range_slider,
             sizing_mode="stretch_width"
         )
+        # Anzahl verworfener/abgebrochener Jobs (Request-Scheduler)
+        job_stats = pn.pane.Markdown(
+            self.param.job_stats,
+            styles={"font-size": "11px", "color": "#666"},
+            margin=(0, 10)
+        )
 
         # Aufbau des Hauptinhalts: Karte (Map) und Tabelle (Detailansicht) mit gleicher Breite
         # Map-Panel responsiv in der Breite
@@ -371,6 +1107,30 @@ class MainView(param.Parameterized):
             right,
             sizing_mode="stretch_width"
         )
+        # Fenstervergleich: zweites Zeitfenster mit eigenen Datumsfeldern, Karten nur im Vergleichsmodus
+        compare_toggle = create_compare_toggle()
+        compare_toggle.link(self, value='compare_mode', bidirectional=True)
+        compare_start_picker = create_date_picker("📅 Compare start", self.compare_start_date)
+        compare_end_picker = create_date_picker("⌛ Compare end", self.compare_end_date)
+        compare_start_picker.param.watch(partial(on_start_change, start_date_picker=compare_start_picker,
+                                                 end_date_picker=compare_end_picker), 'value')
+        compare_end_picker.param.watch(partial(on_end_change, start_date_picker=compare_start_picker,
+                                               end_date_picker=compare_end_picker), 'value')
+        compare_start_picker.link(self, value='compare_start_date', bidirectional=True)
+        compare_end_picker.link(self, value='compare_end_date', bidirectional=True)
+        compare_area = pn.Column(
+            self.get_compare_title,
+            pn.Row(compare_toggle, compare_start_picker, compare_end_picker, width=700),
+            pn.panel(self.get_compare_maps, linked_axes=False, visible=self.param.compare_mode),
+            sizing_mode="stretch_width"
+        )
+
+        # Zeitreihen der angeklickten HRU (ganzer Datensatz, Detail beim Zoomen)
+        series_area = pn.Column(
+            pn.pane.Markdown("### 'HRU' time series"),
+            pn.panel(self.get_timeseries(), linked_axes=False),
+            sizing_mode="stretch_width"
+        )
 
         # Erzeuge zweite Karte (absolute Differenz Y zwischen den Runoff-Modellen)
         map2 = pn.panel(
@@ -400,10 +1160,41 @@ class MainView(param.Parameterized):
             sizing_mode="stretch_width"
         )
 
+        # Gebietssummen (ganzes Gebiet und Regionen)
+        region_selector = create_region_selector(region_weights(self.gdf, self.ds))
+        region_selector.link(self, value='region', bidirectional=True)
+        region_var_selector = create_region_var_selector(self.param.region_var.objects, self.var_metadata)
+        region_var_selector.link(self, value='region_var', bidirectional=True)
+        region_area = pn.Column(
+            pn.pane.Markdown("### National and regional totals"),
+            pn.Row(region_selector, region_var_selector),
+            pn.panel(self.get_region_totals(), linked_axes=False),
+            sizing_mode="stretch_width"
+        )
+
+        # Treiber-Ranking: statische Attribute vs. Fenster-Aggregat über alle HRUs
+        driver_target = create_driver_target_selector()
+        driver_target.link(self, value='driver_target', bidirectional=True)
+        driver_method = create_driver_method_selector()
+        driver_method.link(self, value='driver_method', bidirectional=True)
+        driver_area = pn.Column(
+            pn.pane.Markdown("### Static drivers of the current window"),
+            pn.Row(driver_target, driver_method),
+            pn.panel(self.get_drivers(), linked_axes=False),
+            sizing_mode="stretch_width"
+        )
+        # Erstes Ranking nach dem Laden der Seite
+        pn.state.onload(self.update_drivers)
+
         # gib alles in einer Column zurück
         return pn.Column(
             controls,
+            job_stats,
             pn.pane.Markdown("### Ai4Good Sensitivity Analysis"),
             maps_row,
-            main_area
+            main_area,
+            compare_area,
+            series_area,
+            region_area,
+            driver_area
         )
\ No newline at end of file
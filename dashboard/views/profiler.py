@@ -0,0 +1,209 @@
+"""
+Opt-in Profiler für einzelne MainView-Callbacks und die zugehörigen compute_*_df-Jobs.
+
+Eingeschaltet über DASHBOARD_PROFILE:
+- off: Decorators geben die Funktion unverändert zurück (kein Overhead).
+- url: nur Sessions, die mit ?profile=1 geöffnet wurden.
+- on:  alle Sessions.
+
+Pro Aufruf entstehen in PROFILE_DIR Dateien, deren Name die Anfrage beschreibt
+(Callback, Session, Variable, Aggregation, Zeitfenster):
+- <name>.collapsed: Stack-Samples im collapsed-Format ("a;b;c 12"), direkt nutzbar
+  mit flamegraph.pl, speedscope oder inferno.
+- <name>.prof: cProfile-Ausgabe (nur synchrone Aufrufe und Worker-Jobs; bei async-
+  Callbacks würde cProfile die Arbeit anderer Sessions im Event-Loop mitzählen).
+- <name>.json: Parameter der Anfrage, Wanddauer und Anzahl Samples.
+
+Bei async-Callbacks zählen nur Samples, in denen der Callback selbst auf dem Stack
+liegt; Wartezeit auf den Executor erscheint in den Worker-Profilen des Jobs.
+"""
+import cProfile
+import contextlib
+import datetime
+import functools
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from dashboard.config.settings import PROFILE_MODE, PROFILE_ENGINE, PROFILE_DIR, PROFILE_SAMPLE_MS
+
+PROFILE_MODES = ('off', 'url', 'on')
+
+
+def profiling_enabled():
+    """Ob die aktuelle Session profiliert wird (beim Erzeugen der MainView aufrufen)."""
+    if PROFILE_MODE == 'on':
+        return True
+    if PROFILE_MODE != 'url':
+        return False
+    import panel as pn
+    args = pn.state.session_args or {}
+    return args.get('profile', [b''])[0] in (b'1', b'true', b'yes')
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class _Recording:
+    """Samples eines profilierten Aufrufs (Thread, optional auf eine Funktion beschränkt)."""
+
+    def __init__(self, thread_id, code=None):
+        self.thread_id = thread_id
+        self.code = code
+        self.stacks = Counter()
+        self.samples = 0
+
+
+class _Sampler:
+    """Ein Hintergrund-Thread pro Prozess, der aktive Aufzeichnungen alle PROFILE_SAMPLE_MS abtastet."""
+
+    def __init__(self, interval_s):
+        self.interval_s = interval_s
+        self._active = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+            self._thread.start()
+
+    def add(self, recording):
+        with self._lock:
+            self._active.add(recording)
+            self._ensure_running()
+
+    def remove(self, recording):
+        with self._lock:
+            self._active.discard(recording)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval_s)
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for recording in active:
+                frame = frames.get(recording.thread_id)
+                labels = []
+                hit = recording.code is None
+                while frame is not None:
+                    hit = hit or frame.f_code is recording.code
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                recording.samples += 1
+                if hit and labels:
+                    recording.stacks[";".join(reversed(labels))] += 1
+
+
+    def reset(self):
+        """Nach fork (Rechen-Worker): Thread und Lock des Elternprozesses nicht übernehmen."""
+        self._active = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+_sampler = _Sampler(PROFILE_SAMPLE_MS / 1000.0)
+os.register_at_fork(after_in_child=_sampler.reset)
+
+
+def _slug(value):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(value)).strip("-")[:40]
+
+
+def _write(name, tag, recording, profile, wall_s):
+    out = Path(PROFILE_DIR)
+    out.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")[:-3]
+    parts = [stamp, name] + [_slug(v) for v in tag.values() if v not in (None, "")]
+    base = out / "_".join(parts)
+    if recording is not None:
+        with open(base.with_suffix(".collapsed"), "w") as f:
+            for stack, count in recording.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+    if profile is not None:
+        profile.dump_stats(base.with_suffix(".prof"))
+    meta = dict(callback=name, pid=os.getpid(), wall_ms=round(wall_s * 1000, 3), params=tag,
+                samples=recording.samples if recording else None,
+                samples_in_callback=sum(recording.stacks.values()) if recording else None)
+    with open(base.with_suffix(".json"), "w") as f:
+        json.dump(meta, f, indent=1, default=str)
+    return base
+
+
+@contextlib.contextmanager
+def profile_block(name, tag, code=None, allow_cprofile=True):
+    """Profiliert den Block im aktuellen Thread (code: nur Samples mit dieser Funktion im Stack)."""
+    recording = profile = None
+    if PROFILE_ENGINE in ('sample', 'both'):
+        recording = _Recording(threading.get_ident(), code)
+        _sampler.add(recording)
+    if allow_cprofile and PROFILE_ENGINE in ('cprofile', 'both'):
+        profile = cProfile.Profile()
+        profile.enable()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall_s = time.perf_counter() - t0
+        if profile is not None:
+            profile.disable()
+        if recording is not None:
+            _sampler.remove(recording)
+        try:
+            _write(name, tag, recording, profile, wall_s)
+        except OSError as exc:
+            print(f"[profiler] {name}: {exc}", file=sys.stderr)
+
+
+def profiled(name):
+    """
+    Decorator für MainView-Callbacks (sync und async). Profiliert nur, wenn die Session
+    profiliert wird (self._profiling); Parameter der Anfrage liefert self._profile_tag().
+    """
+    def decorator(fn):
+        if PROFILE_MODE == 'off':
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(self, *args, **kwargs):
+                if not getattr(self, '_profiling', False):
+                    return await fn(self, *args, **kwargs)
+                with profile_block(name, self._profile_tag(), code=fn.__code__, allow_cprofile=False):
+                    return await fn(self, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if not getattr(self, '_profiling', False):
+                return fn(self, *args, **kwargs)
+            with profile_block(name, self._profile_tag()):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profiled_compute(fn):
+    """
+    Decorator für die compute_*_df-Funktionen (läuft im Worker). Profiliert, wenn der
+    Aufrufer profile_tag=... mitgibt; das Keyword wird vor dem Aufruf entfernt.
+    """
+    if PROFILE_MODE == 'off':
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, profile_tag=None, **kwargs):
+        if profile_tag is None:
+            return fn(*args, **kwargs)
+        with profile_block(fn.__name__, profile_tag):
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,157 @@
+import threading
+
+import numpy as np
+import cartopy.crs as ccrs
+import geoviews as gv
+from bokeh.core.property.vectorization import Field
+
+from dashboard.config.settings import RASTER_GRID_WIDTHS, RASTER_PIXEL_RATIO
+from dashboard.data.memory_report import register_cache
+
+RENDER_ENGINES = ('vector', 'raster')
+
+
+class HruGrid:
+    """
+    Catchments einmal als Integer-Gitter gerastert (Mercator, wie die Kartenprojektion).
+    Jedes Pixel enthält die Zeilennummer im GeoDataFrame oder -1 (keine HRU).
+
+    Ein Frame ist danach nur noch ein Lookup values[grid]: die Kosten hängen von der
+    Pixelzahl ab, nicht von der Anzahl oder Komplexität der Polygone. Tap und Hover
+    lösen die HRU über dasselbe Gitter auf.
+    """
+
+    def __init__(self, gdf, width):
+        from PIL import Image, ImageDraw
+
+        self.crs = ccrs.Mercator()
+        projected = gdf.to_crs(self.crs)
+        x0, y0, x1, y1 = projected.total_bounds
+        self.width = int(width)
+        self.height = max(1, int(round(self.width * (y1 - y0) / (x1 - x0))))
+        self.bounds = (x0, y0, x1, y1)
+        self.dx = (x1 - x0) / self.width
+        self.dy = (y1 - y0) / self.height
+
+        def pixels(ring):
+            coords = np.asarray(ring.coords)[:, :2]
+            return list(zip((coords[:, 0] - x0) / self.dx, (y1 - coords[:, 1]) / self.dy))
+
+        # Grosse Polygone zuerst: kleinere (z.B. in Löchern liegende) überschreiben sie
+        image = Image.new('I', (self.width, self.height), 0)
+        draw = ImageDraw.Draw(image)
+        for row in np.argsort(-projected.geometry.area.values, kind='stable'):
+            geom = projected.geometry.iloc[row]
+            for polygon in getattr(geom, 'geoms', [geom]):
+                draw.polygon(pixels(polygon.exterior), fill=int(row) + 1)
+                for interior in polygon.interiors:
+                    draw.polygon(pixels(interior), fill=0)
+        # Zeile 0 = oberster Bildrand; für hv.Image aufsteigende y-Koordinaten
+        self.index = (np.asarray(image, dtype=np.int32) - 1)[::-1].copy()
+        self.hru = gdf['hru'].values
+        self._gdf_index = gdf.index
+        self.xs = x0 + (np.arange(self.width) + 0.5) * self.dx
+        self.ys = y0 + (np.arange(self.height) + 0.5) * self.dy
+        hru_lut = np.append(self.hru.astype(np.float32), np.float32(np.nan))
+        self.hru_image = hru_lut[self.index]
+
+    @property
+    def nbytes(self):
+        return self.index.nbytes + self.hru_image.nbytes
+
+    def row_at(self, x, y):
+        """GeoDataFrame-Zeile unter dem Punkt (Mercator-Koordinaten) oder None."""
+        x0, y0, _, _ = self.bounds
+        col, row = int((x - x0) // self.dx), int((y - y0) // self.dy)
+        if not (0 <= col < self.width and 0 <= row < self.height):
+            return None
+        hit = self.index[row, col]
+        return None if hit < 0 else int(hit)
+
+    def hru_at(self, x, y):
+        row = self.row_at(x, y)
+        return None if row is None else self.hru[row]
+
+    def image(self, merged, var_name):
+        """
+        Karte als gv.Image: Werte der (per join gefilterten) GeoDataFrame-Zeilen in merged
+        über das Gitter verteilt, HRUs ohne Wert bleiben transparent.
+        """
+        lut = np.full(len(self.hru) + 1, np.nan, dtype=np.float32)
+        # merged = gdf.join(...): Index der GeoDataFrame-Zeilen bleibt erhalten
+        rows = self._gdf_index.get_indexer(merged.index)
+        lut[rows[rows >= 0]] = merged[var_name].values[rows >= 0]
+        return gv.Image((self.xs, self.ys, lut[self.index], self.hru_image),
+                        kdims=['x', 'y'], vdims=[var_name, 'hru'], crs=self.crs)
+
+
+# (id(gdf), width) -> (gdf, HruGrid)
+_grids = {}
+_grids_lock = threading.Lock()
+
+
+def get_grid(gdf, map_width):
+    """Gitter der kleinsten Stufe aus RASTER_GRID_WIDTHS, die map_width * RASTER_PIXEL_RATIO abdeckt."""
+    target = map_width * RASTER_PIXEL_RATIO
+    width = next((w for w in sorted(RASTER_GRID_WIDTHS) if w >= target), max(RASTER_GRID_WIDTHS))
+    key = (id(gdf), width)
+    with _grids_lock:
+        entry = _grids.get(key)
+        if entry is None or entry[0] is not gdf:
+            entry = (gdf, HruGrid(gdf, width))
+            _grids[key] = entry
+        return entry[1]
+
+
+def _grid_size():
+    grids = [entry[1] for entry in list(_grids.values())]
+    return len(grids), sum(grid.nbytes for grid in grids)
+
+
+register_cache('raster_grids', _grid_size)
+
+
+def choropleth(engine, gdf, merged, var_name, opts):
+    """
+    Choroplethen-Karte für MainView: gv.Polygons (vector) oder gv.Image aus dem
+    HRU-Gitter (raster) mit denselben Optionen (Polygon-Linien entfallen).
+    """
+    if engine == 'vector':
+        return gv.Polygons(merged, crs=ccrs.PlateCarree(), vdims=[var_name, 'hru']).opts(**opts)
+    if engine != 'raster':
+        raise ValueError(f"Unbekannte Render-Engine '{engine}', erwartet: {', '.join(RENDER_ENGINES)}")
+    grid = get_grid(gdf, opts.get('width', 800))
+    image_opts = {k: v for k, v in opts.items() if k not in ('color', 'line_color', 'line_width')}
+    return grid.image(merged, var_name).opts(**image_opts)
+
+
+def choropleths(engine, gdf, merged, var_names, opts):
+    """
+    Mehrere Karten derselben HRUs, eine pro Spalte in var_names (opts pro Karte). Im Vektor-Modus
+    sind sie Klone eines Elements mit allen Spalten: HoloViews legt Elemente mit denselben Daten
+    in einem Layout auf eine ColumnDataSource zusammen, die Polygone werden einmal übertragen
+    und jede Karte färbt nach ihrer Spalte.
+    """
+    if engine != 'vector':
+        return [choropleth(engine, gdf, merged, name, o) for name, o in zip(var_names, opts)]
+    polygons = gv.Polygons(merged, crs=ccrs.PlateCarree(), vdims=list(var_names) + ['hru'])
+    return [polygons.clone().opts(**dict(o, hooks=list(o.get('hooks', [])) + [_fill_from_column(name)]))
+            for name, o in zip(var_names, opts)]
+
+
+def _fill_from_column(column):
+    """
+    Plot-Hook: Füllfarbe aus der eigenen Spalte statt aus der Spalte 'color', die jeder Plot
+    anlegt – sonst überschreiben sich die Karten beim Zusammenlegen der Datenquellen.
+    """
+    def hook(plot, element):
+        renderer = plot.handles.get('glyph_renderer')
+        glyphs = [getattr(renderer, name, None) for name in
+                  ('glyph', 'selection_glyph', 'nonselection_glyph', 'hover_glyph', 'muted_glyph')]
+        for glyph in glyphs:
+            for prop in ('fill_color', 'hatch_color', 'line_color'):
+                value = getattr(glyph, prop, None)
+                if getattr(value, 'field', None) == 'color':
+                    setattr(glyph, prop, Field(column, value.transform))
+        plot.handles['source'].data.pop('color', None)
+    return hook
@@ -0,0 +1,254 @@
+"""
+Gebietssummen über das ganze Gebiet und vordefinierte Regionen (REGIONS_FILE) als Tagesreihen.
+
+Die Zuordnung HRU -> Region wird einmal pro Datensatz als dünnbesetzte Gewichtsmatrix
+(Regionen × HRUs, Gewicht = Fläche) im CSR-Format abgelegt. Die Reihen aller Regionen
+entstehen dann in einem Produkt dieser Matrix mit dem zeitmajoren Array, blockweise über
+REGION_CHUNK_DAYS Tage: pro Block werden die Spalten der Regionsmitglieder einmal gelesen
+und mit np.add.reduceat pro Region summiert. Mitgeführt werden die gewichtete Summe und die
+abgedeckte Fläche (HRUs mit Wert), daraus folgen Volumen (mm × Fläche) bzw. das
+flächengewichtete Mittel. Die Reihen über den ganzen Datensatz werden pro Variable gecacht
+und beim Ingest nur um die neuen Tage verlängert.
+"""
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape, Polygon
+
+from dashboard.config.settings import REGIONS_FILE, DOMAIN_REGION, DOMAIN_REGION_LABEL, REGION_VOLUME_UNITS, \
+    AREA_UNIT_M2, REGION_CHUNK_DAYS
+from dashboard.data.ingest import register_append_hook
+from dashboard.data.memory_report import register_cache
+from dashboard.views.hru_selection import area_weights, hrus_in_polygon
+from dashboard.views.time_arrays import time_major_values, time_index_range
+
+
+def read_regions(path):
+    """
+    Regionsdatei lesen: Name -> {'label', 'hru'} bzw. {'label', 'polygon'}. Ein Eintrag kann auch
+    nur die Liste der HRU-IDs sein; Polygone als Eckpunkte [[lon, lat], ...] oder GeoJSON-Geometrie.
+    """
+    with open(Path(path)) as f:
+        entries = json.load(f)
+    regions = {}
+    for name, entry in entries.items():
+        if name == DOMAIN_REGION:
+            raise ValueError(f"Regions-Name '{DOMAIN_REGION}' ist für das ganze Gebiet reserviert")
+        if isinstance(entry, list):
+            entry = {'hru': entry}
+        entry = dict(entry)
+        if 'hru' not in entry and 'polygon' not in entry:
+            raise ValueError(f"Region '{name}' ohne 'hru' oder 'polygon'")
+        entry.setdefault('label', name)
+        regions[name] = entry
+    return regions
+
+
+def _region_hrus(gdf, entry):
+    if 'hru' in entry:
+        return [int(h) for h in entry['hru']]
+    polygon = entry['polygon']
+    geometry = shape(polygon) if isinstance(polygon, dict) else Polygon(polygon)
+    return list(hrus_in_polygon(gdf, shapely.make_valid(geometry)))
+
+
+class RegionWeights:
+    """
+    Gewichtsmatrix Regionen × HRUs im CSR-Format: Mitglieder der Region r sind die Spalten
+    indices[indptr[r]:indptr[r + 1]] mit den Gewichten data[...] (Fläche).
+    """
+
+    def __init__(self, names, labels, members):
+        # members: pro Region (Spalten im Datensatz, Gewichte)
+        self.names = list(names)
+        self.labels = dict(zip(names, labels))
+        self.indptr = np.concatenate([[0], np.cumsum([len(cols) for cols, _ in members])]).astype(np.int64)
+        self.indices = np.concatenate([cols for cols, _ in members]).astype(np.int64)
+        self.data = np.concatenate([weights for _, weights in members]).astype(np.float64)
+
+    def product(self, block):
+        """block (Tage, HRUs) -> (Tage, Regionen): gewichtete Summe der Mitglieder pro Region."""
+        return np.add.reduceat(block[:, self.indices] * self.data, self.indptr[:-1], axis=1)
+
+    def sums(self, values, i0, i1, chunk_days=REGION_CHUNK_DAYS):
+        """
+        Gewichtete Summe und abgedeckte Fläche (Regionen, Tage) der Zeilen [i0, i1) eines
+        zeitmajoren Arrays. Fehlende Werte zählen weder zur Summe noch zur Fläche.
+        """
+        sums = np.empty((len(self.names), i1 - i0))
+        covered = np.empty_like(sums)
+        for start in range(i0, i1, chunk_days):
+            stop = min(start + chunk_days, i1)
+            block = values[start:stop]
+            finite = np.isfinite(block)
+            sums[:, start - i0:stop - i0] = self.product(np.where(finite, block, 0.0)).T
+            covered[:, start - i0:stop - i0] = self.product(finite).T
+        return sums, covered
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+
+def build_region_weights(gdf, dataset, regions):
+    """Gewichtsmatrix für das ganze Gebiet und die Regionen; leere Regionen werden ausgelassen."""
+    all_cols, all_weights = area_weights(dataset, dataset, dataset['hru'].values)
+    names, labels, members = [DOMAIN_REGION], [DOMAIN_REGION_LABEL], [(all_cols, all_weights)]
+    for name, entry in regions.items():
+        cols, weights = area_weights(dataset, dataset, _region_hrus(gdf, entry))
+        if len(cols) == 0:
+            print(f"[regions] Region '{name}' enthält keine HRU der Daten und wird ausgelassen")
+            continue
+        names.append(name)
+        labels.append(entry['label'])
+        members.append((cols, weights))
+    return RegionWeights(names, labels, members)
+
+
+def selection_weights(dataset, hrus, name='selection'):
+    """Gewichtsmatrix einer einzelnen Ad-hoc-Region aus HRU-IDs (nicht gecacht)."""
+    cols, weights = area_weights(dataset, dataset, hrus)
+    if len(cols) == 0:
+        raise ValueError("Keine der HRUs ist in den Daten")
+    return RegionWeights([name], [f"{len(cols)} selected HRUs"], [(cols, weights)])
+
+
+def region_quantity(dataset, var_name):
+    """'volume' für Flüsse in mm (Wert × Fläche), sonst 'mean' (flächengewichtetes Mittel)."""
+    units = dataset[var_name].attrs.get('units', '')
+    has_area = 'area' in dataset and 'time' not in dataset['area'].dims
+    return 'volume' if has_area and units in REGION_VOLUME_UNITS else 'mean'
+
+
+class RegionTotals:
+    """Reihen aller Regionen einer Variable: gewichtete Summe und abgedeckte Fläche (Regionen, Tage)."""
+
+    def __init__(self, weights, times, var_name, quantity, units, sums, covered):
+        self.weights = weights
+        self.times = times
+        self.var_name = var_name
+        self.quantity = quantity
+        self.sums = sums
+        self.covered = covered
+        # mm × Fläche -> m³ (Zeiteinheit der Variable bleibt)
+        self.unit = 'm³' + units[2:] if quantity == 'volume' else units
+
+    @property
+    def names(self):
+        return self.weights.names
+
+    @property
+    def window_unit(self):
+        # Summe der Tagesvolumen über das Fenster: Volumen ohne Zeiteinheit
+        return 'm³' if self.quantity == 'volume' else self.unit
+
+    def label(self, region):
+        return self.weights.labels.get(region, region)
+
+    def series(self, region, i0=0, i1=None):
+        """Tageswerte der Region in [i0, i1): Volumen bzw. flächengewichtetes Mittel."""
+        row = self.names.index(region)
+        sums, covered = self.sums[row, i0:i1], self.covered[row, i0:i1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.quantity == 'volume':
+                # mm -> m, Fläche in m²; Tage ohne einen Wert bleiben NaN
+                return np.where(covered > 0, sums * AREA_UNIT_M2 * 1e-3, np.nan)
+            return np.where(covered > 0, sums / covered, np.nan)
+
+    def window_value(self, region, date_range):
+        """Wert über das Fenster: Summe der Tagesvolumen bzw. Mittel der Tagesmittel."""
+        start, end = map(pd.to_datetime, date_range)
+        i0, i1 = self.times.searchsorted(start, side='left'), self.times.searchsorted(end, side='right')
+        values = self.series(region, i0, i1)
+        if not np.isfinite(values).any():
+            return None
+        return float(np.nansum(values) if self.quantity == 'volume' else np.nanmean(values))
+
+    @property
+    def nbytes(self):
+        return self.sums.nbytes + self.covered.nbytes
+
+
+_regions = None
+
+
+def configured_regions():
+    """Regionen aus REGIONS_FILE (einmal pro Prozess gelesen)."""
+    global _regions
+    if _regions is None:
+        _regions = read_regions(REGIONS_FILE) if REGIONS_FILE else {}
+    return _regions
+
+
+# id(dataset) -> (dataset, gdf, RegionWeights, {Variable: (sums, covered)})
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+def _entry(gdf, dataset):
+    entry = _totals.get(id(dataset))
+    if entry is None or entry[0] is not dataset or entry[1] is not gdf:
+        entry = (dataset, gdf, build_region_weights(gdf, dataset, configured_regions()), {})
+        _totals[id(dataset)] = entry
+    return entry
+
+
+def region_weights(gdf, dataset):
+    """Gewichtsmatrix der konfigurierten Regionen für dataset (einmal pro Prozess aufgebaut)."""
+    with _totals_lock:
+        return _entry(gdf, dataset)[2]
+
+
+def region_totals(gdf, dataset, var_name):
+    """RegionTotals der Variable über den ganzen Datensatz (gecacht)."""
+    with _totals_lock:
+        _, _, weights, series = _entry(gdf, dataset)
+        if var_name not in series:
+            series[var_name] = weights.sums(time_major_values(dataset, var_name), 0, dataset.sizes['time'])
+        sums, covered = series[var_name]
+    return RegionTotals(weights, dataset.indexes['time'], var_name, region_quantity(dataset, var_name),
+                        dataset[var_name].attrs.get('units', ''), sums, covered)
+
+
+def selection_totals(dataset, var_name, hrus, date_range):
+    """RegionTotals einer Ad-hoc-Region (HRU-IDs) nur über das Fenster."""
+    weights = selection_weights(dataset, hrus)
+    i0, i1 = time_index_range(dataset, date_range)
+    sums, covered = weights.sums(time_major_values(dataset, var_name), i0, i1)
+    return RegionTotals(weights, dataset.indexes['time'][i0:i1], var_name, region_quantity(dataset, var_name),
+                        dataset[var_name].attrs.get('units', ''), sums, covered)
+
+
+def _totals_size(of=None):
+    entries = [entry for entry in list(_totals.values()) if of is None or entry[0] is of]
+    return (sum(len(entry[3]) for entry in entries),
+            sum(entry[2].nbytes + sum(s.nbytes + c.nbytes for s, c in entry[3].values()) for entry in entries))
+
+
+register_cache('regional_totals', _totals_size, per_dataset=True)
+
+
+def _extend_totals(old, new, n_old):
+    # Gleiche HRUs und Regionen: nur die neuen Tage durch die Gewichtsmatrix schicken
+    with _totals_lock:
+        entry = _totals.get(id(old))
+        if entry is None or entry[0] is not old:
+            return
+        del _totals[id(old)]
+        if new is None:
+            return
+        _, gdf, weights, series = entry
+        extended = {}
+        for var_name, (sums, covered) in series.items():
+            tail = new[var_name].isel(time=slice(n_old, None)).transpose('time', 'hru').values
+            tail_sums, tail_covered = weights.sums(tail, 0, len(tail))
+            extended[var_name] = (np.concatenate([sums, tail_sums], axis=1),
+                                  np.concatenate([covered, tail_covered], axis=1))
+        _totals[id(new)] = (new, gdf, weights, extended)
+
+
+register_append_hook('regional_totals', _extend_totals)
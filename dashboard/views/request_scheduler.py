@@ -0,0 +1,188 @@
+import asyncio
+import concurrent.futures
+import time
+
+from dashboard.config.settings import DEBOUNCE_MS
+
+
+class _Job:
+    """Ein laufender Executor-Job, den sich mehrere Anfragen mit gleichem Key teilen."""
+
+    def __init__(self, key, handle):
+        self.key = key
+        # Original-Handle (concurrent.futures.Future oder asyncio.Future) für cancel()
+        self.handle = handle
+        if isinstance(handle, concurrent.futures.Future):
+            self.future = asyncio.wrap_future(handle)
+        else:
+            self.future = asyncio.ensure_future(handle)
+        # Slots, die aktuell auf diesen Job warten
+        self.slots = set()
+
+
+class RequestScheduler:
+    """
+    Koordiniert die asynchronen Berechnungen einer Session (pro MainView eine Instanz).
+
+    - Debounce: Eine Anfrage wird erst nach DEBOUNCE_MS Ruhezeit abgeschickt, damit
+      Parameter-Kaskaden (DatePicker -> day_stride -> end_date -> Slider) nur den
+      Endzustand berechnen.
+    - Coalescing: Anfragen mit gleichem Key teilen sich einen laufenden Job.
+    - Stale requests: Pro Slot (z.B. 'map', 'shap', 'diff') zählt nur die neueste
+      Anfrage. Überholte Jobs werden abgebrochen, solange sie noch nicht laufen,
+      sonst wird ihr Resultat verworfen. Überholte Aufrufer bekommen das Resultat
+      der neuesten Anfrage, es wird also nie ein Zwischenzustand gerendert.
+    """
+
+    def __init__(self, debounce_ms=DEBOUNCE_MS, on_stats=None):
+        self.debounce = max(debounce_ms, 0) / 1000.0
+        self.on_stats = on_stats
+        self._generation = 0
+        # slot -> (generation, key) der neuesten Anfrage
+        self._latest = {}
+        # key -> _Job
+        self._jobs = {}
+        # slot -> Liste von asyncio.Futures überholter Aufrufer
+        self._slot_waiters = {}
+        # slot -> (key, result, exc) der zuletzt abgeschlossenen gültigen Anfrage
+        self._slot_done = {}
+        self.stats = dict(
+            requested=0,   # Anfragen insgesamt
+            submitted=0,   # tatsächlich an den Executor geschickte Jobs
+            coalesced=0,   # an einen laufenden Job mit gleichem Key angehängt
+            debounced=0,   # während der Ruhezeit überholt, nie abgeschickt
+            cancelled=0,   # abgeschickt, aber vor dem Start abgebrochen
+            wasted=0,      # gelaufen, Resultat aber verworfen
+        )
+        # slot -> (compute_s, build_s) der zuletzt gerenderten Anfrage
+        self.timings = {}
+
+    def _bump(self, name):
+        self.stats[name] += 1
+        if self.on_stats is not None:
+            self.on_stats(dict(self.stats))
+
+    def _is_latest(self, slot, generation, key):
+        latest_gen, latest_key = self._latest[slot]
+        # Eine neuere Anfrage mit identischem Key überholt nicht
+        return latest_gen == generation or latest_key == key
+
+    def _release(self, job, slot):
+        """Slot vom Job abmelden; Job abbrechen, wenn niemand mehr wartet."""
+        job.slots.discard(slot)
+        if job.slots or job.future.done():
+            return
+        if job.handle.cancel():
+            self._bump('cancelled')
+        else:
+            # Läuft bereits: Resultat kommt noch, wird aber nicht mehr gebraucht
+            self._bump('wasted')
+        self._forget(job)
+
+    def _forget(self, job):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+
+    def _supersede(self, slot, key):
+        """Alle Jobs des Slots mit anderem Key sind überholt."""
+        for job in list(self._jobs.values()):
+            if slot in job.slots and job.key != (slot, key):
+                self._release(job, slot)
+
+    def _resolve_waiters(self, slot, key, result=None, exc=None):
+        self._slot_done[slot] = (key, result, exc)
+        for waiter in self._slot_waiters.pop(slot, []):
+            if waiter.done():
+                continue
+            if exc is not None:
+                waiter.set_exception(exc)
+            else:
+                waiter.set_result(result)
+
+    async def _await_latest(self, slot):
+        # Neueste Anfrage evtl. schon fertig (kam nach uns und war schneller)
+        done = self._slot_done.get(slot)
+        if done is not None and done[0] == self._latest[slot][1]:
+            if done[2] is not None:
+                raise done[2]
+            return done[1]
+        waiter = asyncio.get_running_loop().create_future()
+        self._slot_waiters.setdefault(slot, []).append(waiter)
+        return await waiter
+
+    async def run(self, slot, key, submit, build=None, debounce=None):
+        """
+        Führt eine Anfrage für `slot` aus.
+
+        submit: Callable ohne Argumente, das ein Future (concurrent oder asyncio) liefert.
+        build:  Optionales Callable, das das Job-Resultat weiterverarbeitet (z.B. Karte
+                rendern). Wird nur für den neuesten Stand aufgerufen.
+        debounce: Ruhezeit in Sekunden für diese Anfrage (None = Standard des Schedulers).
+        """
+        self._generation += 1
+        generation = self._generation
+        self._latest[slot] = (generation, key)
+        self._bump('requested')
+        self._supersede(slot, key)
+
+        debounce = self.debounce if debounce is None else debounce
+        if debounce:
+            await asyncio.sleep(debounce)
+        if not self._is_latest(slot, generation, key):
+            self._bump('debounced')
+            return await self._await_latest(slot)
+
+        job = self._jobs.get((slot, key))
+        if job is None:
+            job = _Job((slot, key), submit())
+            self._jobs[job.key] = job
+            self._bump('submitted')
+        else:
+            self._bump('coalesced')
+        job.slots.add(slot)
+
+        t_wait = time.perf_counter()
+        try:
+            result = await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            if job.future.cancelled():
+                # Job wurde abgebrochen, weil eine neuere Anfrage kam
+                return await self._await_latest(slot)
+            raise
+        except Exception as exc:
+            self._forget(job)
+            if self._is_latest(slot, generation, key):
+                self._resolve_waiters(slot, key, exc=exc)
+                raise
+            return await self._await_latest(slot)
+        finally:
+            job.slots.discard(slot)
+
+        self._forget(job)
+        if not self._is_latest(slot, generation, key):
+            return await self._await_latest(slot)
+
+        t_build = time.perf_counter()
+        if build is not None:
+            try:
+                result = build(result)
+            except Exception as exc:
+                self._resolve_waiters(slot, key, exc=exc)
+                raise
+        self.timings[slot] = (t_build - t_wait, time.perf_counter() - t_build)
+        self._resolve_waiters(slot, key, result=result)
+        return result
+
+    def resolve(self, slot, key, result):
+        """Anfrage, die ohne Job beantwortet wurde (Cache-Treffer), als neuesten Stand setzen."""
+        self._generation += 1
+        self._latest[slot] = (self._generation, key)
+        self._supersede(slot, key)
+        self._resolve_waiters(slot, key, result=result)
+        return result
+
+    def format_stats(self):
+        s = self.stats
+        return (f"Jobs: {s['submitted']} berechnet · {s['coalesced']} zusammengeführt · "
+                f"{s['debounced']} entprellt · {s['cancelled']} abgebrochen · "
+                f"{s['wasted']} verworfen")
@@ -0,0 +1,250 @@
+"""
+Geteilter Resultat-Cache für die compute_*_df-Funktionen über Prozessgrenzen hinweg.
+
+Im Mehrprozess-Betrieb rechnet jeder Serverprozess (und jeder seiner Worker) sonst
+dieselben Fenster erneut. RESULT_CACHE_URL wählt das Backend:
+- 'disk:///pfad/zum/cache': eine Pickle-Datei pro Resultat, atomar geschrieben,
+  älteste Dateien werden oberhalb von RESULT_CACHE_MAX_MB entfernt.
+- 'redis://host:port/db': jeder Redis-kompatible Server (RESP-Protokoll, kein
+  redis-Paket nötig), Ablauf über TTL.
+- leer: kein geteilter Cache.
+
+Der Schlüssel enthält die Datenversion (Fingerabdruck der Datensätze); neue Daten
+erzeugen neue Schlüssel, alte Einträge laufen über TTL bzw. Grössenlimit aus.
+Fehler des Backends gelten als Cache-Miss und brechen keine Berechnung ab.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import socket
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from dashboard.config.settings import RESULT_CACHE_URL, RESULT_CACHE_TTL_S, RESULT_CACHE_MAX_MB
+
+
+class NullResultCache:
+    """Kein geteilter Cache."""
+    name = "none"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def stats(self):
+        return {}
+
+
+class DiskResultCache:
+    """Resultate als Pickle-Dateien in einem lokalen Verzeichnis (geteilt von allen Prozessen)."""
+    name = "disk"
+
+    def __init__(self, directory, ttl_s=RESULT_CACHE_TTL_S, max_bytes=RESULT_CACHE_MAX_MB * 2**20):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._written = 0
+
+    def _path(self, key):
+        return self.directory / f"{key}.pkl"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_s:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        tmp = self.directory / f".{key}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(value)
+        os.replace(tmp, self._path(key))
+        self._written += len(value)
+        # Aufräumen nur gelegentlich, nicht bei jedem Schreiben
+        if self._written > self.max_bytes // 10:
+            self._written = 0
+            self.prune()
+
+    def prune(self):
+        """Älteste Einträge löschen, bis das Verzeichnis unter max_bytes liegt."""
+        entries = []
+        for path in self.directory.glob("*.pkl"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        files = list(self.directory.glob("*.pkl"))
+        return {"entries": len(files), "bytes": sum(f.stat().st_size for f in files if f.exists())}
+
+
+class RespClient:
+    """Minimaler RESP2-Client (eine Verbindung pro Thread) für Redis-kompatible Server."""
+
+    def __init__(self, host="localhost", port=6379, db=0, timeout=2.0):
+        self.address = (host, port)
+        self.db = db
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.db:
+                self._send(conn, "SELECT", self.db)
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[0].close()
+
+    @staticmethod
+    def _encode(*args):
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Verbindung geschlossen")
+        kind, rest = line[:1], line[1:-2]
+        if kind in (b"+", b":"):
+            return int(rest) if kind == b":" else rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = reader.read(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._read(reader) for _ in range(n)]
+        raise ConnectionError(f"Unerwartete Antwort: {line!r}")
+
+    def _send(self, conn, *args):
+        conn[0].sendall(self._encode(*args))
+        return self._read(conn[1])
+
+    def execute(self, *args):
+        try:
+            return self._send(self._connection(), *args)
+        except (OSError, ConnectionError):
+            # Verbindung einmal neu aufbauen (Server-Neustart, Timeout)
+            self._close()
+            return self._send(self._connection(), *args)
+
+
+class RedisResultCache:
+    """Resultate in einem Redis-kompatiblen Server, Ablauf über TTL."""
+    name = "redis"
+
+    def __init__(self, host="localhost", port=6379, db=0, ttl_s=RESULT_CACHE_TTL_S, prefix="wrd:"):
+        self.client = RespClient(host, port, db)
+        self.ttl_s = ttl_s
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.execute("GET", self.prefix + key)
+
+    def set(self, key, value):
+        self.client.execute("SET", self.prefix + key, value, "PX", int(self.ttl_s * 1000))
+
+    def stats(self):
+        return {"entries": self.client.execute("DBSIZE")}
+
+
+def result_cache_from_url(url):
+    if not url:
+        return NullResultCache()
+    parsed = urlparse(url)
+    if parsed.scheme in ("disk", "file"):
+        return DiskResultCache(parsed.path)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.strip("/") or 0)
+        return RedisResultCache(parsed.hostname or "localhost", parsed.port or 6379, db)
+    raise ValueError(f"Unbekanntes Cache-Backend '{url}', erwartet disk:///pfad oder redis://host:port/db")
+
+
+# Ein Cache-Objekt pro Prozess (Serverprozess und jeder Rechen-Worker)
+_cache = None
+_cache_lock = threading.Lock()
+# Zähler pro Prozess: hits, misses, errors
+cache_counters = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def get_result_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = result_cache_from_url(RESULT_CACHE_URL)
+        return _cache
+
+
+def cache_key(fn_name, args, version):
+    return hashlib.sha1(repr((fn_name, args, version)).encode()).hexdigest()
+
+
+def shared_result(version):
+    """
+    Decorator für compute_*_df: Resultat im geteilten Cache nachschlagen bzw. ablegen.
+    version: Callable, das zu den Argumenten des Aufrufs die aktuelle Datenversion liefert
+             (Teil des Schlüssels).
+    Keyword-Argumente (z.B. session_id) beeinflussen das Resultat nicht und gehören
+    nicht zum Schlüssel.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_result_cache()
+            if isinstance(cache, NullResultCache):
+                return fn(*args, **kwargs)
+            key = cache_key(fn.__name__, args, version(*args))
+            try:
+                payload = cache.get(key)
+            except Exception:
+                payload = None
+                cache_counters["errors"] += 1
+            if payload is not None:
+                cache_counters["hits"] += 1
+                return pickle.loads(payload)
+            cache_counters["misses"] += 1
+            result = fn(*args, **kwargs)
+            try:
+                cache.set(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                cache_counters["errors"] += 1
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+"""
+Differenzkarte zweier Szenarien: Fenster-Aggregat von A minus dasjenige von B pro HRU.
+
+Statt beide Szenarien getrennt zu aggregieren (zwei Durchläufe, zwei Zwischenresultate),
+werden die zeitmajoren Arrays beider Szenarien blockweise gemeinsam gelesen: pro Block
+von SCENARIO_DIFF_CHUNK_DAYS Tagen werden die laufenden Reduktionen von A und B
+nachgeführt, solange der Block im Cache liegt. std wird blockweise zusammengeführt
+(Chan et al.); median/p90/p99 kommen aus den Block-Sketches beider Szenarien.
+"""
+import numpy as np
+
+from dashboard.config.settings import SCENARIO_DIFF_CHUNK_DAYS
+from dashboard.views.block_sketches import SKETCH_METHODS, sketch_aggregate
+from dashboard.views.time_arrays import time_major_values, time_index_range
+
+FUSED_METHODS = ('sum', 'mean', 'max', 'min', 'std')
+
+
+class _Running:
+    """Laufende Reduktion einer Aggregation über Zeitblöcke (time, hru)."""
+
+    def __init__(self, agg_method, n_hru):
+        self.agg_method = agg_method
+        self.count = np.zeros(n_hru)
+        self.total = np.zeros(n_hru)    # Summe; bei std der laufende Mittelwert
+        self.m2 = np.zeros(n_hru)
+        self.extreme = np.full(n_hru, np.nan)
+
+    def add(self, block):
+        if self.agg_method == 'max':
+            self.extreme = np.fmax(self.extreme, np.fmax.reduce(block, axis=0))
+            return
+        if self.agg_method == 'min':
+            self.extreme = np.fmin(self.extreme, np.fmin.reduce(block, axis=0))
+            return
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        total = np.where(valid, block, 0.0).sum(axis=0)
+        if self.agg_method != 'std':
+            self.count += count
+            self.total += total
+            return
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            m2 = np.where(valid, (block - mean) ** 2, 0.0).sum(axis=0)
+            n = self.count + count
+            delta = mean - self.total
+            self.total = np.where(count > 0, self.total + delta * count / n, self.total)
+            self.m2 = np.where(count > 0, self.m2 + m2 + delta ** 2 * self.count * count / n, self.m2)
+        self.count = n
+
+    def result(self):
+        if self.agg_method in ('max', 'min'):
+            return self.extreme
+        if self.agg_method == 'sum':
+            # Wie xarray sum(skipna): ohne gültige Werte 0
+            return self.total
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if self.agg_method == 'mean':
+                return np.where(self.count > 0, self.total / self.count, np.nan)
+            return np.where(self.count > 0, np.sqrt(self.m2 / self.count), np.nan)
+
+
+def _reduce(values, rows, agg_method, chunk_days=SCENARIO_DIFF_CHUNK_DAYS):
+    running = _Running(agg_method, values.shape[1])
+    for start in range(rows[0], rows[1], chunk_days):
+        running.add(values[start:min(start + chunk_days, rows[1])])
+    return running.result()
+
+
+def fused_difference(values_a, values_b, rows_a, rows_b, agg_method, chunk_days=SCENARIO_DIFF_CHUNK_DAYS):
+    """
+    Aggregat von values_a[rows_a] minus Aggregat von values_b[rows_b] (zeitmajore Arrays,
+    gleich lange Zeilenbereiche) in einem gemeinsamen blockweisen Durchlauf.
+    """
+    (a0, a1), (b0, b1) = rows_a, rows_b
+    if a1 - a0 != b1 - b0:
+        raise ValueError("Zeitfenster der Szenarien sind unterschiedlich lang")
+    running_a = _Running(agg_method, values_a.shape[1])
+    running_b = _Running(agg_method, values_b.shape[1])
+    for offset in range(0, a1 - a0, chunk_days):
+        stop = min(offset + chunk_days, a1 - a0)
+        running_a.add(values_a[a0 + offset:a0 + stop])
+        running_b.add(values_b[b0 + offset:b0 + stop])
+    return running_a.result() - running_b.result()
+
+
+def scenario_difference(dataset_a, dataset_b, var_name, date_range, agg_method):
+    """
+    Differenz A - B des Fenster-Aggregats als Array (hru,) in der hru-Reihenfolge der
+    (aufeinander ausgerichteten) Datensätze; statische Variablen direkt. None ohne Daten.
+    """
+    timed_a, timed_b = 'time' in dataset_a[var_name].dims, 'time' in dataset_b[var_name].dims
+    if timed_a != timed_b:
+        return None
+    if not timed_a:
+        return dataset_a[var_name].values.astype(np.float64) - dataset_b[var_name].values.astype(np.float64)
+    rows_a = time_index_range(dataset_a, date_range)
+    rows_b = time_index_range(dataset_b, date_range)
+    if rows_a[1] <= rows_a[0] or rows_b[1] <= rows_b[0]:
+        return None
+    if agg_method in SKETCH_METHODS and agg_method != 'std':
+        return (sketch_aggregate(dataset_a, var_name, date_range, agg_method)
+                - sketch_aggregate(dataset_b, var_name, date_range, agg_method))
+    if agg_method not in FUSED_METHODS:
+        # Wie aggregate_data: unbekannte Aggregationen fallen auf die Summe zurück
+        agg_method = 'sum'
+    values_a, values_b = time_major_values(dataset_a, var_name), time_major_values(dataset_b, var_name)
+    if rows_a[1] - rows_a[0] != rows_b[1] - rows_b[0]:
+        # Fenster reicht über das Ende eines Szenarios: getrennt reduzieren
+        return _reduce(values_a, rows_a, agg_method) - _reduce(values_b, rows_b, agg_method)
+    return fused_difference(values_a, values_b, rows_a, rows_b, agg_method)
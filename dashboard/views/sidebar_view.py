@@ -1,20 +1,26 @@
 # sidebar.py
 import panel as pn
 from dashboard.widgets.play_button import create_play_button
+from dashboard.widgets.play_stats_widget import create_play_stats_pane, create_adaptive_speed_checkbox
 from dashboard.widgets.speed_widget import create_speed_input_widget, create_speed_plus_widget, \
     create_speed_minus_widget
 
-from dashboard.config.settings import INIT_VAR, INIT_DAY_STRIDE, MIN_DAY_STRIDE, MAX_DAY_STRIDE, INIT_SPEED_MS
+from dashboard.config.settings import INIT_VAR, INIT_DAY_STRIDE, MIN_DAY_STRIDE, MAX_DAY_STRIDE, INIT_SPEED_MS, \
+    CLIMATOLOGY_REF_PERIOD
+from dashboard.widgets.anomaly_widgets import create_map_mode_selector, create_ref_period_slider, \
+    create_clim_basis_selector
 from dashboard.widgets.agg_selector import create_agg_selector
 from dashboard.widgets.date_picker import create_date_picker
 from dashboard.widgets.info_button import create_info_button
 from dashboard.widgets.stride_widget import create_stride_widget
 from dashboard.widgets.var_selector import create_variable_selector
 from dashboard.widgets.year_range_slider import create_year_range_slider
+from dashboard.widgets.scenario_selector import create_scenario_selector, create_compare_scenario_selector
+from dashboard.widgets.event_widgets import create_event_percentile_selector, create_event_metric_selector
 
 
 def create_sidebar_widgets(time_min, time_max, year_start_date, year_end_date, start_date, end_date, all_vars,
-                           var_metadata):
+                           var_metadata, scenario_catalog):
     # Variablenselektion und Info-Button
     var_selector = create_variable_selector(all_vars, var_metadata, INIT_VAR)
     info_button = create_info_button()
@@ -27,6 +33,8 @@ def create_sidebar_widgets(time_min, time_max, year_start_date, year_end_date, s
     end_date_picker   = create_date_picker("⌛ End date",   end_date)
     start_date_picker.end = end_date
     end_date_picker.start = start_date
+    # Obergrenze: Datenende (wird beim Anhängen neuer Tage erweitert)
+    end_date_picker.end = time_max.date()
     # aggregation selector
     agg_selector = create_agg_selector()
     # Play/Pause and Speed Controls
@@ -34,6 +42,18 @@ def create_sidebar_widgets(time_min, time_max, year_start_date, year_end_date, s
     speed_minus = create_speed_minus_widget()
     speed_plus = create_speed_plus_widget()
     speed_input = create_speed_input_widget(INIT_SPEED_MS)
+    play_stats = create_play_stats_pane()
+    adaptive_speed = create_adaptive_speed_checkbox()
+    # Anomalie-Modus: Kartenmodus, Referenzperiode und Klimatologie-Basis
+    map_mode_selector = create_map_mode_selector()
+    ref_period_slider = create_ref_period_slider(time_min.year, time_max.year, CLIMATOLOGY_REF_PERIOD)
+    clim_basis_selector = create_clim_basis_selector()
+    # Szenario der Hauptkarte und Referenz der Differenzkarte
+    scenario_selector = create_scenario_selector(scenario_catalog)
+    compare_scenario_selector = create_compare_scenario_selector(scenario_catalog)
+    # Ereignis-Karte: Perzentil-Schwelle und Kennzahl
+    event_percentile_selector = create_event_percentile_selector()
+    event_metric_selector = create_event_metric_selector()
     return (
         end_date_picker,
         info_button,
@@ -45,7 +65,16 @@ def create_sidebar_widgets(time_min, time_max, year_start_date, year_end_date, s
         play_button,
         speed_minus,
         speed_input,
-        speed_plus
+        speed_plus,
+        play_stats,
+        adaptive_speed,
+        map_mode_selector,
+        ref_period_slider,
+        clim_basis_selector,
+        scenario_selector,
+        compare_scenario_selector,
+        event_percentile_selector,
+        event_metric_selector
     )
 
 
@@ -60,7 +89,16 @@ def create_sidebar(
     play_button,
     speed_minus,
     speed_input,
-    speed_plus
+    speed_plus,
+    play_stats,
+    adaptive_speed,
+    map_mode_selector,
+    ref_period_slider,
+    clim_basis_selector,
+    scenario_selector,
+    compare_scenario_selector,
+    event_percentile_selector,
+    event_metric_selector
 ):
     # Kombiniere Variablenselektion und Info-Button in einer Zeile
     var_info_btn_row = pn.Row(
@@ -75,7 +113,14 @@ def create_sidebar(
         pn.pane.Markdown("### 🧭 Map Settings",
                          margin=(0, 10)),
         var_info_btn_row,
-        year_range_slider)
+        year_range_slider,
+        scenario_selector,
+        map_mode_selector,
+        compare_scenario_selector,
+        ref_period_slider,
+        clim_basis_selector,
+        event_metric_selector,
+        event_percentile_selector)
 
     # Zeile mit DatePicker und Stride
     aggregation_row = pn.Row(
@@ -111,6 +156,8 @@ def create_sidebar(
             speed_plus,
             sizing_mode="stretch_width"
         ),
+        adaptive_speed,
+        play_stats,
         sizing_mode="stretch_width"
     )
     # Gesamtes Sidebar-Layout
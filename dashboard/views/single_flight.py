@@ -0,0 +1,112 @@
+import concurrent.futures
+import threading
+
+
+class _Flight:
+    def __init__(self, future):
+        self.future = future
+        # Anzahl Aufrufer, die noch auf das Resultat warten
+        self.refs = 0
+
+
+class _FlightHandle(concurrent.futures.Future):
+    """
+    Eigenes Future pro Aufrufer, das das Resultat des geteilten Jobs spiegelt.
+    cancel() meldet nur diesen Aufrufer ab; der Job selbst wird erst abgebrochen,
+    wenn niemand mehr wartet.
+    """
+
+    def __init__(self, group, key, flight):
+        super().__init__()
+        self._group = group
+        self._key = key
+        self._flight = flight
+
+    def cancel(self):
+        if not self._group._release(self._key, self._flight):
+            return False
+        return super().cancel()
+
+
+class SingleFlight:
+    """
+    Prozessweite Deduplizierung gleichzeitiger, identischer Berechnungen.
+
+    Fragen mehrere Sessions (oder Karte und Tabelle) dasselbe Variable/Zeitfenster
+    an, läuft nur ein Job im Executor; alle Aufrufer teilen sich dessen Resultat.
+    Nach Abschluss wird der Eintrag entfernt – das Caching von Resultaten
+    übernehmen die Aufrufer.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._flights = {}
+        self.stats = dict(started=0, shared=0)
+
+    def submit(self, executor, fn, *args, **kwargs):
+        # kwargs (z.B. session_id, priority) beeinflussen nur den Rechenweg, nicht das Resultat
+        key = (fn.__name__,) + args
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight(executor.submit(fn, *args, **kwargs))
+                self._flights[key] = flight
+                self.stats['started'] += 1
+                flight.future.add_done_callback(lambda f, key=key, flight=flight: self._done(key, flight))
+            else:
+                self.stats['shared'] += 1
+                # Wartet eine dringendere Anfrage auf den Job (z.B. Klick auf Prefetch), Job vorziehen
+                if kwargs.get('priority') is not None and hasattr(executor, 'promote'):
+                    executor.promote(flight.future, kwargs['priority'])
+            flight.refs += 1
+        handle = _FlightHandle(self, key, flight)
+        flight.future.add_done_callback(lambda f: _copy_state(f, handle))
+        return handle
+
+    def _release(self, key, flight):
+        """Aufrufer abmelden. False, wenn der Job weiterläuft und nur noch diesem Aufrufer gehört."""
+        with self._lock:
+            if flight.future.done():
+                return False
+            if flight.refs > 1:
+                flight.refs -= 1
+                return True
+            if not flight.future.cancel():
+                return False
+            flight.refs = 0
+            self._forget(key, flight)
+            return True
+
+    def _done(self, key, flight):
+        with self._lock:
+            self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+def _copy_state(source, handle):
+    if handle.done():
+        return
+    if source.cancelled():
+        # Basis-cancel: der geteilte Job ist bereits abgemeldet
+        concurrent.futures.Future.cancel(handle)
+        return
+    exc = source.exception()
+    try:
+        if exc is not None:
+            handle.set_exception(exc)
+        else:
+            handle.set_result(source.result())
+    except concurrent.futures.InvalidStateError:
+        # Handle wurde in der Zwischenzeit abgebrochen
+        pass
+
+
+# Eine Instanz pro Serverprozess, geteilt von allen Sessions
+compute_flights = SingleFlight()
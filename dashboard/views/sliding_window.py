@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from dashboard.config.settings import SLIDING_MAX_STEP_RATIO, SLIDING_MAX_STEP_DAYS, SLIDING_MAX_SESSIONS
+
+SLIDING_METHODS = ('sum', 'mean', 'max', 'min')
+# Nach so vielen inkrementellen Schritten wird neu gerechnet (Rundungsfehler von sum/mean)
+_REFRESH_EVERY = 2000
+
+
+def _suffix_extrema(block, is_max):
+    """
+    Maske der Zeilen, die als Kandidaten in einer monotonen Deque verbleiben:
+    ein Tag bleibt, wenn er strikt grösser (max) bzw. kleiner (min) ist als alle
+    späteren Tage des Blocks. Vektorisiert über alle HRUs.
+    """
+    acc = np.maximum.accumulate if is_max else np.minimum.accumulate
+    suffix = acc(block[::-1], axis=0)[::-1]
+    later = np.empty_like(suffix)
+    later[:-1] = suffix[1:]
+    later[-1] = -np.inf if is_max else np.inf
+    return block > later if is_max else block < later
+
+
+class SlidingWindowAggregator:
+    """
+    Inkrementelle Aggregation eines Zeitfensters [i0, i1) über ein (time, hru)-Array.
+
+    Hält den Zustand des letzten Fensters und aktualisiert ihn, indem nur die
+    hinzukommenden und wegfallenden Tage verrechnet werden:
+    - sum/mean: laufende Summe und Anzahl gültiger Werte (beide Richtungen).
+    - max/min: eine monotone Deque pro HRU (Fenster darf nur vorwärts wandern).
+    Grosse Sprünge, Rückwärtsbewegungen bei max/min und jede _REFRESH_EVERY-te
+    Aktualisierung werden voll neu berechnet.
+    """
+
+    def __init__(self, values, agg_method):
+        if agg_method not in SLIDING_METHODS:
+            raise ValueError(f"Nicht inkrementell berechenbar: {agg_method}")
+        self.values = values
+        self.agg_method = agg_method
+        self.lock = threading.Lock()
+        self.i0 = self.i1 = None
+        self._steps = 0
+        self.full_recomputes = 0
+        self.incremental_updates = 0
+
+    @property
+    def _is_extremum(self):
+        return self.agg_method in ('max', 'min')
+
+    def update(self, i0, i1):
+        """Aggregat für das Fenster [i0, i1) als Array (hru,)."""
+        if self._needs_full(i0, i1):
+            self._full(i0, i1)
+        else:
+            self._incremental(i0, i1)
+        return self._result()
+
+    def _needs_full(self, i0, i1):
+        if self.i0 is None or self._steps >= _REFRESH_EVERY:
+            return True
+        moved = abs(i0 - self.i0) + abs(i1 - self.i1)
+        if moved > SLIDING_MAX_STEP_RATIO * max(i1 - i0, 1):
+            return True
+        if self._is_extremum:
+            # Monotone Deques unterstützen nur Anhängen hinten / Entfernen vorne
+            return i0 < self.i0 or i1 < self.i1 or moved > SLIDING_MAX_STEP_DAYS
+        return False
+
+    def _full(self, i0, i1):
+        block = self.values[i0:i1]
+        self.i0, self.i1 = i0, i1
+        self._steps = 0
+        self.full_recomputes += 1
+        valid = ~np.isnan(block)
+        self.count = valid.sum(axis=0)
+        if self._is_extremum:
+            n_hru = block.shape[1]
+            self.deques = [deque() for _ in range(n_hru)]
+            self._push(block, i0)
+        else:
+            self.total = np.where(valid, block, 0.0).sum(axis=0, dtype=np.float64)
+
+    def _incremental(self, i0, i1):
+        self.incremental_updates += 1
+        self._steps += 1
+        if self._is_extremum:
+            entering = self.values[self.i1:i1]
+            if len(entering):
+                self.count = self.count + (~np.isnan(entering)).sum(axis=0)
+                self._push(entering, self.i1)
+            if i0 > self.i0:
+                leaving = self.values[self.i0:i0]
+                self.count = self.count - (~np.isnan(leaving)).sum(axis=0)
+                for dq in self.deques:
+                    while dq and dq[0] < i0:
+                        dq.popleft()
+        else:
+            # Hinzukommende Tage addieren, wegfallende subtrahieren (vorne und hinten)
+            for lo, hi, sign in ((self.i1, i1, 1), (i1, self.i1, -1), (i0, self.i0, 1), (self.i0, i0, -1)):
+                if hi > lo:
+                    block = self.values[lo:hi]
+                    valid = ~np.isnan(block)
+                    self.total = self.total + sign * np.where(valid, block, 0.0).sum(axis=0, dtype=np.float64)
+                    self.count = self.count + sign * valid.sum(axis=0)
+        self.i0, self.i1 = i0, i1
+
+    def _push(self, block, offset):
+        """Block von Tagen hinten an die monotonen Deques anhängen."""
+        is_max = self.agg_method == 'max'
+        fill = -np.inf if is_max else np.inf
+        block = np.where(np.isnan(block), fill, block)
+        keep = _suffix_extrema(block, is_max)
+        column_max = block.max(axis=0) if is_max else block.min(axis=0)
+        for h, dq in enumerate(self.deques):
+            # Alte Kandidaten, die vom Block übertroffen werden, fallen weg
+            best = column_max[h]
+            while dq and (self.values[dq[-1], h] <= best if is_max else self.values[dq[-1], h] >= best):
+                dq.pop()
+            dq.extend(np.flatnonzero(keep[:, h]) + offset)
+
+    def _result(self):
+        if self._is_extremum:
+            out = np.full(len(self.deques), np.nan)
+            for h, dq in enumerate(self.deques):
+                if dq:
+                    out[h] = self.values[dq[0], h]
+            out[self.count == 0] = np.nan
+            return out
+        if self.agg_method == 'sum':
+            return self.total.copy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self.total / np.maximum(self.count, 1), np.nan)
+
+
+class SlidingWindowRegistry:
+    """LRU-begrenzte Aggregatoren pro (Session, Datensatz, Variable, Aggregation)."""
+
+    def __init__(self, max_entries=SLIDING_MAX_SESSIONS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, values, agg_method):
+        with self._lock:
+            agg = self._entries.get(key)
+            if agg is None or agg.values is not values:
+                agg = SlidingWindowAggregator(values, agg_method)
+                self._entries[key] = agg
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return agg
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        """(Anzahl Zustände, ungefähre Bytes) für den Speicherbericht."""
+        with self._lock:
+            entries = list(self._entries.values())
+        nbytes = 0
+        for agg in entries:
+            for name in ('total', 'count'):
+                nbytes += getattr(getattr(agg, name, None), 'nbytes', 0)
+            # Deque-Einträge als Python-Ints grob mit 36 Bytes
+            nbytes += 36 * sum(len(dq) for dq in getattr(agg, 'deques', ()))
+        return len(entries), nbytes
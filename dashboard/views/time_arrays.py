@@ -0,0 +1,125 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.config.settings import LEAN_LOAD, FLOAT32_DOWNCAST, SHARED_STORE_DIR
+from dashboard.data.data_loader import downcast_float32
+from dashboard.data.memory_report import register_cache, is_mapped
+from dashboard.data.shared_store import open_store_array
+from dashboard.data.ingest import register_append_hook
+
+# (id(dataset), var_name) -> (dataset, zeitmajores numpy-Array)
+_time_major_cache = {}
+_time_major_lock = threading.Lock()
+# var_name -> maximaler relativer Fehler durch float32 (Lean-Modus)
+downcast_errors = {}
+
+
+def time_major_values(dataset, var_name):
+    """
+    Variable als zusammenhängendes (time, hru)-Array, einmal pro Prozess erzeugt und als
+    einzige Kopie in den Datensatz zurückgeschrieben (die ursprüngliche Anordnung wird frei).
+    Im Lean-Modus wird die Variable erst hier geladen und optional auf float32 verkleinert.
+    Liegt sie im gemeinsamen Speicher (SHARED_STORE_DIR), wird stattdessen die
+    memory-mapped Datei verwendet.
+    """
+    key = (id(dataset), var_name)
+    with _time_major_lock:
+        entry = _time_major_cache.get(key)
+        if entry is None or entry[0] is not dataset:
+            da = dataset[var_name].transpose('time', 'hru')
+            mapped = open_store_array(SHARED_STORE_DIR, dataset, var_name)
+            if mapped is not None:
+                values = mapped
+                # Auch xarray-Pfade lesen dann aus dem Page-Cache statt aus einer privaten Kopie
+                dataset[var_name] = (('time', 'hru'), values, da.attrs)
+            elif LEAN_LOAD:
+                values = da.values
+                if FLOAT32_DOWNCAST:
+                    values, downcast_errors[var_name] = downcast_float32(values, var_name)
+                values = np.ascontiguousarray(values)
+                dataset[var_name] = (('time', 'hru'), values, da.attrs)
+            else:
+                values = np.ascontiguousarray(da.values, dtype=np.float64)
+                dataset[var_name] = (('time', 'hru'), values, da.attrs)
+            entry = (dataset, values)
+            _time_major_cache[key] = entry
+        return entry[1]
+
+
+def _time_major_size(of=None):
+    # Memory-mapped Arrays liegen im geteilten Page-Cache und zählen nicht zum Prozess;
+    # zurückgeschriebene Arrays zählen schon beim Datensatz (variable_sizes)
+    entries = [(dataset, key[1], values) for key, (dataset, values) in list(_time_major_cache.items())
+               if of is None or dataset is of]
+    return len(entries), sum(values.nbytes for dataset, var_name, values in entries
+                             if not is_mapped(values) and not _is_dataset_data(dataset, var_name, values))
+
+
+def _is_dataset_data(dataset, var_name, values):
+    var = dataset.variables.get(var_name)
+    return var is not None and getattr(var, '_in_memory', False) and var.data is values
+
+
+register_cache('time_major_arrays', _time_major_size, per_dataset=True)
+
+
+def time_major_ready(dataset, var_name):
+    """True, wenn time_major_values für die Variable in diesem Prozess schon aufgebaut ist."""
+    entry = _time_major_cache.get((id(dataset), var_name))
+    return entry is not None and entry[0] is dataset
+
+
+def hru_major_values(dataset, var_name):
+    """
+    (hru, time)-Sicht auf time_major_values (transponierte View, keine Kopie): eine Zeile ist
+    die Zeitreihe einer HRU, mit Schrittweite n_hru im zeitmajoren bzw. gemeinsamen Speicher.
+    """
+    return time_major_values(dataset, var_name).T
+
+
+def _extend_arrays(old, new, n_old):
+    """
+    Ingest: zeitmajore Arrays auf den verlängerten Datensatz übertragen, ohne weitere Kopie.
+    Liegt der alte Datensatz im gemeinsamen Speicher, ist der neue dort schon verlängert
+    (shared_store.extend_store) und wird gemappt (die private Kopie aus dem Anhängen wird frei). Sonst ist die verlängerte
+    Variable bereits zeitmajor (xr.concat der zurückgeschriebenen Arrays) und wird übernommen.
+    """
+    with _time_major_lock:
+        for key, (dataset, values) in list(_time_major_cache.items()):
+            if dataset is not old:
+                continue
+            del _time_major_cache[key]
+            var_name = key[1]
+            if new is None or var_name not in new or 'time' not in new[var_name].dims:
+                continue
+            if is_mapped(values) and open_store_array(SHARED_STORE_DIR, new, var_name) is not None:
+                # Wird unten mit dem Speicher verbunden
+                continue
+            da = new[var_name].transpose('time', 'hru')
+            extended = np.ascontiguousarray(da.values, dtype=values.dtype)
+            new[var_name] = (('time', 'hru'), extended, da.attrs)
+            _time_major_cache[(id(new), var_name)] = (new, extended)
+    if new is not None:
+        attach_shared_store(new)
+
+
+register_append_hook('time_arrays', _extend_arrays)
+
+
+def attach_shared_store(dataset):
+    """Alle Zeitvariablen, die im gemeinsamen Speicher liegen, memory-mapped einbinden."""
+    if not SHARED_STORE_DIR or dataset is None:
+        return dataset
+    for var_name in list(dataset.data_vars):
+        if 'time' in dataset[var_name].dims and open_store_array(SHARED_STORE_DIR, dataset, var_name) is not None:
+            time_major_values(dataset, var_name)
+    return dataset
+
+
+def time_index_range(dataset, date_range):
+    """Zeitfenster (inklusive Enddatum) als Indexbereich [i0, i1) wie sel(time=slice(...))."""
+    start, end = map(pd.to_datetime, date_range)
+    times = dataset.indexes['time']
+    return int(times.searchsorted(start, side='left')), int(times.searchsorted(end, side='right'))
@@ -0,0 +1,63 @@
+"""
+Aggregation vieler aufsteigender, nicht überlappender Zeitfenster in einem Durchgang
+(Play-Frames im Export, Stichproben-Fenster der Farbskalen). sum/mean/max/min ergeben
+sich mit np.*.reduceat über das zeitmajore Array, median/p90/p99/std laufen über
+sketch_aggregate wie in der App.
+"""
+import numpy as np
+import pandas as pd
+
+from dashboard.views.block_sketches import SKETCH_METHODS, sketch_aggregate
+from dashboard.views.time_arrays import time_major_values, time_index_range
+
+
+def frame_windows(date_range, day_stride, time_max=None):
+    """Zeitfenster aller Frames wie im Play-Modus: ab date_range[0] in Schritten von day_stride."""
+    start, end = map(pd.to_datetime, date_range)
+    if time_max is not None:
+        end = min(end, pd.to_datetime(time_max))
+    windows = []
+    while start <= end:
+        windows.append((start.date(), (start + pd.Timedelta(days=day_stride - 1)).date()))
+        start += pd.Timedelta(days=day_stride)
+    return windows
+
+
+def aggregate_frames(dataset, var_name, windows, agg_method):
+    """Aggregat jedes Fensters als Array (frames, hru); leere Fenster sind NaN."""
+    values = time_major_values(dataset, var_name)
+    bounds = np.array([time_index_range(dataset, w) for w in windows], dtype=np.int64).reshape(-1, 2)
+    n_hru = values.shape[1]
+    if agg_method in SKETCH_METHODS:
+        return np.stack([sketch_aggregate(dataset, var_name, w, agg_method) for w in windows]) \
+            if windows else np.empty((0, n_hru))
+    result = np.full((len(windows), n_hru), np.nan)
+    valid = bounds[:, 1] > bounds[:, 0]
+    if not valid.any():
+        return result
+    # Fenster sind aufsteigend und überlappen nicht: reduceat über die Startindizes,
+    # Lücken zwischen Fenstern (Daten ausserhalb) werden als eigene Segmente verworfen
+    starts, ends = bounds[valid, 0], bounds[valid, 1]
+    edges = np.unique(np.concatenate([starts, ends]))
+    edges = edges[edges < ends[-1]]
+    block = values[edges[0]:ends[-1]]
+    idx = edges - edges[0]
+    finite = ~np.isnan(block)
+    if agg_method in ('sum', 'mean'):
+        sums = np.add.reduceat(np.where(finite, block, 0), idx, axis=0, dtype=np.float64)
+        counts = np.add.reduceat(finite, idx, axis=0)
+    elif agg_method == 'max':
+        sums = np.fmax.reduceat(block, idx, axis=0).astype(np.float64)
+    elif agg_method == 'min':
+        sums = np.fmin.reduceat(block, idx, axis=0).astype(np.float64)
+    else:
+        raise ValueError(f"Unbekannte Aggregation '{agg_method}'")
+    # Segment -> Fenster
+    segment = np.searchsorted(edges, starts)
+    frames = np.flatnonzero(valid)
+    if agg_method == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[frames] = sums[segment] / counts[segment]
+    else:
+        result[frames] = sums[segment]
+    return result
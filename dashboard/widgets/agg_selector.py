@@ -1,13 +1,15 @@
 import panel as pn
 
-from dashboard.config.settings import INIT_AGG_METHOD
+from dashboard.config.settings import INIT_AGG_METHOD, AGG_METHODS, SKETCH_EXACT_MAX_DAYS, SKETCH_POINTS
 
 
-# Select-Widget für Aggregationsfunktion (Summe, Mittelwert, Max, Min)
+# Select-Widget für Aggregationsfunktion (Summe, Mittelwert, Max, Min, Quantile, Std)
 def create_agg_selector():
     return pn.widgets.Select(
         name='🔢 Aggregation function',
-        options=['sum', 'mean', 'max', 'min'],
+        options=AGG_METHODS,
         value=INIT_AGG_METHOD,
+        description=(f"median/p90/p99 are exact for windows up to {SKETCH_EXACT_MAX_DAYS} days, "
+                     f"longer windows use block sketches (rank error ≤ 1/{SKETCH_POINTS})."),
         sizing_mode='stretch_width'
     )
\ No newline at end of file
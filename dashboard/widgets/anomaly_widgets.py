@@ -0,0 +1,46 @@
+import panel as pn
+
+MAP_MODE_OPTIONS = {
+    'Absolute values': 'absolute',
+    'Anomaly': 'anomaly',
+    'Anomaly (%)': 'anomaly_pct',
+    'Scenario difference': 'scenario_diff',
+    'Exceedance events': 'exceedance',
+}
+CLIM_BASIS_OPTIONS = {
+    'Day of year': 'doy',
+    'Month': 'month',
+}
+
+
+def create_map_mode_selector():
+    return pn.widgets.Select(
+        name='🌡️ Map mode',
+        options=MAP_MODE_OPTIONS,
+        value='absolute',
+        sizing_mode='stretch_width',
+        margin=(5, 10)
+    )
+
+def create_ref_period_slider(min_year, max_year, ref_period):
+    # Referenzperiode auf den verfügbaren Zeitraum begrenzen
+    start = min(max(ref_period[0], min_year), max_year)
+    end = max(min(ref_period[1], max_year), start)
+    return pn.widgets.IntRangeSlider(
+        name="📏 Reference period",
+        start=min_year,
+        end=max_year,
+        value=(start, end),
+        step=1,
+        sizing_mode='stretch_width',
+        margin=(5, 10)
+    )
+
+def create_clim_basis_selector():
+    return pn.widgets.RadioButtonGroup(
+        name='Climatology basis',
+        options=CLIM_BASIS_OPTIONS,
+        value='doy',
+        button_type='default',
+        margin=(5, 10)
+    )
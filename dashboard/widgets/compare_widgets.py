@@ -0,0 +1,11 @@
+import panel as pn
+
+
+def create_compare_toggle():
+    return pn.widgets.Toggle(
+        name='↔️ Compare windows',
+        value=False,
+        button_type='default',
+        width=180,
+        margin=(22, 10, 5, 10)
+    )
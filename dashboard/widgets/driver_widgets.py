@@ -0,0 +1,33 @@
+import panel as pn
+
+from dashboard.config.settings import DRIVER_TARGETS, DRIVER_METHODS
+
+DRIVER_TARGET_LABELS = {
+    'Qmm_mod': 'Runoff CH-RUN',
+    'Qmm_prevah': 'Runoff PREVAH',
+    'Y': 'Runoff difference (Y)',
+    'shap': 'SHAP values of variable',
+}
+DRIVER_METHOD_LABELS = {
+    'spearman': 'Spearman',
+    'pearson': 'Pearson',
+}
+
+
+def create_driver_target_selector():
+    return pn.widgets.Select(
+        name='🎯 Target',
+        options={DRIVER_TARGET_LABELS.get(t, t): t for t in DRIVER_TARGETS},
+        value=DRIVER_TARGETS[0],
+        width=220,
+        margin=(5, 10)
+    )
+
+def create_driver_method_selector():
+    return pn.widgets.RadioButtonGroup(
+        name='Correlation',
+        options={DRIVER_METHOD_LABELS.get(m, m): m for m in DRIVER_METHODS},
+        value=DRIVER_METHODS[0],
+        button_type='default',
+        margin=(22, 10, 5, 10)
+    )
@@ -0,0 +1,30 @@
+import panel as pn
+
+from dashboard.config.settings import EVENT_PERCENTILES, EVENT_METRICS
+
+EVENT_METRIC_LABELS = {
+    'days': 'Days above threshold',
+    'episodes': 'Number of episodes',
+    'max_length': 'Longest episode (days)',
+    'first_day': 'First occurrence (days after start)',
+}
+
+
+def create_event_percentile_selector():
+    # Schwelle pro HRU: Perzentil der Tageswerte in der Referenzperiode
+    return pn.widgets.RadioButtonGroup(
+        name='Threshold percentile',
+        options={f"p{p}": p for p in EVENT_PERCENTILES},
+        value=EVENT_PERCENTILES[-1],
+        button_type='default',
+        margin=(5, 10)
+    )
+
+def create_event_metric_selector():
+    return pn.widgets.Select(
+        name='⚡ Exceedance metric',
+        options={EVENT_METRIC_LABELS.get(m, m): m for m in EVENT_METRICS},
+        value=EVENT_METRICS[0],
+        sizing_mode='stretch_width',
+        margin=(5, 10)
+    )
@@ -0,0 +1,18 @@
+import panel as pn
+
+
+def create_play_stats_pane():
+    # Erreichte FPS und verworfene Frames im Play-Modus
+    return pn.pane.Markdown(
+        "",
+        styles={"font-size": "11px", "color": "#666"},
+        margin=(0, 10),
+        sizing_mode="stretch_width"
+    )
+
+def create_adaptive_speed_checkbox():
+    return pn.widgets.Checkbox(
+        name="🐢 Adapt speed",
+        value=False,
+        margin=(5, 10)
+    )
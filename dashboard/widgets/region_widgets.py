@@ -0,0 +1,22 @@
+import panel as pn
+
+
+def create_region_selector(weights):
+    """Auswahl der Region (ganzes Gebiet zuerst) für die Gebietssummen."""
+    return pn.widgets.Select(
+        name='🗺️ Region',
+        options={weights.labels.get(name, name): name for name in weights.names},
+        value=weights.names[0],
+        width=220,
+        margin=(5, 10)
+    )
+
+def create_region_var_selector(variables, var_metadata):
+    """Variable der Gebietssumme (lange Namen wie in der Variablen-Auswahl)."""
+    return pn.widgets.Select(
+        name='Variable',
+        options={var_metadata.get(v, {}).get('long_name', v): v for v in variables},
+        value=variables[0] if variables else None,
+        width=220,
+        margin=(5, 10)
+    )
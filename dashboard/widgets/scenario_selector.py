@@ -0,0 +1,29 @@
+import panel as pn
+
+from dashboard.config.settings import BASE_SCENARIO
+
+
+def _scenario_options(catalog):
+    # Anzeigename -> Szenario-Name, Basisdaten zuerst
+    options = {'Baseline (chrun.nc)': BASE_SCENARIO}
+    options.update({catalog.label(name): name for name in catalog.names})
+    return options
+
+def create_scenario_selector(catalog):
+    return pn.widgets.Select(
+        name='🗂️ Scenario',
+        options=_scenario_options(catalog),
+        value=BASE_SCENARIO,
+        sizing_mode='stretch_width',
+        margin=(5, 10)
+    )
+
+def create_compare_scenario_selector(catalog):
+    # Referenz der Differenzkarte (Kartenmodus 'Scenario difference')
+    return pn.widgets.Select(
+        name='↔️ Compare with',
+        options=_scenario_options(catalog),
+        value=BASE_SCENARIO,
+        sizing_mode='stretch_width',
+        margin=(5, 10)
+    )
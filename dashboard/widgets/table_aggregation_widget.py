@@ -1,69 +1,19 @@
 import pandas as pd
 import panel as pn
 
-from dashboard.views.main_multiprocessing import aggregate_data
-
-def create_aggregation_widget(main_view, hru_clicked):
+def table_rows(var_metadata, variables, dynamic_keys):
     """
-    Erstellt die Aggregationsansicht: Tabelle mit Basiswerten für die angeklickte HRU.
-    Gibt ein Tuple (widget, hru_clicked) zurück.
+    Zeilen der Aggregationstabelle: Variablen in Anzeigereihenfolge (dynamische zuerst, dann
+    statische) und ihre langen Namen. Hängt nur von der Variablenmenge ab, nicht vom Fenster.
     """
-    var_name = main_view.variable
-    if var_name is None:
-        return pn.pane.Markdown("No variable selected.", width=300), None
-    # Vorbereitung
-    time_value = main_view.date_range
-    row_data = {}
-    # Dynamische Gruppenvariablen (P, T) immer zuerst aggregieren
-    dynamic_keys = []
-    for dyn in ['P', 'T', 'Qmm_mod', 'Qmm_prevah']:
-        if dyn in main_view.time_vars:
-            try:
-                dyn_da = aggregate_data(main_view.ds, dyn, time_value, main_view.agg_method)
-                row_data[dyn] = float(dyn_da.sel(hru=hru_clicked).values)
-            except Exception:
-                row_data[dyn] = None
-            dynamic_keys.append(dyn)
-    # Aktuelle Variable (evtl. dynamisch oder statisch)
-    if var_name in main_view.time_vars and var_name not in dynamic_keys:
-        try:
-            var_da = aggregate_data(main_view.ds, var_name, time_value, main_view.agg_method)
-            row_data[var_name] = float(var_da.sel(hru=hru_clicked).values)
-        except Exception:
-            row_data[var_name] = None
-        dynamic_keys.append(var_name)
-    elif var_name not in main_view.time_vars:
-        try:
-            row_data[var_name] = float(main_view.ds[var_name].sel(hru=hru_clicked).values)
-        except Exception:
-            row_data[var_name] = None
-    # Statische Variablen
-    for stat in main_view.static_vars:
-        try:
-            row_data[stat] = float(main_view.ds[stat].sel(hru=hru_clicked).values)
-        except Exception:
-            row_data[stat] = None
-    # DataFrame zusammenstellen
-    table_df = pd.DataFrame.from_dict(row_data, orient='index', columns=['Value'])
-    table_df.index.name = 'Variable'
-    # Verwende lange Namen für Anzeige
-    long_names = [
-        main_view.var_metadata.get(v, {}).get('long_name', v)
-        for v in table_df.index
-    ]
-    table_df.index = long_names
-    # Reset Index für Tabulator
-    df = table_df.reset_index()
-    df.columns = ['Variable', 'Value']
-    # Gruppenspalte für Sortierung (P, T und ggf. aktuelles dynamisches Feature zuerst)
-    dynamic_long = [main_view.var_metadata.get(k, {}).get('long_name', k) for k in dynamic_keys]
-    df['Gruppe'] = df['Variable'].apply(lambda v: 'Dynamisch' if v in dynamic_long else 'Statisch')
-    # Sortiere so, dass dynamische Einträge oben stehen
-    df = df.sort_values('Gruppe', ascending=True)
-    # Entferne Hilfsspalte
-    df = df.drop(columns=['Gruppe'])
-    # Widget erstellen mit Tabulator (volle Breite)
-    table_widget = pn.widgets.Tabulator(
+    order = [v for v in variables if v in dynamic_keys] + [v for v in variables if v not in dynamic_keys]
+    labels = [var_metadata.get(v, {}).get('long_name', v) for v in order]
+    return tuple(order), labels
+
+def create_aggregation_widget(labels):
+    """Tabulator mit den Zeilen labels; die Werte werden danach nur noch gepatcht."""
+    df = pd.DataFrame({'Variable': labels, 'Value': [None] * len(labels)})
+    return pn.widgets.Tabulator(
         df,
         show_index=False,
         layout='fit_data',
@@ -72,5 +22,21 @@ def create_aggregation_widget(main_view, hru_clicked):
         height=500,
         disabled=True
     )
-    return table_widget, hru_clicked
 
+def set_table_labels(table_widget, labels):
+    """Neue Zeilenmenge (z.B. andere Variable): einmal die ganze Tabelle ersetzen."""
+    table_widget.value = pd.DataFrame({'Variable': labels, 'Value': [None] * len(labels)})
+
+def _same(a, b):
+    # NaN-Werte gelten als unverändert
+    return a == b or (a != a and b != b)
+
+def update_table_values(table_widget, order, row_data):
+    """
+    Nur geänderte Zellen der Spalte 'Value' an den Browser schicken (patch statt neuer Tabelle).
+    row_data: Variable -> Wert aus compute_table_values / compute_selection_values.
+    """
+    current = table_widget.value['Value'].tolist()
+    changes = [(i, row_data.get(v)) for i, v in enumerate(order) if not _same(current[i], row_data.get(v))]
+    if changes:
+        table_widget.patch({'Value': changes})
@@ -63,3 +63,16 @@ def set_map_bounds(event, main_view, adjust_start_for_stride=True):
         main_view.date_range_slider.start = new_time_min
         main_view.date_range_slider.end = new_time_max
         main_view.date_range_slider.value = (pd.Timestamp(new_start), pd.Timestamp(new_end))
+
+
+def extend_time_bounds(event, year_range_slider, end_date_picker, ref_period_slider):
+    """Neues Datenende (Ingest): Grenzen der Zeit-Widgets erweitern."""
+    new_end = event.new
+    old_max_year = year_range_slider.end
+    year_range_slider.end = max(old_max_year, new_end.year)
+    ref_period_slider.end = max(ref_period_slider.end, new_end.year)
+    end_date_picker.end = new_end
+    # Stand der Jahresbereich am bisherigen Datenende, wächst er mit (set_map_bounds passt MainView an)
+    start_year, end_year = year_range_slider.value
+    if end_year == old_max_year and new_end.year > old_max_year:
+        year_range_slider.value = (start_year, new_end.year)
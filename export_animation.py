@@ -0,0 +1,92 @@
+"""
+Play-Modus ohne Browser: rendert jedes Frame der Karte(n) als PNG und setzt die
+Bilder optional zu einem GIF oder MP4 zusammen (MP4 braucht ffmpeg, GIF ffmpeg
+oder Pillow).
+
+Beispiele:
+    python export_animation.py --variable P --agg sum --start 1961-01-01 --end 2020-12-31 \\
+        --stride 30 --out frames/P_monthly --video mp4
+    python export_animation.py --variable T --panels map shap diff --workers 8 --video gif
+    python export_animation.py --data synthetic --variable P --start 2014-01-01 --end 2023-12-31
+"""
+import argparse
+import datetime
+import json
+import os
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def load_datasets(data_source):
+    """Daten wie die App laden (Dateien unter data/ oder synthetische Daten)."""
+    from dashboard.data.data_loader import load_data, load_shared_synthetic_data
+    from dashboard.views.time_arrays import attach_shared_store
+    if data_source == 'synthetic':
+        gdf, ds, shap_ds = load_shared_synthetic_data()
+    else:
+        data_dir = SCRIPT_DIR / "data"
+        gdf, ds, shap_ds = load_data(
+            data_dir / "CHRUN" / "catchments" / "catchments.shp",
+            data_dir / "CHRUN" / "chrun.nc",
+            data_dir / "model" / "shap_rnn.nc"
+        )
+    return gdf, attach_shared_store(ds), attach_shared_store(shap_ds)
+
+
+def parse_args(argv=None):
+    from dashboard.config.settings import AGG_METHODS, START_DATE, END_DATE, INIT_DAY_STRIDE, INIT_AGG_METHOD
+    from dashboard.views.animation_export import PANELS, CLIM_MODES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--variable", default="P")
+    parser.add_argument("--agg", choices=AGG_METHODS, default=INIT_AGG_METHOD)
+    parser.add_argument("--start", type=datetime.date.fromisoformat, default=START_DATE)
+    parser.add_argument("--end", type=datetime.date.fromisoformat, default=END_DATE,
+                        help="letzter Frame-Start (Standard: Ende der Daten beachten)")
+    parser.add_argument("--stride", type=int, default=INIT_DAY_STRIDE, help="day_stride: Tage pro Frame")
+    parser.add_argument("--panels", nargs="+", choices=PANELS, default=["map"])
+    parser.add_argument("--clim", choices=CLIM_MODES, default="global",
+                        help="global: fester Farbbereich, frame: pro Frame wie in der App")
+    parser.add_argument("--out", default="frames", help="Ausgabeverzeichnis")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--width", type=int, default=800, help="Breite pro Karte (px)")
+    parser.add_argument("--height", type=int, default=500)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--video", choices=("gif", "mp4"), default=None)
+    parser.add_argument("--fps", type=float, default=5)
+    parser.add_argument("--data", choices=("files", "synthetic"), default=os.environ.get("DASHBOARD_DATA", "files"))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from dashboard.data.data_loader import get_time_bounds, get_var_colormaps
+    from dashboard.views.animation_export import export_animation
+
+    gdf, ds, shap_ds = load_datasets(args.data)
+    _, time_max = get_time_bounds(ds)
+    result = export_animation(
+        ds, shap_ds, gdf,
+        variable=args.variable,
+        agg_method=args.agg,
+        date_range=(args.start, args.end),
+        day_stride=args.stride,
+        out_dir=args.out,
+        panels=args.panels,
+        var_cmaps=get_var_colormaps(),
+        time_max=time_max,
+        clim=args.clim,
+        workers=args.workers,
+        size=(args.width, args.height),
+        dpi=args.dpi,
+        fps=args.fps,
+        video=args.video
+    )
+    print(json.dumps(result, indent=1))
+    if args.video and result["video"] is None:
+        print(f"Kein Encoder für {args.video} gefunden (ffmpeg bzw. Pillow); nur PNGs geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from dashboard.app import create_app
+from dashboard.views.data_api import API_PATTERNS
 import panel as pn
 
 if __name__ == "__main__":
@@ -8,5 +9,6 @@ if __name__ == "__main__":
         address="0.0.0.0",
         port=10000,   # Render verwendet standardmäßig 10000
         allow_websocket_origin=["*"],  # Oder: ["ai4good-dashboard.onrender.com"]
+        extra_patterns=API_PATTERNS,  # Daten-API (/api/aggregate, /api/timeseries)
         show=False
     )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from dashboard.app import create_app
+from dashboard.views.data_api import API_PATTERNS
 import panel as pn
 
 if __name__ == "__main__":
-    pn.serve(create_app, title="Water Runoff Dashboard", show=True, port=1961)
\ No newline at end of file
+    pn.serve(create_app, title="Water Runoff Dashboard", show=True, port=1961, extra_patterns=API_PATTERNS)
\ No newline at end of file
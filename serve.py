@@ -0,0 +1,212 @@
+"""
+Mehrprozess-Betrieb des Dashboards.
+
+Startet N unabhängige Panel-Serverprozesse auf aufeinanderfolgenden Ports
+(--port, --port + 1, ...). Ein Supervisor
+- schreibt vorab die Zeitvariablen einmal in den gemeinsamen Datenspeicher
+  (--store), den alle Prozesse memory-mapped lesen,
+- gibt allen Prozessen denselben Resultat-Cache (--cache) mit,
+- startet abgestürzte Prozesse neu,
+- startet bei SIGHUP alle Prozesse nacheinander neu (rolling restart: der nächste
+  Prozess wird erst gestoppt, wenn der neue auf /health antwortet),
+- beendet bei SIGTERM / SIGINT alle Prozesse.
+
+Ein Reverse-Proxy mit Sticky Sessions (siehe deploy/nginx.conf) verteilt die Nutzer.
+
+Beispiel:
+    python serve.py --workers 4 --port 5006 --cache disk:///tmp/wrd-cache
+    kill -HUP <pid>   # rolling restart
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+STATE_FILE = "serve_state.json"
+
+
+def build_shared_store(store_dir, data_source):
+    """Daten einmal laden und alle Zeitvariablen in den gemeinsamen Speicher schreiben."""
+    from dashboard.data.data_loader import load_data
+    from dashboard.data.shared_store import build_store
+    if data_source == 'synthetic':
+        from dashboard.data.data_loader import load_shared_synthetic_data
+        gdf, ds, shap_ds = load_shared_synthetic_data()
+    else:
+        data_dir = SCRIPT_DIR / "data"
+        gdf, ds, shap_ds = load_data(
+            data_dir / "CHRUN" / "catchments" / "catchments.shp",
+            data_dir / "CHRUN" / "chrun.nc",
+            data_dir / "model" / "shap_rnn.nc",
+            lean=True
+        )
+    build_store(store_dir, {'chrun': ds, 'shap': shap_ds})
+
+
+def run_child(port, address, websocket_origins):
+    """Ein einzelner Serverprozess (wird vom Supervisor mit --child gestartet)."""
+    import panel as pn
+    import tornado.web
+    from dashboard.app import create_app
+    from dashboard.views.data_api import API_PATTERNS
+
+    class HealthHandler(tornado.web.RequestHandler):
+        def get(self):
+            self.write({"pid": os.getpid(), "port": port})
+
+    pn.serve(
+        create_app,
+        title="Water Runoff Dashboard",
+        address=address,
+        port=port,
+        allow_websocket_origin=websocket_origins,
+        extra_patterns=[(r"/health", HealthHandler)] + API_PATTERNS,
+        show=False
+    )
+
+
+def wait_healthy(port, timeout=120):
+    """Wartet, bis der Prozess auf /health antwortet. Gibt die pid oder None zurück."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+                return json.loads(response.read())["pid"]
+        except (OSError, ValueError):
+            time.sleep(0.5)
+    return None
+
+
+class Supervisor:
+
+    def __init__(self, args):
+        self.args = args
+        self.ports = [args.port + i for i in range(args.workers)]
+        self.children = {}
+        self.restarts = 0
+        self._rolling = False
+        self._stopping = False
+
+    def child_env(self):
+        env = dict(os.environ)
+        env["DASHBOARD_SHARED_STORE"] = str(self.args.store)
+        env["DASHBOARD_LEAN_LOAD"] = "1"
+        env["DASHBOARD_DATA"] = self.args.data
+        if self.args.cache:
+            env["RESULT_CACHE_URL"] = self.args.cache
+        # Rechen-Worker auf die Serverprozesse aufteilen, falls nicht explizit gesetzt
+        env.setdefault("DASHBOARD_COMPUTE_WORKERS", str(max(1, (os.cpu_count() or 1) // len(self.ports))))
+        return env
+
+    def start(self, port):
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--child", "--port", str(port),
+               "--address", self.args.address]
+        for origin in self.args.allow_websocket_origin:
+            cmd += ["--allow-websocket-origin", origin]
+        # Eigene Prozessgruppe: Rechen-Worker erben den Server-Socket und müssen mit beendet werden
+        self.children[port] = subprocess.Popen(cmd, env=self.child_env(), cwd=SCRIPT_DIR, start_new_session=True)
+        self.write_state()
+
+    def stop(self, port, grace=10):
+        proc = self.children.get(port)
+        if proc is None:
+            return
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(proc.pid, sig)
+            except ProcessLookupError:
+                return
+            try:
+                proc.wait(grace)
+                # Verwaiste Rechen-Worker der Gruppe ebenfalls beenden
+                os.killpg(proc.pid, signal.SIGKILL)
+                return
+            except subprocess.TimeoutExpired:
+                continue
+            except ProcessLookupError:
+                return
+
+    def write_state(self):
+        state = {
+            "supervisor": os.getpid(),
+            "workers": {str(port): proc.pid for port, proc in self.children.items()},
+            "restarts": self.restarts,
+        }
+        tmp = Path(self.args.store) / (STATE_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, Path(self.args.store) / STATE_FILE)
+
+    def rolling_restart(self):
+        """Einen Prozess nach dem anderen ersetzen; die übrigen bedienen weiter."""
+        for port in self.ports:
+            if self._stopping:
+                return
+            self.stop(port)
+            self.start(port)
+            self.restarts += 1
+            if wait_healthy(port) is None:
+                print(f"[serve] Port {port} nach Neustart nicht erreichbar", flush=True)
+            self.write_state()
+        print("[serve] Rolling restart abgeschlossen", flush=True)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, '_rolling', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, '_stopping', True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, '_stopping', True))
+        for port in self.ports:
+            self.start(port)
+        for port in self.ports:
+            wait_healthy(port)
+        print(f"[serve] {len(self.ports)} Prozesse auf Ports {self.ports[0]}–{self.ports[-1]} "
+              f"(Supervisor pid {os.getpid()})", flush=True)
+        try:
+            while not self._stopping:
+                if self._rolling:
+                    self._rolling = False
+                    self.rolling_restart()
+                for port, proc in list(self.children.items()):
+                    if proc.poll() is not None and not self._stopping:
+                        print(f"[serve] Prozess auf Port {port} beendet (Code {proc.returncode}), "
+                              f"Neustart", flush=True)
+                        self.stop(port)
+                        self.restarts += 1
+                        self.start(port)
+                time.sleep(1)
+        finally:
+            for port in self.ports:
+                self.stop(port)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2, help="Anzahl Serverprozesse")
+    parser.add_argument("--port", type=int, default=5006, help="Port des ersten Prozesses")
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--allow-websocket-origin", action="append", default=None)
+    parser.add_argument("--store", default=os.environ.get("DASHBOARD_SHARED_STORE") or "/tmp/wrd-store",
+                        help="Verzeichnis des gemeinsamen Datenspeichers")
+    parser.add_argument("--cache", default=os.environ.get("RESULT_CACHE_URL", ""),
+                        help="Resultat-Cache: disk:///pfad oder redis://host:port/db")
+    parser.add_argument("--data", choices=("files", "synthetic"),
+                        default=os.environ.get("DASHBOARD_DATA", "files"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.allow_websocket_origin is None:
+        args.allow_websocket_origin = ["*"]
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child:
+        run_child(args.port, args.address, args.allow_websocket_origin)
+    else:
+        build_shared_store(args.store, args.data)
+        Supervisor(args).run()
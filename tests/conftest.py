@@ -0,0 +1,36 @@
+"""Gemeinsame Fixtures: kleine synthetische Datensätze (make_synthetic_data) mit Lücken."""
+import numpy as np
+import pytest
+
+from dashboard.data.synthetic_data import make_synthetic_data
+
+N_HRU = 24
+N_DAYS = 4 * 365 + 60
+START = "2014-01-01"
+
+
+def with_gaps(dataset, var_name, seed=0, fraction=0.03):
+    """Kopie von dataset, in der var_name zufällige fehlende Werte und eine ganz leere HRU hat."""
+    dataset = dataset.copy(deep=True)
+    values = dataset[var_name].values
+    rng = np.random.default_rng(seed)
+    values[rng.random(values.shape) < fraction] = np.nan
+    values[0] = np.nan
+    return dataset
+
+
+@pytest.fixture
+def synthetic():
+    """(gdf, ds, shap_ds) – bei jedem Test neu, da time_major_values die Datensätze umschreibt."""
+    return make_synthetic_data(n_hru=N_HRU, n_days=N_DAYS, start=START, seed=0)
+
+
+@pytest.fixture
+def gappy(synthetic):
+    """Basisdaten mit Lücken in P (die erste HRU ist ganz leer)."""
+    return with_gaps(synthetic[1], 'P')
+
+
+def time_major(dataset, var_name):
+    """Referenz: (time, hru)-Kopie direkt aus xarray."""
+    return np.array(dataset[var_name].transpose('time', 'hru').values, dtype=np.float64)
@@ -0,0 +1,79 @@
+"""Block-Sketches und nan_quantile gegen numpy/xarray auf den Rohdaten."""
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.config.settings import SKETCH_POINTS, SKETCH_EXACT_MAX_DAYS
+from dashboard.views.block_sketches import BlockSketch, QUANTILE_METHODS, nan_quantile, sketch_aggregate
+from tests.conftest import time_major
+
+
+@pytest.mark.parametrize('q', [0.0, 0.25, 0.5, 0.9, 0.99, 1.0])
+@pytest.mark.parametrize('axis', [0, 1])
+def test_nan_quantile_is_bit_identical(gappy, q, axis):
+    values = time_major(gappy, 'P')[:500]
+    stack = values.reshape(10, 50, -1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = np.nanquantile(stack, q, axis=axis)
+    np.testing.assert_array_equal(nan_quantile(stack, q, axis=axis), expected)
+
+
+@pytest.mark.parametrize('agg_method', ['median', 'p90', 'p99', 'std'])
+def test_short_windows_are_exact(gappy, agg_method):
+    date_range = ('2015-03-05', '2015-09-30')
+    sel = gappy['P'].sel(time=slice(*date_range))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = sel.std('time') if agg_method == 'std' else sel.quantile(QUANTILE_METHODS[agg_method], 'time')
+    np.testing.assert_allclose(sketch_aggregate(gappy, 'P', date_range, agg_method), expected.values, rtol=1e-12)
+
+
+def _windows(n_days):
+    # Länger als SKETCH_EXACT_MAX_DAYS, an Blockgrenzen und dazwischen
+    return [(0, n_days), (3, n_days - 5), (256, 1280), (100, 100 + SKETCH_EXACT_MAX_DAYS + 1)]
+
+
+def test_std_over_blocks_matches_numpy(gappy):
+    values = time_major(gappy, 'T')
+    sketch = BlockSketch(values)
+    for i0, i1 in _windows(len(values)):
+        np.testing.assert_allclose(sketch.std(i0, i1), np.nanstd(values[i0:i1], axis=0), rtol=1e-9)
+
+
+@pytest.mark.parametrize('q', [0.5, 0.9, 0.99])
+def test_quantile_rank_error_within_bound(gappy, q):
+    values = time_major(gappy, 'T')
+    values[:, 1] = np.nan
+    sketch = BlockSketch(values)
+    for i0, i1 in _windows(len(values)):
+        estimate = sketch.quantile(i0, i1, q)
+        window = values[i0:i1]
+        n = (~np.isnan(window)).sum(axis=0)
+        filled = n > 0
+        assert np.isnan(estimate[~filled]).all()
+        # Normierter Rang des Schätzwerts im Fenster, Schranke 1/SKETCH_POINTS (+ ein Rang Auflösung)
+        below = (window < estimate).sum(axis=0)[filled] / n[filled]
+        at_most = (window <= estimate).sum(axis=0)[filled] / n[filled]
+        slack = 1.0 / SKETCH_POINTS + 1.0 / n[filled]
+        assert (below <= q + slack).all() and (at_most >= q - slack).all()
+
+
+def test_extended_sketch_matches_rebuilt(synthetic):
+    values = time_major(synthetic[1], 'T')
+    n_old = len(values) - 300
+    extended = BlockSketch(values[:n_old]).extended(values)
+    rebuilt = BlockSketch(values)
+    for i0, i1 in _windows(len(values)):
+        np.testing.assert_array_equal(extended.quantile(i0, i1, 0.9), rebuilt.quantile(i0, i1, 0.9))
+        np.testing.assert_allclose(extended.std(i0, i1), rebuilt.std(i0, i1), rtol=1e-9)
+
+
+def test_long_window_goes_through_sketch(gappy):
+    times = gappy.indexes['time']
+    date_range = (times[10], times[-10])
+    expected = gappy['P'].sel(time=slice(*date_range)).std('time').values
+    np.testing.assert_allclose(sketch_aggregate(gappy, 'P', date_range, 'std'), expected, rtol=1e-9)
+    assert pd.Timestamp(date_range[1]) - pd.Timestamp(date_range[0]) > pd.Timedelta(days=SKETCH_EXACT_MAX_DAYS)
@@ -0,0 +1,70 @@
+"""LTTB/minmax-Reduktion der Zeitreihen gegen eine direkte Implementierung und xarray."""
+import numpy as np
+import pytest
+
+from dashboard.views.hru_series import lttb_indices, minmax_indices, downsample_indices, hru_series
+
+
+def lttb_reference(y, n_out):
+    """Largest-Triangle-Three-Buckets Punkt für Punkt (Steinarsson), Buckets wie lttb_indices."""
+    n = len(y)
+    edges = [int(e) for e in np.linspace(1, n - 1, n_out - 1)]
+    selected, a = [0], 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = range(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = np.mean(list(nxt)), np.mean(y[edges[i + 1]:edges[i + 2]])
+        else:
+            avg_x, avg_y = n - 1, y[n - 1]
+        areas = [abs((a - avg_x) * (y[j] - y[a]) - (a - j) * (avg_y - y[a])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(areas))
+        selected.append(a)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+@pytest.mark.parametrize('n_out', [3, 10, 257, 800])
+def test_lttb_matches_reference(synthetic, n_out):
+    y = synthetic[1]['T'].isel(hru=3).values
+    np.testing.assert_array_equal(lttb_indices(y, n_out), lttb_reference(y, n_out))
+
+
+def test_lttb_short_series_unchanged():
+    np.testing.assert_array_equal(lttb_indices(np.arange(5.0), 10), np.arange(5))
+
+
+@pytest.mark.parametrize('n_out', [4, 100, 801])
+def test_minmax_keeps_extrema_of_each_bucket(synthetic, n_out):
+    y = synthetic[1]['P'].isel(hru=5).values
+    idx = minmax_indices(y, n_out)
+    buckets = max(n_out // 2, 1)
+    assert (np.diff(idx) > 0).all() and len(idx) <= 2 * buckets
+    bucket = np.arange(len(y)) * buckets // len(y)
+    for b in range(buckets):
+        chosen = y[idx[bucket[idx] == b]]
+        in_bucket = y[bucket == b]
+        assert chosen.min() == in_bucket.min() and chosen.max() == in_bucket.max()
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_skips_missing_values(gappy, method):
+    y = gappy['P'].isel(hru=2).values
+    idx = downsample_indices(y, 200, method)
+    assert np.isfinite(y[idx]).all() and len(idx) <= 200
+    if method == 'lttb':
+        # Erster und letzter gültiger Punkt bleiben erhalten
+        valid = np.flatnonzero(np.isfinite(y))
+        assert idx[0] == valid[0] and idx[-1] == valid[-1]
+
+
+@pytest.mark.parametrize('x_range', [None, ('2015-02-01', '2015-08-31')])
+def test_hru_series_reads_the_right_row(synthetic, x_range):
+    ds = synthetic[1]
+    hru = int(ds['hru'][7])
+    expected = ds['Qmm_mod'].sel(hru=hru).to_series()
+    times, values = hru_series(ds, 'Qmm_mod', hru, x_range, n_out=120)
+    np.testing.assert_array_equal(values, expected.loc[times].values)
+    if x_range is not None:
+        assert times[0] <= np.datetime64(x_range[0]) + np.timedelta64(1, 'D')
+        assert times[-1] >= np.datetime64(x_range[1]) - np.timedelta64(1, 'D')
@@ -0,0 +1,72 @@
+"""EventIndex.query und extended gegen eine direkte Auswertung der Überschreitungen pro HRU."""
+import warnings
+
+import numpy as np
+import pytest
+
+from dashboard.views.event_index import EventIndex
+from dashboard.views.time_arrays import time_index_range
+from tests.conftest import time_major
+
+REF_PERIOD = (2014, 2016)
+
+
+def _runs(flags):
+    """Längen der zusammenhängenden True-Folgen."""
+    padded = np.concatenate([[0], flags.astype(np.int8), [0]])
+    edges = np.diff(padded)
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def brute_force(values, thresholds, i0, i1):
+    with np.errstate(invalid='ignore'):
+        exceed = values[i0:i1] > thresholds
+    out = {name: np.zeros(values.shape[1]) for name in ('days', 'episodes', 'max_length')}
+    out['first_day'] = np.full(values.shape[1], np.nan)
+    for h in range(values.shape[1]):
+        runs = _runs(exceed[:, h])
+        out['days'][h] = exceed[:, h].sum()
+        out['episodes'][h] = len(runs)
+        out['max_length'][h] = runs.max() if len(runs) else 0
+        if len(runs):
+            out['first_day'][h] = np.flatnonzero(exceed[:, h])[0]
+    return out
+
+
+def _windows(n_days):
+    return [(0, n_days), (0, 1), (5, 6), (17, 200), (400, 1100), (n_days - 40, n_days), (300, 300)]
+
+
+@pytest.mark.parametrize('percentile', [50, 90, 99])
+def test_query_matches_brute_force(gappy, percentile):
+    values = time_major(gappy, 'P')
+    index = EventIndex.build(gappy, 'P', percentile, REF_PERIOD)
+    i0, i1 = time_index_range(gappy, ('2014-01-01', '2016-12-31'))
+    with warnings.catch_warnings():
+        # Die erste HRU ist ganz leer
+        warnings.simplefilter('ignore', RuntimeWarning)
+        thresholds = np.nanpercentile(values[i0:i1], percentile, axis=0)
+    np.testing.assert_array_equal(index.thresholds, thresholds)
+    for w0, w1 in _windows(len(values)):
+        if w1 <= w0:
+            continue
+        result = index.query(w0, w1)
+        expected = brute_force(values, thresholds, w0, w1)
+        for metric, values_expected in expected.items():
+            np.testing.assert_array_equal(result[metric], values_expected, err_msg=f"{metric} [{w0}, {w1})")
+
+
+@pytest.mark.parametrize('n_new', [1, 45, 400])
+def test_extended_matches_rebuilt(synthetic, n_new):
+    ds = synthetic[1]
+    n_old = ds.sizes['time'] - n_new
+    old = ds.isel(time=slice(0, n_old)).copy(deep=True)
+    values = time_major(ds, 'T')
+    extended = EventIndex.build(old, 'T', 90, REF_PERIOD).extended(values[n_old:].T)
+    rebuilt = EventIndex.build(ds, 'T', 90, REF_PERIOD)
+    for name in ('rows', 'starts', 'ends', 'lengths', 'cum_lengths'):
+        np.testing.assert_array_equal(getattr(extended, name), getattr(rebuilt, name))
+    assert extended.n_days == rebuilt.n_days
+    for w0, w1 in [(0, len(values)), (n_old - 10, n_old + 1), (n_old, len(values))]:
+        for metric, result in extended.query(w0, w1).items():
+            np.testing.assert_array_equal(result, rebuilt.query(w0, w1)[metric])
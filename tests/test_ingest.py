@@ -0,0 +1,111 @@
+"""Ingest: angehängte Tage und übertragene Caches gegen einen von Grund auf gebauten Datensatz."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.data.ingest import append_increment, append_and_migrate, release_dataset
+from dashboard.data.shared_store import build_store, extend_store, open_store_array, read_meta, \
+    dataset_fingerprint
+from dashboard.views import time_arrays
+from dashboard.views.block_sketches import BlockSketch, get_sketch
+from dashboard.views.climatology import Climatology, get_climatology
+from dashboard.views.event_index import EventIndex, get_event_index
+from dashboard.views.time_arrays import time_major_values
+from tests.conftest import time_major
+
+REF_PERIOD = (2014, 2015)
+TIME_VARS = ['P', 'T', 'Qmm_mod', 'Qmm_prevah']
+
+
+def _split(ds, n_new):
+    n_old = ds.sizes['time'] - n_new
+    old = ds.isel(time=slice(0, n_old)).copy(deep=True)
+    increment = ds[TIME_VARS].isel(time=slice(n_old, None)).copy(deep=True)
+    return old, increment, n_old
+
+
+def _drop_days(dataset, positions):
+    keep = np.setdiff1d(np.arange(dataset.sizes['time']), positions)
+    return dataset.isel(time=keep)
+
+
+def test_append_skips_known_days_and_fills_gaps(synthetic):
+    ds = synthetic[1]
+    old, increment, n_old = _split(ds, 30)
+    # Überlappung mit dem bisherigen Ende, drei fehlende Tage, eine fehlende Variable
+    increment = _drop_days(ds[TIME_VARS].isel(time=slice(n_old - 5, None)), [10, 11, 12]).drop_vars('Qmm_prevah')
+    new, n_new = append_increment(old, increment)
+    assert n_new == 30
+    pd.testing.assert_index_equal(new.indexes['time'], ds.indexes['time'])
+    expected = time_major(ds, 'T')
+    expected[n_old + 5:n_old + 8] = np.nan
+    np.testing.assert_array_equal(time_major(new, 'T'), expected)
+    assert np.isnan(time_major(new, 'Qmm_prevah')[n_old:]).all()
+    np.testing.assert_array_equal(new['dhm'].values, ds['dhm'].values)
+
+
+@pytest.mark.parametrize('n_new', [1, 120])
+def test_migrated_caches_match_rebuilt(synthetic, n_new):
+    ds = synthetic[1]
+    old, increment, n_old = _split(ds, n_new)
+    time_major_values(old, 'T')
+    get_sketch(old, 'T')
+    climatology = get_climatology(old, 'T', REF_PERIOD, 'doy')
+    get_event_index(old, 'T', 90, REF_PERIOD)
+
+    new, added = append_and_migrate(old, increment)
+    assert added == n_new
+    values = time_major(ds, 'T')
+    extended = time_major_values(new, 'T')
+    np.testing.assert_array_equal(extended, values)
+    # Die verlängerte Variable ist die einzige Kopie im Datensatz
+    assert new['T'].values is extended
+    assert not any(entry[0] is old for entry in time_arrays._time_major_cache.values())
+
+    rebuilt = BlockSketch(values)
+    n = len(values)
+    for i0, i1 in [(0, n), (n_old - 300, n)]:
+        np.testing.assert_array_equal(get_sketch(new, 'T').quantile(i0, i1, 0.9), rebuilt.quantile(i0, i1, 0.9))
+        np.testing.assert_allclose(get_sketch(new, 'T').std(i0, i1), rebuilt.std(i0, i1), rtol=1e-9)
+
+    migrated = get_climatology(new, 'T', REF_PERIOD, 'doy')
+    fresh = Climatology(values, ds.indexes['time'], REF_PERIOD, 'doy')
+    assert migrated is not climatology
+    np.testing.assert_array_equal(migrated.clim, fresh.clim)
+    for i0, i1 in [(n_old - 10, n), (0, n)]:
+        for agg_method in ('sum', 'mean'):
+            np.testing.assert_allclose(migrated.baseline(i0, i1, agg_method), fresh.baseline(i0, i1, agg_method))
+
+    index = get_event_index(new, 'T', 90, REF_PERIOD)
+    fresh_index = EventIndex.build(ds.copy(deep=True), 'T', 90, REF_PERIOD)
+    for i0, i1 in [(0, n), (n_old - 3, n)]:
+        for metric, result in index.query(i0, i1).items():
+            np.testing.assert_array_equal(result, fresh_index.query(i0, i1)[metric])
+
+    release_dataset(new)
+    assert not any(entry[0] is new for entry in time_arrays._time_major_cache.values())
+
+
+@pytest.mark.parametrize('float32', [False, True])
+def test_store_extended_under_new_fingerprint(synthetic, tmp_path, float32):
+    ds = synthetic[1]
+    old, increment, n_old = _split(ds, 40)
+    build_store(tmp_path, {'chrun': old}, float32=float32)
+    new, _ = append_increment(old, increment)
+    extend_store(tmp_path, old, new, n_old)
+    meta = read_meta(tmp_path)
+    assert meta[dataset_fingerprint(new)]['extends'] == dataset_fingerprint(old)
+    for var_name in TIME_VARS:
+        mapped = open_store_array(tmp_path, new, var_name)
+        expected = time_major(ds, var_name)
+        if float32:
+            assert mapped.dtype == np.float32
+            expected = expected.astype(np.float32)
+        np.testing.assert_array_equal(mapped, expected)
+    # Ein weiterer Ingest ersetzt den Zwischeneintrag
+    newer, _ = append_increment(new, increment.assign_coords(time=increment.indexes['time'] + pd.Timedelta(days=40)))
+    extend_store(tmp_path, new, newer, ds.sizes['time'])
+    meta = read_meta(tmp_path)
+    assert dataset_fingerprint(new) not in meta and dataset_fingerprint(old) in meta
+    assert open_store_array(tmp_path, newer, 'P').shape == (ds.sizes['time'] + 40, ds.sizes['hru'])
+    assert not list(tmp_path.glob(f"{dataset_fingerprint(new)}.*"))
@@ -0,0 +1,65 @@
+"""Blockweise Szenario-Differenz gegen getrennte numpy-Reduktionen."""
+import warnings
+
+import numpy as np
+import pytest
+
+from dashboard.views.scenario_diff import fused_difference, scenario_difference
+from dashboard.data.synthetic_data import make_synthetic_data
+from tests.conftest import N_HRU, N_DAYS, START, with_gaps, time_major
+
+REDUCERS = {
+    'sum': np.nansum,
+    'mean': np.nanmean,
+    'max': np.nanmax,
+    'min': np.nanmin,
+    'std': np.nanstd,
+}
+
+
+def _expected(values, rows, agg_method):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return REDUCERS[agg_method](values[rows[0]:rows[1]], axis=0)
+
+
+@pytest.fixture
+def pair(gappy):
+    scenario = with_gaps(make_synthetic_data(n_hru=N_HRU, n_days=N_DAYS, start=START, seed=1)[1], 'P',
+                         seed=2, fraction=0.2)
+    return time_major(gappy, 'P'), time_major(scenario, 'P')
+
+
+@pytest.mark.parametrize('agg_method', list(REDUCERS))
+@pytest.mark.parametrize('rows_a, rows_b', [((0, 400), (0, 400)), ((13, 200), (50, 237)), ((100, 101), (5, 6))])
+@pytest.mark.parametrize('chunk_days', [7, 365])
+def test_fused_matches_separate_reductions(pair, agg_method, rows_a, rows_b, chunk_days):
+    values_a, values_b = pair
+    result = fused_difference(values_a, values_b, rows_a, rows_b, agg_method, chunk_days=chunk_days)
+    expected = _expected(values_a, rows_a, agg_method) - _expected(values_b, rows_b, agg_method)
+    np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_fused_all_nan_hru(pair):
+    values_a, values_b = pair
+    # HRU 0 ist in A ganz NaN: Summe 0 wie xarray, sonst NaN
+    assert np.isfinite(fused_difference(values_a, values_b, (0, 50), (0, 50), 'sum', chunk_days=7)[0])
+    for agg_method in ('mean', 'max', 'min', 'std'):
+        assert np.isnan(fused_difference(values_a, values_b, (0, 50), (0, 50), agg_method, chunk_days=7)[0])
+
+
+def test_fused_rejects_unequal_windows(pair):
+    with pytest.raises(ValueError):
+        fused_difference(*pair, (0, 10), (0, 11), 'sum')
+
+
+def test_scenario_difference_matches_xarray(synthetic):
+    a = synthetic[1]
+    b = make_synthetic_data(n_hru=N_HRU, n_days=N_DAYS, start=START, seed=1)[1]
+    date_range = ('2015-03-01', '2015-09-30')
+    for agg_method in ('sum', 'mean', 'std', 'max'):
+        result = scenario_difference(a, b, 'T', date_range, agg_method)
+        window = slice(*date_range)
+        expected = (getattr(a['T'].sel(time=window), agg_method)('time') -
+                    getattr(b['T'].sel(time=window), agg_method)('time')).transpose('hru').values
+        np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
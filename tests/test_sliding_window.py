@@ -0,0 +1,51 @@
+"""Inkrementelle Fenster (monotone Deques, laufende Summen) gegen numpy über das ganze Fenster."""
+import warnings
+
+import numpy as np
+import pytest
+
+from dashboard.views.sliding_window import SlidingWindowAggregator
+from tests.conftest import time_major
+
+
+def _reference(block, agg_method):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if agg_method == 'sum':
+            return np.nansum(block, axis=0)
+        if agg_method == 'mean':
+            return np.nanmean(block, axis=0)
+        if agg_method == 'max':
+            return np.nanmax(block, axis=0)
+        return np.nanmin(block, axis=0)
+
+
+def _windows(n_days, seed):
+    """Play-artige Folge: kleine Schritte vorwärts, gelegentlich Sprünge und Rückwärtsschritte."""
+    rng = np.random.default_rng(seed)
+    i0, length = 10, 30
+    for _ in range(300):
+        step = rng.choice([1, 1, 1, 2, 7, -3, 400])
+        length = int(np.clip(length + rng.choice([0, 0, 0, 1, -1, 5]), 1, 200))
+        i0 = int(np.clip(i0 + step, 0, n_days - length))
+        yield i0, i0 + length
+
+
+@pytest.mark.parametrize('agg_method', ['sum', 'mean', 'max', 'min'])
+def test_incremental_matches_full_window(gappy, agg_method):
+    values = time_major(gappy, 'P')
+    aggregator = SlidingWindowAggregator(values, agg_method)
+    for i0, i1 in _windows(len(values), seed=1):
+        result = aggregator.update(i0, i1)
+        np.testing.assert_allclose(result, _reference(values[i0:i1], agg_method), rtol=1e-10, atol=1e-9,
+                                   err_msg=f"{agg_method} [{i0}, {i1})")
+    assert aggregator.incremental_updates > aggregator.full_recomputes
+
+
+@pytest.mark.parametrize('agg_method', ['max', 'min'])
+def test_extrema_with_ties(synthetic, agg_method):
+    # P ist zu gut der Hälfte 0: viele gleiche Werte in den Deques
+    values = time_major(synthetic[1], 'P')
+    aggregator = SlidingWindowAggregator(values, agg_method)
+    for i1 in range(20, 400):
+        np.testing.assert_array_equal(aggregator.update(i1 - 20, i1), _reference(values[i1 - 20:i1], agg_method))